@@ -1,28 +1,24 @@
 """
 占いAPIサーバー
 """
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from datetime import datetime
+import json
 import os
-import traceback
 import logging
 from werkzeug.serving import WSGIRequestHandler
 import signal
 import sys
 
 # 占いモジュールのインポート
-from modules.shichuu import calculate_shichuu
-from modules.kyusei import calculate_honmei, calculate_gatsumei
-from modules.sukuyo import calculate_sukuyo
-from modules.western import calculate_western_astrology
-from modules.doubutsu import calculate_animal_fortune
-from modules.inyou import calculate_inyou_gogyo
+from modules.reading import calculate_reading, iter_readings, get_cache
+from modules.request_params import parse_birthdate, parse_birth_time
+from modules import metrics
+from modules.log_setup import configure_logging, log_payload
 
 # --- ロギングの設定 ---
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# LOG_LEVEL / LOG_FORMAT / LOG_PAYLOAD_SAMPLE_RATE で設定する（modules/log_setup.py）
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # --- Flaskアプリケーションの作成 ---
@@ -52,8 +48,7 @@ def load_modules():
         logger.info("全モジュールが正常にロードされました")
         return calculate_honmei, calculate_gatsumei, calculate_animal_fortune, calculate_inyou_gogyo, calculate_shichuu, calculate_sukuyo, calculate_western_astrology
     except ImportError as e:
-        logger.error(f"モジュールのインポートに失敗: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("モジュールのインポートに失敗: %s", e)
         return None, None, None, None, None, None, None
 
 # --- APIエンドポイント: /api/predict (占い実行) ---
@@ -65,85 +60,155 @@ def predict():
             logger.error("リクエストデータが空です")
             return jsonify({"error": "データがありません"}), 400
 
-        year = int(data.get('year', 0))
-        month = int(data.get('month', 0))
-        day = int(data.get('day', 0))
-
-        logger.info(f"入力データ: year={year}, month={month}, day={day}")
+        # 生年月日（存在しない日付は受け付けない）
+        try:
+            year, month, day = parse_birthdate(data)
+        except ValueError as e:
+            logger.error("不正な入力データ: %s", data)
+            return jsonify({"error": str(e)}), 400
 
-        if not all([year, month, day]):
-            logger.error(f"不正な入力データ: year={year}, month={month}, day={day}")
-            return jsonify({"error": "生年月日が正しく指定されていません"}), 400
+        logger.debug("入力データ: year=%s, month=%s, day=%s", year, month, day)
 
-        # 四柱推命の計算
-        try:
-            shichuu_result = calculate_shichuu(year, month, day)
-            logger.info(f"四柱推命の計算結果: {shichuu_result}")
-        except Exception as e:
-            logger.error(f"四柱推命の計算でエラー: {str(e)}")
-            shichuu_result = {"error": "四柱推命の計算に失敗しました"}
-        
-        # 九星気学の計算
-        try:
-            honmei = calculate_honmei(year, month, day)
-            gatsumei = calculate_gatsumei(year, month, day)
-            kyusei_result = {
-                "honmei": honmei,
-                "gatsumei": gatsumei
-            }
-            logger.info(f"九星気学の計算結果: {kyusei_result}")
-        except Exception as e:
-            logger.error(f"九星気学の計算でエラー: {str(e)}")
-            kyusei_result = {"error": "九星気学の計算に失敗しました"}
-        
-        # 宿曜の計算
-        try:
-            sukuyo_result = calculate_sukuyo(year, month, day)
-            logger.info(f"宿曜の計算結果: {sukuyo_result}")
-        except Exception as e:
-            logger.error(f"宿曜の計算でエラー: {str(e)}")
-            sukuyo_result = {"error": "宿曜の計算に失敗しました"}
-        
-        # 西洋占星術の計算
+        # 出生時刻と出生地の経度（任意）
         try:
-            western_result = calculate_western_astrology(year, month, day)
-            logger.info(f"西洋占星術の計算結果: {western_result}")
-        except Exception as e:
-            logger.error(f"西洋占星術の計算でエラー: {str(e)}")
-            western_result = {"error": "西洋占星術の計算に失敗しました"}
-        
-        # どうぶつ占いの計算
-        try:
-            animal_result = calculate_animal_fortune(year, month, day)
-            logger.info(f"どうぶつ占いの計算結果: {animal_result}")
-        except Exception as e:
-            logger.error(f"どうぶつ占いの計算でエラー: {str(e)}")
-            animal_result = "不明な動物"
-        
-        # 陰陽五行の計算
-        try:
-            inyou_result = calculate_inyou_gogyo(year, month, day)
-            logger.info(f"陰陽五行の計算結果: {inyou_result}")
-        except Exception as e:
-            logger.error(f"陰陽五行の計算でエラー: {str(e)}")
-            inyou_result = {"error": "陰陽五行の計算に失敗しました"}
-
-        response_data = {
-            "shichuu": shichuu_result,
-            "kyusei": kyusei_result,
-            "sukuyo": sukuyo_result,
-            "western": western_result,
-            "animal": {"animal_character": animal_result},
-            "inyou": inyou_result
-        }
-        logger.info(f"レスポンスデータ: {response_data}")
+            hour, minute, longitude = parse_birth_time(data)
+        except ValueError as e:
+            logger.error("不正な出生時刻: %s", data)
+            return jsonify({"error": str(e)}), 400
+
+        # 6種類の占いを計算
+        response_data = calculate_reading(year, month, day, hour, minute, longitude)
+        log_payload(logger, "レスポンスデータ", response_data)
         return jsonify(response_data)
 
     except Exception as e:
-        logger.error(f"予期せぬエラーが発生: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.exception("予期せぬエラーが発生: %s", e)
         return jsonify({"error": str(e)}), 500
 
+# バッチで受け付ける最大件数
+BATCH_MAX_ITEMS = int(os.environ.get('PREDICT_BATCH_MAX_ITEMS', 10000))
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+
+def format_result_line(index, date=None, result=None, error=None):
+    """バッチ・ストリーミングの結果1件分をJSON文字列にする"""
+    if error is not None:
+        return json.dumps({"index": index, "error": error}, ensure_ascii=False)
+    year, month, day = date
+    return json.dumps({"index": index, "year": year, "month": month, "day": day,
+                       "result": result}, ensure_ascii=False)
+
+def read_batch_items():
+    """
+    バッチリクエストの本文を要素のリストとして読み込む
+
+    JSON配列（または {"dates": [...]}）とNDJSON（1行に1件）を受け付ける。
+    NDJSONで読めない行は要素の代わりに ValueError を入れる。
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(ValueError("JSONとして読み込めません"))
+        return items
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('dates')
+    if not isinstance(data, list):
+        raise ValueError("生年月日の配列が指定されていません")
+    return data
+
+# --- APIエンドポイント: /api/predict/batch (複数件の占い実行) ---
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        items = read_batch_items()
+    except ValueError as e:
+        logger.error("バッチリクエストが不正です: %s", e)
+        return jsonify({"error": str(e)}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"一度に指定できるのは{BATCH_MAX_ITEMS}件までです"}), 413
+
+    logger.debug("バッチ入力件数: %d", len(items))
+    dates = []
+    errors = {}
+    for i, item in enumerate(items):
+        try:
+            if isinstance(item, ValueError):
+                raise item
+            dates.append(parse_birthdate(item))
+        except ValueError as e:
+            errors[i] = str(e)
+            dates.append(None)
+
+    ndjson = request.mimetype in NDJSON_MIMETYPES
+
+    def generate():
+        readings = iter_readings([date for date in dates if date is not None])
+        if not ndjson:
+            yield '['
+        for i, date in enumerate(dates):
+            if date is None:
+                text = format_result_line(i, error=errors[i])
+            else:
+                text = format_result_line(i, date, next(readings))
+            if ndjson:
+                yield text + '\n'
+            else:
+                yield (',' if i else '') + text
+        if not ndjson:
+            yield ']'
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+# --- APIエンドポイント: /api/predict/stream (NDJSONのストリーミング) ---
+@app.route('/api/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    NDJSON（1行に1件の生年月日）を読みながら1件ずつ計算し、
+    計算できた結果から順にNDJSONで返す
+
+    リクエスト本文は行単位で読み進めるので、件数が多くても
+    メモリ使用量は1件分に収まる。
+    """
+    def generate():
+        index = 0
+        for raw in request.stream:
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield format_result_line(index, error="JSONとして読み込めません") + '\n'
+            else:
+                try:
+                    date = parse_birthdate(item)
+                except ValueError as e:
+                    yield format_result_line(index, error=str(e)) + '\n'
+                else:
+                    yield format_result_line(index, date, calculate_reading(*date)) + '\n'
+            index += 1
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers=headers)
+
+# --- APIエンドポイント: /api/cache/stats (キャッシュの統計) ---
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(get_cache().stats())
+
+# --- メトリクス: /metrics (Prometheusのテキスト形式) ---
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # --- ルートエンドポイント: / (HTML配信) ---
 @app.route('/')
 def index():
@@ -1,14 +1,20 @@
-import multiprocessing
 import os
+import shutil
 
-# ワーカー数の設定（CPU数に基づく）
-workers = multiprocessing.cpu_count() * 2 + 1
+# 占いごとの計測値を全ワーカーで集計するディレクトリ（アプリの読み込み前に指定し、起動のたびに空にする）
+os.environ.setdefault('METRICS_DIR', '/dev/shm/uranai_metrics')
+shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
 
-# ワーカークラスの設定（標準のsyncワーカーを使用）
-worker_class = 'sync'
+# ワーカー数の設定（Procfile から起動する本番の値。WEB_CONCURRENCY で変更できる）
+# アプリのプロセスプールの大きさもこの値から決めるので、環境変数にも入れておく
+workers = int(os.environ.setdefault('WEB_CONCURRENCY', '4'))
+
+# ワーカークラスの設定（1ワーカーあたり2スレッドで処理する）
+worker_class = 'gthread'
+threads = 2
 
 # タイムアウト設定
-timeout = 60
+timeout = 120
 
 # プリロードの有効化
 preload_app = True
@@ -54,4 +60,14 @@ worker_class_args = {
     'worker_connections': 1000,
     'keepalive': 5,
     'timeout': 30
-} 
\ No newline at end of file
+} 
+# Skyfieldの暦表をマスタープロセスで読み込み、ワーカー間で共有する
+def on_starting(server):
+    from modules import astro
+    try:
+        astro.preload()
+    except Exception as e:
+        server.log.warning(f"Skyfieldの暦表をプリロードできませんでした: {e}")
+    # 事前計算した占い結果の表もフォーク前に開いておく
+    from modules import reading, reading_table
+    reading_table.get_table(reading.cache_version())
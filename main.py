@@ -1,20 +1,93 @@
+"""
+占いAPIサーバー（ASGI版）
+
+    WEB_CONCURRENCY=4 uvicorn main:app
+
+/api/predict（互換のため /predict も）は Flask版（app.py）の /api/predict と
+同じ6種類の占いを返す。事前計算の表やキャッシュにある日付はイベントループ上で
+そのまま返し、計算が必要な場合だけ上限付きのプロセスプールで計算する。
+プールの待ちが上限を超えた場合は429を、時間内に計算が終わらない場合は
+504を返すので、重い日付があっても他の接続は止まらない。
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from datetime import date, datetime
-import logging
-from modules.doubutsu import calculate_animal_fortune
-from modules.kyusei import calculate_kyusei
-from modules.western import calculate_astrology
-from modules.shichuu import calculate_shichuu
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from modules import metrics, reading
+from modules.log_setup import configure_logging
+from modules.request_params import parse_birthdate, parse_birth_time
 
 # ロギングの設定
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# プロセスプールのワーカー数（未指定ならCPU数をuvicornのワーカー数 WEB_CONCURRENCY で割った数）
+POOL_WORKERS = (int(os.environ.get('ASYNC_POOL_WORKERS', 0))
+                or max(1, os.cpu_count() // int(os.environ.get('WEB_CONCURRENCY', 1))))
+# プロセスプールに同時に投入できる件数（実行中と待ちの合計、未指定ならワーカー数の4倍）
+MAX_PENDING = int(os.environ.get('ASYNC_MAX_PENDING', 0)) or POOL_WORKERS * 4
+# 1リクエストの計算を待つ秒数
+REQUEST_TIMEOUT = float(os.environ.get('ASYNC_REQUEST_TIMEOUT', 30))
+# 429のときにクライアントに再試行を促すまでの秒数
+RETRY_AFTER_SECONDS = 1
+
+_executor = None
+_pending = 0
+
+
+def _release():
+    global _pending
+    _pending -= 1
+
+
+async def run_in_pool(func, *args):
+    """
+    プロセスプールで func(*args) を計算して結果を返す
+
+    実行中と待ちの件数が MAX_PENDING に達していれば429を返し、
+    REQUEST_TIMEOUT 秒以内に終わらなければ504を返す。件数はプロセスでの
+    計算が実際に終わった時点で減らすので、時間切れの計算も上限に数える。
+
+    Raises:
+        HTTPException: 429（プールが満杯）または504（時間切れ）
+    """
+    global _pending
+    if _pending >= MAX_PENDING:
+        raise HTTPException(status_code=429, detail="混み合っています。しばらくしてから再度お試しください。",
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    loop = asyncio.get_running_loop()
+    _pending += 1
+    future = _executor.submit(func, *args)
+    # 完了のコールバックはプールのスレッドで呼ばれるので、イベントループに戻して数える
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(_release))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        # まだ始まっていない計算は取り消す
+        future.cancel()
+        raise HTTPException(status_code=504, detail="計算がタイムアウトしました。")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global _executor
+    _executor = ProcessPoolExecutor(max_workers=POOL_WORKERS)
+    logger.info("プロセスプールを開始しました: workers=%d, max_pending=%d", POOL_WORKERS, MAX_PENDING)
+    try:
+        yield
+    finally:
+        _executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORSミドルウェアを追加
 app.add_middleware(
@@ -26,62 +99,66 @@ app.add_middleware(
 )
 
 # 静的ファイルのマウント
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", StaticFiles(directory="static", check_dir=False), name="static")
+
+
+def parse_body(body):
+    """
+    リクエストボディから生年月日と出生時刻を取り出す
+
+    生年月日は year, month, day か、YYYY-MM-DD形式の birthdate で指定する。
 
-class BirthDate(BaseModel):
-    year: int
-    month: int
-    day: int
+    Returns:
+        tuple: (year, month, day, hour, minute, longitude)
+
+    Raises:
+        ValueError: 値が正しく指定されていない場合
+    """
+    if isinstance(body, dict) and 'birthdate' in body:
+        try:
+            birth_date = datetime.strptime(str(body['birthdate']), '%Y-%m-%d')
+        except ValueError:
+            raise ValueError("日付の形式が不正です。YYYY-MM-DD形式で入力してください。")
+        year, month, day = birth_date.year, birth_date.month, birth_date.day
+    else:
+        year, month, day = parse_birthdate(body)
+    hour, minute, longitude = parse_birth_time(body)
+    return year, month, day, hour, minute, longitude
 
-class BirthDateString(BaseModel):
-    birthdate: str
 
 @app.get("/")
 async def root():
     return FileResponse("templates/index.html")
 
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/api/predict")
 @app.post("/predict")
 async def get_fortune(request: Request):
     try:
-        # リクエストボディをログに出力
         body = await request.json()
-        logger.info(f"リクエストボディ: {body}")
-        
-        # リクエストの形式に応じて処理を分岐
-        if 'birthdate' in body:
-            # YYYY-MM-DD形式の場合
-            try:
-                birth_date = datetime.strptime(body['birthdate'], '%Y-%m-%d')
-                year = birth_date.year
-                month = birth_date.month
-                day = birth_date.day
-            except ValueError:
-                raise HTTPException(status_code=422, detail="日付の形式が不正です。YYYY-MM-DD形式で入力してください。")
-        elif 'year' in body and 'month' in body and 'day' in body:
-            # 年、月、日が個別に指定されている場合
-            year = body['year']
-            month = body['month']
-            day = body['day']
-        else:
-            raise HTTPException(status_code=422, detail="リクエストボディに 'birthdate' または 'year', 'month', 'day' が必要です。")
-        
-        # 各占いの計算を実行
-        kyusei_result = calculate_kyusei(year, month, day)
-        western_result = calculate_astrology(year, month, day)
-        animal_result = calculate_animal_fortune(year, month, day)
-        shichuu_result = calculate_shichuu(year, month, day)
-        
-        # 結果をログに出力
-        result = {
-            "kyusei_kigaku": kyusei_result,
-            "western_astrology": western_result,
-            "doubutsu_uranai": animal_result,
-            "shichuu": shichuu_result
-        }
-        logger.info(f"計算結果: {result}")
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"エラー発生: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+    except ValueError:
+        raise HTTPException(status_code=400, detail="データがありません")
+    try:
+        year, month, day, hour, minute, longitude = parse_body(body)
+    except ValueError as e:
+        logger.error("不正な入力データ: %s", body)
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.debug("入力データ: year=%s, month=%s, day=%s, hour=%s", year, month, day, hour)
+
+    date = (year, month, day)
+    # 表やキャッシュにあればイベントループ上でそのまま返す
+    if hour is None:
+        result = reading.lookup_reading(date)
+        if result is not None:
+            return result
+
+    result = await run_in_pool(reading.calculate_reading, year, month, day, hour, minute, longitude)
+    # プロセスプールで計算した結果は、このプロセスのキャッシュにも保存する
+    if hour is None:
+        reading.store_reading(date, result)
+    return result
@@ -0,0 +1,259 @@
+"""
+暦データ（節気・朔・旧暦の月・太陽の星座境界・均時差）の生成と読み込みを行うモジュール
+
+デプロイ前に次のコマンドで modules/data/ 以下に表を書き出しておくと、
+実行時はその表をメモリマップで読むだけになり、ワーカーが暦表
+（de421.bsp）を読み込む必要がなくなる。
+
+    python -m modules.almanac --start 1900 --end 2052
+
+表の範囲外の日付は各モジュールがSkyfieldで計算する。
+"""
+import argparse
+import calendar
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from modules import astro
+
+logger = logging.getLogger(__name__)
+
+# 表の形式を変えたら上げる（古い表は読み込まずにSkyfieldで計算する）
+ALMANAC_VERSION = 4
+
+DATA_DIR = os.environ.get(
+    'ALMANAC_DATA_DIR', os.path.join(os.path.dirname(__file__), 'data'))
+MANIFEST_NAME = 'almanac.json'
+
+# de421.bsp は 1899-07-29 から 2053-10-09 までを収録している
+DEFAULT_START_YEAR = 1900
+DEFAULT_END_YEAR = 2052
+
+_SYNODIC_MONTH = 29.530588861       # 朔望月（日）
+_NEW_MOON_EPOCH = 2451550.09766     # 2000年1月6日の平均朔（TTユリウス日）
+_TOLERANCE_DAYS = 1e-3 / 86400.0    # 求根の収束判定（1ミリ秒）
+
+# 黄道の基準ごとの節気表のファイル名
+_SOLAR_TERM_FILES = {
+    None: 'solar_terms_j2000.npy',
+    'date': 'solar_terms.npy',
+}
+_NEW_MOON_FILE = 'new_moons.npy'
+# 旧暦の月の表（modules/lunisolar.compute_lunar_months）
+_LUNAR_MONTH_FILE = 'lunar_months.npy'
+# 太陽が星座の境界を通過する時刻（先頭は牡羊座に入る時刻）
+_SUN_INGRESS_FILE = 'sun_ingresses.npy'
+# 開始年の1月1日0時（UTC）から1日おきの均時差（分）
+_EQUATION_OF_TIME_FILE = 'equation_of_time.npy'
+
+_table = None
+
+
+def _unix_seconds(dt):
+    """UTCのdatetimeをUNIX秒に変換する"""
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+def _moon_elongation(t):
+    """月と太陽の視黄経の差（瞬時の黄道、度）"""
+    eph = astro.get_ephemeris()
+    earth = eph['earth']
+    moon = earth.at(t).observe(eph['moon']).apparent()
+    sun = earth.at(t).observe(eph['sun']).apparent()
+    lon_moon = moon.ecliptic_latlon(epoch='date')[1].degrees
+    lon_sun = sun.ecliptic_latlon(epoch='date')[1].degrees
+    return (lon_moon - lon_sun) % 360.0
+
+
+def compute_new_moons(start_year, end_year):
+    """
+    指定範囲の朔（新月）の時刻をニュートン法でまとめて計算する
+
+    Args:
+        start_year (int): 開始年
+        end_year (int): 終了年（この年を含む）
+
+    Returns:
+        numpy.ndarray: 朔のUNIX秒（UTC）を昇順に並べた配列
+    """
+    ts = astro.get_timescale()
+    start = ts.utc(start_year, 1, 1)
+    end = ts.utc(end_year + 1, 1, 1)
+    first = int(np.floor((start.tt - _NEW_MOON_EPOCH) / _SYNODIC_MONTH))
+    last = int(np.ceil((end.tt - _NEW_MOON_EPOCH) / _SYNODIC_MONTH))
+    jd = _NEW_MOON_EPOCH + _SYNODIC_MONTH * np.arange(first, last + 1)
+    rate = 360.0 / _SYNODIC_MONTH
+    for _ in range(30):
+        diff = (_moon_elongation(ts.tt_jd(jd)) + 180.0) % 360.0 - 180.0
+        step = diff / rate
+        jd -= step
+        if np.max(np.abs(step)) < _TOLERANCE_DAYS:
+            break
+    jd = jd[(jd >= start.tt) & (jd < end.tt)]
+    return np.array([_unix_seconds(dt) for dt in ts.tt_jd(jd).utc_datetime()])
+
+
+def build(start_year=DEFAULT_START_YEAR, end_year=DEFAULT_END_YEAR, data_dir=DATA_DIR):
+    """
+    節気表・朔の表・旧暦の月の表・太陽の星座境界の表・均時差の表を計算して data_dir に書き出す
+
+    Args:
+        start_year (int): 開始年
+        end_year (int): 終了年（この年を含む）
+        data_dir (str): 出力先ディレクトリ
+
+    Returns:
+        dict: 書き出したマニフェスト
+    """
+    from modules import lunisolar, sekki, solar_time, western
+
+    os.makedirs(data_dir, exist_ok=True)
+    arrays = {}
+    terms = {}
+    for epoch, filename in _SOLAR_TERM_FILES.items():
+        terms[epoch] = sekki.compute_solar_terms(start_year, end_year, epoch)
+        np.save(os.path.join(data_dir, filename), terms[epoch])
+        arrays[filename] = list(terms[epoch].shape)
+    new_moons = compute_new_moons(start_year, end_year)
+    np.save(os.path.join(data_dir, _NEW_MOON_FILE), new_moons)
+    arrays[_NEW_MOON_FILE] = list(new_moons.shape)
+    lunar_months = lunisolar.compute_lunar_months(new_moons, terms['date'])
+    np.save(os.path.join(data_dir, _LUNAR_MONTH_FILE), lunar_months)
+    arrays[_LUNAR_MONTH_FILE] = list(lunar_months.shape)
+    # 太陽が魚座にいる3月1日から探して、先頭を牡羊座に入る時刻にそろえる
+    ingresses, signs = western.find_sign_ingress_times(
+        'sun',
+        datetime(start_year, 3, 1, tzinfo=timezone.utc),
+        datetime(end_year + 1, 3, 1, tzinfo=timezone.utc))
+    assert signs[0] == 0 and all(signs == np.arange(len(signs)) % 12)
+    np.save(os.path.join(data_dir, _SUN_INGRESS_FILE), ingresses)
+    arrays[_SUN_INGRESS_FILE] = list(ingresses.shape)
+    ts = astro.get_timescale()
+    days = (datetime(end_year + 1, 1, 1) - datetime(start_year, 1, 1)).days + 1
+    equation = solar_time.compute_equation_of_time(ts.utc(start_year, 1, np.arange(1, days + 1)))
+    np.save(os.path.join(data_dir, _EQUATION_OF_TIME_FILE), equation)
+    arrays[_EQUATION_OF_TIME_FILE] = list(equation.shape)
+
+    manifest = {
+        'version': ALMANAC_VERSION,
+        'start_year': start_year,
+        'end_year': end_year,
+        'ephemeris': astro.EPHEMERIS_NAME,
+        'arrays': arrays,
+    }
+    with open(os.path.join(data_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return manifest
+
+
+def load_table(data_dir=DATA_DIR):
+    """
+    ビルド済みの暦データをメモリマップで読み込む
+
+    Returns:
+        dict or None: マニフェストと各配列（データがない・版が違う場合はNone）
+    """
+    path = os.path.join(data_dir, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        logger.warning(f"暦データが見つかりません: {path}")
+        return None
+    if manifest.get('version') != ALMANAC_VERSION:
+        logger.warning(f"暦データの版が一致しません: {manifest.get('version')} != {ALMANAC_VERSION}")
+        return None
+    table = {'manifest': manifest}
+    for filename in manifest['arrays']:
+        table[filename] = np.load(os.path.join(data_dir, filename), mmap_mode='r')
+    return table
+
+
+def _get_table():
+    """暦データを初回のみ読み込む（読み込めなかった場合は空の辞書）"""
+    global _table
+    if _table is None:
+        _table = load_table() or {}
+    return _table
+
+
+def year_range():
+    """暦データが収録している年の範囲 (開始年, 終了年) を返す（データがなければNone）"""
+    manifest = _get_table().get('manifest')
+    if manifest is None:
+        return None
+    return manifest['start_year'], manifest['end_year']
+
+
+def get_solar_terms(year, epoch=None):
+    """
+    指定年の立春から始まる24節気の時刻を暦データから返す
+
+    Args:
+        year (int): 年
+        epoch: 黄道の基準（None でJ2000、'date' で瞬時の黄道）
+
+    Returns:
+        numpy.ndarray or None: 24節気のUNIX秒（範囲外ならNone）
+    """
+    table = _get_table()
+    terms = table.get(_SOLAR_TERM_FILES[epoch])
+    if terms is None:
+        return None
+    start_year = table['manifest']['start_year']
+    if not 0 <= year - start_year < len(terms):
+        return None
+    return terms[year - start_year]
+
+
+def get_new_moons():
+    """暦データの朔のUNIX秒の配列を返す（データがなければNone）"""
+    return _get_table().get(_NEW_MOON_FILE)
+
+
+def get_lunar_months():
+    """
+    暦データの旧暦の月の表を返す（データがなければNone）
+
+    列は modules/lunisolar の START, YEAR, MONTH, LEAP で、最後の行は表の終わり。
+    """
+    return _get_table().get(_LUNAR_MONTH_FILE)
+
+
+def get_sun_ingresses():
+    """
+    暦データの太陽の星座境界の通過時刻（UNIX秒）の配列を返す
+
+    添字を12で割った余りが通過後の星座番号（牡羊座＝0）になる。
+    データがなければNoneを返す。
+    """
+    return _get_table().get(_SUN_INGRESS_FILE)
+
+
+def get_equation_of_time():
+    """暦データの日ごとの均時差（分）の配列を返す（データがなければNone）"""
+    return _get_table().get(_EQUATION_OF_TIME_FILE)
+
+
+def equation_of_time_start():
+    """均時差の表の先頭（開始年の1月1日0時UTC）のUNIX秒を返す"""
+    return calendar.timegm((_get_table()['manifest']['start_year'], 1, 1, 0, 0, 0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='節気・朔・旧暦の月・太陽の星座境界・均時差の暦データを生成する')
+    parser.add_argument('--start', type=int, default=DEFAULT_START_YEAR, help='開始年')
+    parser.add_argument('--end', type=int, default=DEFAULT_END_YEAR, help='終了年')
+    parser.add_argument('--output', default=DATA_DIR, help='出力先ディレクトリ')
+    args = parser.parse_args(argv)
+    manifest = build(args.start, args.end, args.output)
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
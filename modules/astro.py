@@ -0,0 +1,112 @@
+"""
+Skyfieldの共有コンテキスト
+
+タイムスケールと暦表（de421.bsp）をプロセスごとに一度だけロードし、
+全ての占いモジュールで共有する。gunicorn の preload_app = True では
+マスタープロセスで preload() を呼んでおくと、暦表のメモリマップが
+フォーク後のワーカー間でコピーオンライトで共有される。
+"""
+import os
+import threading
+import time
+
+from skyfield.api import Loader, Topos
+
+EPHEMERIS_NAME = 'de421.bsp'
+
+# 西洋占星術の観測地（東京）
+TOKYO_LATITUDE = 35.6895
+TOKYO_LONGITUDE = 139.6917
+
+_lock = threading.Lock()
+_ts = None
+_eph = None
+_tokyo = None
+_stats = {'hits': 0, 'misses': 0, 'load_seconds': 0.0}
+
+
+def _loader():
+    """SKYFIELD_DATA_DIR（未指定ならカレントディレクトリ）を参照するローダー"""
+    return Loader(os.environ.get('SKYFIELD_DATA_DIR', '.'), verbose=False)
+
+
+def _load():
+    """タイムスケールと暦表を未ロードならロードする（呼び出し側でロックを取る）"""
+    global _ts, _eph, _tokyo
+    if _eph is not None:
+        _stats['hits'] += 1
+        return
+    _stats['misses'] += 1
+    started = time.perf_counter()
+    load = _loader()
+    _ts = load.timescale()
+    _eph = load(EPHEMERIS_NAME)
+    _tokyo = _eph['earth'] + Topos(latitude_degrees=TOKYO_LATITUDE,
+                                   longitude_degrees=TOKYO_LONGITUDE)
+    _stats['load_seconds'] += time.perf_counter() - started
+
+
+def _ensure_loaded():
+    if _eph is not None:
+        _stats['hits'] += 1
+        return
+    with _lock:
+        _load()
+
+
+def get_timescale():
+    """共有のタイムスケールを返す"""
+    _ensure_loaded()
+    return _ts
+
+
+def get_ephemeris():
+    """共有の暦表（de421.bsp）を返す"""
+    _ensure_loaded()
+    return _eph
+
+
+def get_tokyo():
+    """東京の観測地点（地球 + Topos）を返す"""
+    _ensure_loaded()
+    return _tokyo
+
+
+def preload():
+    """
+    暦表をロードし、使用する天体のセグメントを読み込んでおく
+
+    フォーク前に呼ぶと、ワーカーがそれぞれ暦表を開き直す必要がなくなる。
+    """
+    ts = get_timescale()
+    eph = get_ephemeris()
+    t = ts.utc(2000, 1, 1)
+    earth = eph['earth']
+    for name in ('sun', 'moon'):
+        earth.at(t).observe(eph[name])
+    _tokyo.at(t)
+
+
+def stats():
+    """
+    ロードの統計を返す
+
+    Returns:
+        dict: hits（ロード済みで再利用した回数）、misses（ロードした回数）、
+              load_seconds（ロードに要した秒数）、loaded、pid
+    """
+    result = dict(_stats)
+    result['loaded'] = _eph is not None
+    result['pid'] = os.getpid()
+    return result
+
+
+def _after_fork_in_child():
+    """フォーク後の子プロセスでロックと統計を初期化する（暦表は親と共有する）"""
+    global _lock
+    _lock = threading.Lock()
+    _stats.update(hits=0, misses=0, load_seconds=0.0)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
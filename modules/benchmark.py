@@ -0,0 +1,324 @@
+"""
+占いモジュールと /api/predict のベンチマーク
+
+    python -m modules.benchmark --output bench.json
+    python -m modules.benchmark --output new.json --compare bench.json
+
+次の値を測り、JSONに書き出す。
+
+    cold      新しいプロセスでのモジュールの読み込み時間と最初の1回の計算時間
+    per_call  読み込み済みのプロセスでの1件ずつの計算時間（初めての日付と、同じ日付の2回目）
+    batch     日付の配列をまとめて計算する関数の処理速度
+    endpoint  Flaskのテストクライアントで /api/predict を呼んだときの時間
+              （キャッシュを空にした1回目と、同じ日付の2回目）
+
+日付は暦データの範囲から乱数の種を固定して選ぶので、同じ環境なら毎回同じ
+日付で測る。--compare を指定すると、前回のJSONと時間の値を比べて
+--threshold 倍より遅くなった項目を表示し、1つでもあれば終了コード1で終わる。
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+# 1件ずつの計算を測る関数（名前: (モジュール, 関数名)）
+PER_CALL = {
+    'shichuu': ('modules.shichuu', 'calculate_shichuu'),
+    'kyusei_honmei': ('modules.kyusei', 'calculate_honmei'),
+    'kyusei_gatsumei': ('modules.kyusei', 'calculate_gatsumei'),
+    'sukuyo': ('modules.sukuyo', 'calculate_sukuyo'),
+    'western': ('modules.western', 'calculate_western_astrology'),
+    'animal': ('modules.doubutsu', 'calculate_animal_fortune'),
+    'inyou': ('modules.inyou', 'calculate_inyou_gogyo'),
+}
+
+# 日付の配列をまとめて計算する関数（名前: (モジュール, 関数名, 入力の形式)）
+# 入力の形式は 'datetime64'（datetime64[D] の配列）または 'tuples'（(year, month, day) のリスト）
+BATCH = {
+    'shichuu_year_indices': ('modules.pillars', 'year_indices', 'datetime64'),
+    'shichuu_month_indices': ('modules.pillars', 'month_indices', 'datetime64'),
+    'kyusei': ('modules.kyusei', 'calculate_kyusei_batch', 'datetime64'),
+    'sukuyo': ('modules.sukuyo', 'calculate_sukuyo_batch', 'datetime64'),
+    'western': ('modules.western', 'calculate_western_astrology_batch', 'tuples'),
+    'animal': ('modules.doubutsu', 'calculate_animal_codes', 'datetime64'),
+    'inyou_day_indices': ('modules.pillars', 'day_indices', 'datetime64'),
+}
+
+DEFAULT_SEED = 20240101
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load(module, name):
+    return getattr(importlib.import_module(module), name)
+
+
+def sample_dates(count, seed=DEFAULT_SEED):
+    """
+    暦データの範囲から重複のない日付を選ぶ
+
+    Returns:
+        list: (year, month, day) のタプルのリスト
+    """
+    from modules import almanac
+
+    years = almanac.year_range() or (almanac.DEFAULT_START_YEAR, almanac.DEFAULT_END_YEAR)
+    first = date(years[0], 1, 1).toordinal()
+    last = date(years[1], 12, 31).toordinal()
+    ordinals = random.Random(seed).sample(range(first, last + 1), count)
+    return [date.fromordinal(o).timetuple()[:3] for o in ordinals]
+
+
+def _summary(seconds):
+    """計算時間の並びを統計値（マイクロ秒）にする"""
+    seconds = sorted(seconds)
+    return {
+        'calls': len(seconds),
+        'mean_us': statistics.fmean(seconds) * 1e6,
+        'median_us': statistics.median(seconds) * 1e6,
+        'p95_us': seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))] * 1e6,
+        'calls_per_second': len(seconds) / sum(seconds) if sum(seconds) else None,
+    }
+
+
+def _time_calls(func, dates):
+    timings = []
+    for args in dates:
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_per_call(dates, warmup_dates):
+    """
+    1件ずつの計算時間を測る
+
+    モジュールの表を読み込むために別の日付で一通り計算してから、
+    初めての日付（first）と同じ日付の2回目（repeat、関数内のキャッシュが効く）を測る。
+    """
+    results = {}
+    for name, (module, func_name) in PER_CALL.items():
+        func = _load(module, func_name)
+        _time_calls(func, warmup_dates)
+        results[name] = {
+            'first': _summary(_time_calls(func, dates)),
+            'repeat': _summary(_time_calls(func, dates)),
+        }
+    return results
+
+
+def bench_batch(start, days, repeat):
+    """日付の配列をまとめて計算する関数の処理速度を測る（repeat 回の最短時間）"""
+    dates = np.arange(np.datetime64(start, 'D'), np.datetime64(start, 'D') + days)
+    tuples = [d.timetuple()[:3] for d in dates.astype(object)]
+    results = {}
+    for name, (module, func_name, kind) in BATCH.items():
+        func = _load(module, func_name)
+        argument = dates if kind == 'datetime64' else tuples
+        func(argument[:10])
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func(argument)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        results[name] = {'dates': days, 'best_s': best, 'dates_per_second': days / best if best else None}
+    return results
+
+
+def _cold_child(name):
+    """新しいプロセスで呼ばれ、読み込み時間と最初の1回の計算時間をJSONで出力する"""
+    logging.disable(logging.CRITICAL)
+    module, func_name = PER_CALL[name]
+    started = time.perf_counter()
+    func = _load(module, func_name)
+    imported = time.perf_counter()
+    func(1990, 5, 15)
+    finished = time.perf_counter()
+    print(json.dumps({'import_s': imported - started, 'first_call_s': finished - imported}))
+
+
+def bench_cold(repeat):
+    """
+    新しいプロセスでの読み込み時間と最初の1回の計算時間を測る（repeat 回の中央値）
+
+    プロセスの起動時間は含めない。
+    """
+    results = {}
+    for name in PER_CALL:
+        runs = []
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, '-m', 'modules.benchmark', '--cold-child', name],
+                capture_output=True, text=True, check=True, cwd=_ROOT).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        results[name] = {key: statistics.median(run[key] for run in runs)
+                         for key in ('import_s', 'first_call_s')}
+    return results
+
+
+def bench_endpoint(dates):
+    """
+    Flaskのテストクライアントで /api/predict を呼んだときの時間を測る
+
+    キャッシュを空にした1回目（first）と、同じ日付の2回目（repeat）を測る。
+    事前計算の表がある場合はどちらも表から返る。
+    """
+    from app import app
+    from modules import reading
+
+    # app の読み込みで設定されたログは測定の邪魔になるので止める
+    logging.disable(logging.CRITICAL)
+    client = app.test_client()
+    reading.get_cache().clear()
+
+    def call(year, month, day):
+        response = client.post('/api/predict', json={'year': year, 'month': month, 'day': day})
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/predict が {response.status_code} を返しました: {year}-{month}-{day}")
+
+    return {
+        'table_loaded': reading.reading_table.get_table(reading.cache_version()) is not None,
+        'first': _summary(_time_calls(call, dates)),
+        'repeat': _summary(_time_calls(call, dates)),
+    }
+
+
+def _environment():
+    from modules import reading
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=_ROOT).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'reading_version': reading.cache_version(),
+    }
+
+
+def run(samples=200, batch_days=36525, batch_start='1950-01-01', repeat=3, seed=DEFAULT_SEED,
+        cold=True, endpoint=True):
+    """
+    ベンチマークを実行して結果を返す
+
+    Args:
+        samples (int): 1件ずつの計算と /api/predict で使う日付の数
+        batch_days (int): バッチの計算で使う日数
+        batch_start (str): バッチの計算の開始日
+        repeat (int): バッチとコールドスタートの繰り返し回数
+        seed (int): 日付を選ぶ乱数の種
+        cold (bool): コールドスタートを測るか
+        endpoint (bool): /api/predict を測るか
+
+    Returns:
+        dict: 結果（JSONに書き出せる形式）
+    """
+    dates = sample_dates(samples * 2, seed)
+    measured, warmup = dates[:samples], dates[samples:]
+    result = {
+        'environment': _environment(),
+        'settings': {'samples': samples, 'batch_days': batch_days, 'batch_start': batch_start,
+                     'repeat': repeat, 'seed': seed},
+    }
+    if cold:
+        result['cold'] = bench_cold(repeat)
+    result['per_call'] = bench_per_call(measured, warmup)
+    result['batch'] = bench_batch(batch_start, batch_days, repeat)
+    if endpoint:
+        # 1件ずつの計算で関数内のキャッシュに入った日付を避ける
+        result['endpoint'] = bench_endpoint(warmup)
+    return result
+
+
+def _flatten(result, prefix=''):
+    for key, value in result.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _flatten(value, path)
+        else:
+            yield path, value
+
+
+def compare(new, old, threshold=1.2):
+    """
+    2回の結果の時間の値（*_us と *_s）を比べる
+
+    Returns:
+        list: (項目, 前回の値, 今回の値, 比) のうち、比が threshold を超えたもののリスト
+    """
+    old_values = dict(_flatten(old))
+    regressions = []
+    for path, value in _flatten(new):
+        if not path.endswith(('_us', '_s')) or path.startswith('environment'):
+            continue
+        previous = old_values.get(path)
+        if not previous or value is None:
+            continue
+        ratio = value / previous
+        if ratio > threshold:
+            regressions.append((path, previous, value, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='占いモジュールと /api/predict のベンチマーク')
+    parser.add_argument('--output', help='結果のJSONの出力先（省略時は標準出力）')
+    parser.add_argument('--samples', type=int, default=200, help='1件ずつの計算で使う日付の数')
+    parser.add_argument('--batch-days', type=int, default=36525, help='バッチの計算で使う日数')
+    parser.add_argument('--batch-start', default='1950-01-01', help='バッチの計算の開始日（YYYY-MM-DD）')
+    parser.add_argument('--repeat', type=int, default=3, help='バッチとコールドスタートの繰り返し回数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='日付を選ぶ乱数の種')
+    parser.add_argument('--no-cold', action='store_true', help='コールドスタートを測らない')
+    parser.add_argument('--no-endpoint', action='store_true', help='/api/predict を測らない')
+    parser.add_argument('--compare', help='比べる前回の結果のJSON')
+    parser.add_argument('--threshold', type=float, default=1.2, help='遅くなったとみなす比')
+    parser.add_argument('--cold-child', choices=sorted(PER_CALL), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cold_child:
+        _cold_child(args.cold_child)
+        return 0
+
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args.samples, args.batch_days, args.batch_start, args.repeat, args.seed,
+                 cold=not args.no_cold, endpoint=not args.no_endpoint)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+        if previous.get('settings') != result['settings']:
+            print("前回と設定が異なるため、比較の結果は参考値です", file=sys.stderr)
+        regressions = compare(result, previous, args.threshold)
+        for path, previous, value, ratio in regressions:
+            print(f"{path}: {previous:.6g} -> {value:.6g} ({ratio:.2f}倍)", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+占い結果のキャッシュ
+
+同じ生年月日の占い結果は常に同じなので、6種類をまとめた結果を
+生年月日と計算の版をキーにして保存しておく。
+
+プロセス内のLRU（件数上限と任意のTTL付き）を前段に置き、
+READING_CACHE_BACKEND=sqlite を指定すると、SQLiteファイルを
+全ワーカーで共有する後段のストアとして使う。
+
+    READING_CACHE_SIZE     プロセス内LRUの最大件数（0で無効、既定 4096）
+    READING_CACHE_TTL      有効期限（秒、0で無期限、既定 0）
+    READING_CACHE_BACKEND  共有ストア（'' または 'sqlite'）
+    READING_CACHE_PATH     SQLiteファイルのパス（既定 /dev/shm/uranai_cache.sqlite3）
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.environ.get('READING_CACHE_SIZE', 4096))
+CACHE_TTL = float(os.environ.get('READING_CACHE_TTL', 0))
+CACHE_BACKEND = os.environ.get('READING_CACHE_BACKEND', '')
+CACHE_PATH = os.environ.get('READING_CACHE_PATH', '/dev/shm/uranai_cache.sqlite3')
+
+_cache = None
+
+
+def _expired(stored_at, ttl, now):
+    return bool(ttl) and now - stored_at >= ttl
+
+
+class LRUStore:
+    """件数上限とTTL付きのプロセス内ストア（値はJSON文字列で保持する）"""
+
+    def __init__(self, maxsize, ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if _expired(stored_at, self.ttl, time.time()):
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteStore:
+    """
+    全ワーカーで共有するSQLiteファイルのストア
+
+    接続はプロセスとスレッドごとに開き直す（フォーク前の接続は使わない）。
+    """
+
+    def __init__(self, path, ttl=0):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('CREATE TABLE IF NOT EXISTS readings '
+                     '(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)')
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, stored_at FROM readings WHERE key = ?', (key,)).fetchone()
+        if row is None or _expired(row[1], self.ttl, time.time()):
+            return None
+        return row[0]
+
+    def set(self, key, value):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO readings (key, value, stored_at) VALUES (?, ?, ?)',
+            (key, value, time.time()))
+
+    def clear(self):
+        self._connect().execute('DELETE FROM readings')
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM readings').fetchone()[0]
+
+
+class ReadingCache:
+    """
+    プロセス内LRUと任意の共有ストアを重ねたキャッシュ
+
+    Args:
+        version (str): 計算の版（キーに含め、表や計算が変わったら別のキーになる）
+        memory (LRUStore): プロセス内のストア
+        shared: 共有ストア（get/set/clear を持つオブジェクト、なければNone）
+    """
+
+    def __init__(self, version, memory, shared=None):
+        self.version = version
+        self.memory = memory
+        self.shared = shared
+        self._stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'errors': 0}
+
+    def _key(self, year, month, day):
+        return f"{self.version}:{year:04d}-{month:02d}-{day:02d}"
+
+    def get(self, year, month, day):
+        """キャッシュ済みの結果を返す（なければNone）"""
+        key = self._key(year, month, day)
+        value = self.memory.get(key)
+        if value is not None:
+            self._stats['hits'] += 1
+            return json.loads(value)
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except sqlite3.Error as e:
+                self._stats['errors'] += 1
+                logger.warning(f"共有キャッシュの読み込みに失敗: {e}")
+                value = None
+            if value is not None:
+                self._stats['shared_hits'] += 1
+                self.memory.set(key, value)
+                return json.loads(value)
+        self._stats['misses'] += 1
+        return None
+
+    def set(self, year, month, day, result):
+        """結果を保存する"""
+        key = self._key(year, month, day)
+        value = json.dumps(result, ensure_ascii=False)
+        self.memory.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+            except sqlite3.Error as e:
+                self._stats['errors'] += 1
+                logger.warning(f"共有キャッシュへの書き込みに失敗: {e}")
+
+    def clear(self):
+        self.memory.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        """
+        ヒット率などの統計を返す
+
+        Returns:
+            dict: hits（プロセス内LRUのヒット数）、shared_hits（共有ストアのヒット数）、
+                  misses、errors、hit_rate、size、maxsize、ttl、backend、version、pid
+        """
+        result = dict(self._stats)
+        lookups = result['hits'] + result['shared_hits'] + result['misses']
+        result['hit_rate'] = (result['hits'] + result['shared_hits']) / lookups if lookups else 0.0
+        result['size'] = len(self.memory)
+        result['maxsize'] = self.memory.maxsize
+        result['ttl'] = self.memory.ttl
+        result['backend'] = type(self.shared).__name__ if self.shared is not None else None
+        result['version'] = self.version
+        result['pid'] = os.getpid()
+        return result
+
+    def reset_stats(self):
+        self._stats.update(hits=0, shared_hits=0, misses=0, errors=0)
+
+
+def create_cache(version, size=CACHE_SIZE, ttl=CACHE_TTL, backend=CACHE_BACKEND, path=CACHE_PATH):
+    """
+    設定からキャッシュを作成する
+
+    Args:
+        version (str): 計算の版
+        size (int): プロセス内LRUの最大件数
+        ttl (float): 有効期限（秒、0で無期限）
+        backend (str): 共有ストアの種類（'' または 'sqlite'）
+        path (str): SQLiteファイルのパス
+
+    Returns:
+        ReadingCache: キャッシュ
+    """
+    shared = None
+    if backend == 'sqlite':
+        shared = SQLiteStore(path, ttl)
+    elif backend:
+        logger.warning(f"不明なキャッシュのバックエンドです: {backend}")
+    return ReadingCache(version, LRUStore(size, ttl), shared)
+
+
+def get_cache(version):
+    """プロセスで共有するキャッシュを初回のみ作成して返す"""
+    global _cache
+    if _cache is None or _cache.version != version:
+        _cache = create_cache(version)
+    return _cache
+
+
+def _after_fork_in_child():
+    """フォーク後の子プロセスで統計を初期化する（LRUの中身は親から引き継ぐ）"""
+    if _cache is not None:
+        _cache.memory._lock = threading.Lock()
+        _cache.reset_stats()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
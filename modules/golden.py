@@ -0,0 +1,545 @@
+"""
+占い結果の回帰確認用の正解データ（ゴールデンファイル）
+
+高速化を始める前の実装（BASELINE_COMMIT の app.py の /api/predict）の結果を、
+固定した日付の標本について保存しておき、高速化した計算の経路（エンジン）の
+結果と比べる。
+
+    python -m modules.golden build
+    python -m modules.golden check --engine vectorized --systems shichuu,inyou,western
+
+正解データは、BASELINE_COMMIT を一時的な git worktree に取り出し、その中で
+Flask のテストクライアントから /api/predict を呼んで計算する。元の実装の
+節入りの計算（1分刻みの探索）は1年分で約1分かかるので、年だけで決まる
+関数をメモ化し、日付を年ごとにまとめて計算する（結果は変わらない）。
+元の実装の結果にある途中経過の項目（DROPPED_PATHS）は保存しない。
+
+日付の標本は、暦データの範囲から乱数の種を固定して選んだ日付に、
+結果が変わりやすい境界の日付を全て加えたものにする。
+
+    節入り   各年の12の節（立春を含む）の日本時間の日付と前後1日
+             （J2000と瞬時の黄道の両方の時刻）
+    旧暦の月 旧暦の各月の初日とその前日
+
+保存は modules/reading_table の列の形式（値の辞書と番号の配列）を使い、
+1つの圧縮した .npz にまとめる。計算と比較はチャンクごとにプロセスプールで
+並列に行う。比べるのは正解データにある項目だけで、後から追加した項目
+（kyusei.nichimei など）は比べない。意図して計算を変えた占い（旧暦を
+計算するようにした宿曜、全期間に対応したどうぶつ占い、節入りの日付を
+天体暦で求めるようにした九星気学、月干を五虎遁で求めるようにした
+四柱推命の月干の宿命星）の違いも不一致として数えるので、
+--systems で比べる占いを選ぶ。
+
+エンジンは日付のリスト（(year, month, day) のタプル）を受け取り、
+/api/predict と同じ形式の結果のリストを返す関数で、ENGINES の名前か
+'モジュール:関数' で指定する。
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+
+import numpy as np
+
+from modules import reading_table
+
+logger = logging.getLogger(__name__)
+
+# 正解データの形式を変えたら上げる
+GOLDEN_FORMAT_VERSION = 2
+
+GOLDEN_PATH = os.environ.get(
+    'GOLDEN_PATH', os.path.join(os.path.dirname(__file__), 'data', 'golden', 'golden.npz'))
+
+# 正解データを計算する実装のコミット（高速化を始める前の版）
+BASELINE_COMMIT = 'e7e12d36df15f1946525e7ac554a056ed4c3c513'
+# 元の実装の結果のうち、正解データに含めない途中経過の項目
+DROPPED_PATHS = (('sukuyo', 'debug'),)
+
+DEFAULT_SAMPLES = 20000
+DEFAULT_SEED = 20240101
+# プロセスプールの1タスクで計算・比較する日付の数
+CHUNK_SIZE = 256
+# 浮動小数点数の値（黄経）の許容誤差（度）。正解データも表と同じく float32 で保存するので、
+# その丸めの誤差（360°付近で約0.00002°）より大きくする
+FLOAT_TOLERANCE = 1e-4
+
+# 日付の種類（ビットの組み合わせ）
+RANDOM = 1
+SETSUIRI = 2
+LUNAR_MONTH = 4
+KIND_NAMES = {RANDOM: 'random', SETSUIRI: 'setsuiri', LUNAR_MONTH: 'lunar_month'}
+
+_UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# 比較の対象の正解データ（プロセスプールの各プロセスで初回のみ読み込む）
+_golden = None
+
+
+def _jst_ordinals(seconds):
+    """UNIX秒の配列を日本時間の日付の date.toordinal() の値の配列にする"""
+    return np.floor((np.asarray(seconds) + 9 * 3600) / 86400).astype(np.int64) + _UNIX_EPOCH_ORDINAL
+
+
+def sample_dates(samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED):
+    """
+    正解データの日付の標本を作る
+
+    Args:
+        samples (int): 乱数で選ぶ日付の数
+        seed (int): 乱数の種
+
+    Returns:
+        tuple: (date.toordinal() の配列（昇順）, 日付の種類のビットの配列)
+    """
+    from modules import almanac
+
+    years = almanac.year_range()
+    if years is None:
+        raise RuntimeError("暦データがありません（python -m modules.almanac で生成してください）")
+    first = date(years[0], 1, 1).toordinal()
+    last = date(years[1], 12, 31).toordinal()
+    kinds = Counter()
+
+    for ordinal in random.Random(seed).sample(range(first, last + 1), samples):
+        kinds[ordinal] |= RANDOM
+
+    # 節（節気表の偶数番目の列、立春＝0）の日付と前後1日
+    for epoch in (None, 'date'):
+        for year in range(years[0], years[1] + 1):
+            terms = almanac.get_solar_terms(year, epoch=epoch)
+            if terms is None:
+                continue
+            for ordinal in _jst_ordinals(terms[0::2]).tolist():
+                for offset in (-1, 0, 1):
+                    kinds[ordinal + offset] |= SETSUIRI
+
+    # 旧暦の各月の初日とその前日
+    from modules import lunisolar
+    months = almanac.get_lunar_months()
+    if months is not None:
+        for ordinal in months[:, lunisolar.START].tolist():
+            for offset in (-1, 0):
+                kinds[ordinal + offset] |= LUNAR_MONTH
+
+    ordinals = np.array(sorted(o for o in kinds if first <= o <= last), dtype=np.int32)
+    return ordinals, np.array([kinds[o] for o in ordinals.tolist()], dtype=np.uint8)
+
+
+# --- エンジン ---
+def scalar_engine(dates):
+    """1件ずつの計算（reading.compute_reading）"""
+    from modules import reading
+    return [reading.compute_reading(*d) for d in dates]
+
+
+def table_engine(dates):
+    """事前計算の表（modules/reading_table）。表にない日付はNone"""
+    from modules import reading
+    table = reading_table.get_table(reading.cache_version())
+    if table is None:
+        raise RuntimeError("占い結果の表がありません（python -m modules.reading_table で生成してください）")
+    return [table.lookup(*d) for d in dates]
+
+
+def vectorized_engine(dates):
+    """
+    日付の配列のまま計算する各モジュールの関数で、6種類の占いをまとめて求める
+
+    四柱推命・陰陽五行は pillars の柱の番号の配列から、九星気学・宿曜・
+    どうぶつ占い・西洋占星術は各モジュールのバッチの関数から求める。
+    """
+    from modules import doubutsu, kanshi, kyusei, lunisolar, pillars, shichuu, sukuyo, western
+
+    days = np.array([np.datetime64(date(*d), 'D') for d in dates])
+    day_index = pillars.day_indices(days).astype(np.int64)
+    year_index = pillars.year_indices(days).astype(np.int64)
+    month_index = pillars.month_indices(days).astype(np.int64)
+    month_eto = kanshi.month_eto(year_index, month_index)
+    day_stem, stage, month_star, hidden_star = shichuu.get_sizhu_codes(
+        day_index, kanshi.stem_of(month_eto), kanshi.branch_of(month_eto))
+
+    stars = kyusei.calculate_kyusei_batch(days)
+    mansions = sukuyo.calculate_sukuyo_batch(days)
+    _, old_months, old_days, leaps = lunisolar.to_lunar_dates(days)
+    animals = doubutsu.calculate_animal_fortune_batch(days)
+    westerns = western.calculate_western_astrology_batch(dates)
+
+    results = []
+    for i, d in enumerate(dates):
+        if old_months[i]:
+            lunar = {
+                "mansion": sukuyo.mansion_names[mansions[i]],
+                "lunar_date": f"{'閏' if leaps[i] else ''}{old_months[i]}月{old_days[i]}日",
+                "base": sukuyo.get_base_for_month(int(old_months[i])),
+            }
+        else:
+            lunar = sukuyo.calculate_sukuyo(*d)
+        results.append({
+            "shichuu": {
+                "day_gan": kanshi.STEM_NAMES[day_stem[i]],
+                "twelve_operation": kanshi.TWELVE_STAGE_NAMES[stage[i]],
+                "month_gan_destiny_star": kanshi.STAR_NAMES[month_star[i]],
+                "month_zhi_hidden_gan_destiny_star": kanshi.STAR_NAMES[hidden_star[i]],
+            },
+            "kyusei": {
+                "honmei": kyusei.KYUSEI_NAMES[stars.honmei[i] - 1],
+                "gatsumei": kyusei.KYUSEI_NAMES[stars.gatsumei[i] - 1],
+                "nichimei": kyusei.KYUSEI_NAMES[stars.nichimei[i] - 1],
+            },
+            "sukuyo": lunar,
+            "western": westerns[i],
+            "animal": {"animal_character": animals[i]},
+            "inyou": {
+                "gogyo": kanshi.ELEMENT_NAMES[kanshi.STEM_ELEMENT[day_stem[i]]],
+                "inyo": kanshi.POLARITY_NAMES[kanshi.STEM_POLARITY[day_stem[i]]],
+            },
+        })
+    return results
+
+
+ENGINES = {
+    'scalar': scalar_engine,
+    'table': table_engine,
+    'vectorized': vectorized_engine,
+}
+
+
+def get_engine(name):
+    """ENGINES の名前か 'モジュール:関数' からエンジンの関数を返す"""
+    if name in ENGINES:
+        return ENGINES[name]
+    module, sep, func = name.partition(':')
+    if not sep:
+        raise ValueError(f"不明なエンジンです: {name}")
+    return getattr(importlib.import_module(module), func)
+
+
+# --- 正解データの読み書き ---
+def _to_dates(ordinals):
+    return [date.fromordinal(o).timetuple()[:3] for o in ordinals]
+
+
+def _split(ordinals):
+    return [ordinals[i:i + CHUNK_SIZE].tolist() for i in range(0, len(ordinals), CHUNK_SIZE)]
+
+
+def _map_chunks(func, chunks, jobs, *args):
+    """日付のチャンクごとに func(*args, チャンク) をプロセスプールで並列に実行し、入力順に返す"""
+    if jobs == 1:
+        return [func(*args, chunk) for chunk in chunks]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(func, *([arg] * len(chunks) for arg in args), chunks))
+
+
+# --- 元の実装での正解データの計算 ---
+# worktree の中で実行するスクリプト。標準入力の日付の結果をJSONで標準出力に書く
+_BASELINE_RUNNER = r"""
+import functools, json, logging, os, sys
+out = sys.stdout
+sys.stdout = open(os.devnull, 'w')
+sys.path.insert(0, os.getcwd())
+from modules import inyou, shichuu
+for module in (inyou, shichuu):
+    for name in ('get_setsubun_datetime', 'get_month_start_dates'):
+        setattr(module, name, functools.lru_cache(maxsize=None)(getattr(module, name)))
+from app import app
+logging.disable(logging.CRITICAL)
+client = app.test_client()
+results = []
+for year, month, day in json.load(sys.stdin):
+    response = client.post('/api/predict', json={'year': year, 'month': month, 'day': day})
+    results.append(response.get_json())
+json.dump(results, out, ensure_ascii=False)
+"""
+
+
+def _git(*args, cwd=None):
+    return subprocess.run(('git',) + args, cwd=cwd or os.path.dirname(os.path.abspath(__file__)),
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+
+@contextmanager
+def baseline_worktree(commit=BASELINE_COMMIT):
+    """
+    commit を一時的な git worktree に取り出し、そのディレクトリを返す
+
+    暦の天体データ（de421.bsp）はリポジトリに含まれないので、リポジトリの
+    ルートにあればリンクする。
+    """
+    root = _git('rev-parse', '--show-toplevel')
+    directory = tempfile.mkdtemp(prefix='golden-baseline-')
+    _git('worktree', 'add', '--detach', directory, commit, cwd=root)
+    try:
+        for name in ('de421.bsp',):
+            source = os.path.join(root, name)
+            if os.path.exists(source):
+                os.symlink(source, os.path.join(directory, name))
+        yield directory
+    finally:
+        _git('worktree', 'remove', '--force', directory, cwd=root)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _drop_paths(result):
+    for path in DROPPED_PATHS:
+        parent = result
+        for key in path[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if isinstance(parent, dict):
+            parent.pop(path[-1], None)
+    return result
+
+
+def _run_baseline_chunk(directory, ordinals):
+    """プロセスプールで実行する、1チャンクの元の実装での計算"""
+    completed = subprocess.run([sys.executable, '-c', _BASELINE_RUNNER], cwd=directory, check=True,
+                               input=json.dumps(_to_dates(ordinals)), capture_output=True, text=True)
+    return [_drop_paths(result) for result in json.loads(completed.stdout)]
+
+
+def _year_chunks(ordinals):
+    """日付を年ごとのチャンクに分ける（元の実装の年ごとの計算をチャンクの中で使い回す）"""
+    years = np.array([date.fromordinal(o).year for o in ordinals.tolist()])
+    boundaries = np.flatnonzero(np.diff(years)) + 1
+    return [chunk.tolist() for chunk in np.split(ordinals, boundaries)]
+
+
+def build(path=GOLDEN_PATH, samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED, commit=BASELINE_COMMIT, jobs=None):
+    """
+    正解データを元の実装で計算して書き出す
+
+    Args:
+        path (str): 出力先の .npz
+        samples (int): 乱数で選ぶ日付の数
+        seed (int): 乱数の種
+        commit (str): 正解とする実装のコミット
+        jobs (int): 並列に計算するプロセスの数（未指定ならCPU数）
+
+    Returns:
+        dict: 書き出したマニフェスト
+    """
+    ordinals, kinds = sample_dates(samples, seed)
+    commit = _git('rev-parse', commit)
+    started = time.perf_counter()
+    with baseline_worktree(commit) as directory:
+        results = [result for chunk in _map_chunks(_run_baseline_chunk, _year_chunks(ordinals),
+                                                   jobs or os.cpu_count(), directory)
+                   for result in chunk]
+    logger.info(f"{len(results)}日分の正解データを{time.perf_counter() - started:.1f}秒で計算しました")
+
+    days = [date.fromordinal(o) for o in ordinals.tolist()]
+    shapes, columns = reading_table.encode(days, results)
+    arrays = {'ordinals': ordinals, 'kinds': kinds, 'shape': columns.pop(())[0]}
+    column_entries = []
+    for i, (column_path, (array, dictionary)) in enumerate(columns.items()):
+        arrays[f'column{i}'] = array
+        column_entries.append({'path': list(column_path), 'file': f'column{i}', 'dictionary': dictionary})
+    manifest = {
+        'format': GOLDEN_FORMAT_VERSION,
+        'baseline_commit': commit,
+        'dropped_paths': [list(p) for p in DROPPED_PATHS],
+        'samples': samples,
+        'seed': seed,
+        'start': days[0].isoformat(),
+        'days': len(days),
+        'shapes': shapes,
+        'columns': column_entries,
+    }
+    arrays['manifest'] = np.array(json.dumps(manifest, ensure_ascii=False))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.savez_compressed(path, **arrays)
+    return manifest
+
+
+class GoldenData:
+    """
+    読み込んだ正解データ
+
+    行は日付の昇順で、reading_table.ReadingTable で1行ずつ結果に戻す。
+    """
+
+    def __init__(self, path=GOLDEN_PATH):
+        with np.load(path) as data:
+            arrays = {key: data[key] for key in data.files}
+        self.manifest = json.loads(arrays.pop('manifest').item())
+        if self.manifest.get('format') != GOLDEN_FORMAT_VERSION:
+            raise ValueError(f"正解データの形式が異なります: {self.manifest.get('format')}")
+        self.ordinals = arrays['ordinals']
+        self.kinds = arrays['kinds']
+        self._positions = {o: i for i, o in enumerate(self.ordinals.tolist())}
+        columns = {(): arrays['shape']}
+        for column in self.manifest['columns']:
+            columns[tuple(column['path'])] = arrays[column['file']]
+        # 表の版の代わりに、正解とした実装のコミットを入れておく
+        self._table = reading_table.ReadingTable(
+            dict(self.manifest, reading_version=self.manifest['baseline_commit']), columns)
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def expected(self, ordinal):
+        """日付（date.toordinal()）の正解の結果を返す"""
+        return self._table.row(self._positions[ordinal], date.fromordinal(ordinal))
+
+
+def _get_golden(path):
+    global _golden
+    if _golden is None or _golden[0] != path:
+        _golden = (path, GoldenData(path))
+    return _golden[1]
+
+
+def _same(expected, actual, tolerance):
+    if type(expected) is float and isinstance(actual, (int, float)):
+        return abs(expected - actual) <= tolerance
+    return expected == actual
+
+
+def diff_result(expected, actual, tolerance=FLOAT_TOLERANCE):
+    """
+    1件の結果を正解データにある項目ごとに比べる
+
+    Returns:
+        list: 一致しない項目の (経路, 正解の値, エンジンの値) のリスト
+    """
+    if actual is None:
+        return [((), expected, None)]
+    expected_values = dict(reading_table.flatten(expected))
+    actual_values = dict(reading_table.flatten(actual))
+    mismatches = []
+    for path, old in expected_values.items():
+        new = actual_values.get(path)
+        if not _same(old, new, tolerance):
+            mismatches.append((path, old, new))
+    return mismatches
+
+
+def _check_chunk(golden_path, engine_name, tolerance, systems, ordinals):
+    """プロセスプールで実行する、1チャンクのエンジンの計算と正解データとの比較"""
+    logging.disable(logging.CRITICAL)
+    golden = _get_golden(golden_path)
+    try:
+        results = get_engine(engine_name)(_to_dates(ordinals))
+    except Exception as e:
+        return [(ordinal, (), None, f"エンジンの実行に失敗: {e}") for ordinal in ordinals]
+    mismatches = []
+    for ordinal, result in zip(ordinals, results):
+        expected = golden.expected(ordinal)
+        if systems:
+            expected = {system: value for system, value in expected.items() if system in systems}
+        for path, old, new in diff_result(expected, result, tolerance):
+            mismatches.append((ordinal, path, old, new))
+    return mismatches
+
+
+def check(engine='vectorized', path=GOLDEN_PATH, jobs=None, tolerance=FLOAT_TOLERANCE, kinds=None,
+          systems=None):
+    """
+    エンジンの結果を正解データと比べる
+
+    Args:
+        engine (str): 比べるエンジン
+        path (str): 正解データの .npz
+        jobs (int): 並列に計算するプロセスの数（未指定ならCPU数）
+        tolerance (float): 浮動小数点数の値の許容誤差
+        kinds (int): 比べる日付の種類のビット（未指定なら全て）
+        systems (list): 比べる占い（'shichuu' など、未指定なら全て）
+
+    Returns:
+        dict: checked（比べた日付の数）、mismatches（(日付, 種類, 経路, 正解, エンジンの値) のリスト）、
+              by_system（占いごとの不一致の日付の数）、by_kind（日付の種類ごとの不一致の日付の数）
+    """
+    golden = GoldenData(path)
+    ordinals = golden.ordinals
+    if kinds:
+        ordinals = ordinals[(golden.kinds & kinds) != 0]
+    chunks = _map_chunks(_check_chunk, _split(ordinals), jobs or os.cpu_count(), path, engine, tolerance,
+                         tuple(systems or ()))
+
+    kind_of = dict(zip(golden.ordinals.tolist(), golden.kinds.tolist()))
+    mismatches = []
+    systems = {}
+    for ordinal, mismatch_path, expected, actual in (m for chunk in chunks for m in chunk):
+        day = date.fromordinal(ordinal)
+        mismatches.append((day, kind_of[ordinal], mismatch_path, expected, actual))
+        systems.setdefault(mismatch_path[0] if mismatch_path else '*', set()).add(day)
+    by_kind = Counter()
+    for day in {m[0] for m in mismatches}:
+        for bit, name in KIND_NAMES.items():
+            if kind_of[day.toordinal()] & bit:
+                by_kind[name] += 1
+    return {
+        'checked': len(ordinals),
+        'mismatches': mismatches,
+        'by_system': {system: len(days) for system, days in systems.items()},
+        'by_kind': dict(by_kind),
+    }
+
+
+def _kind_label(kind):
+    return ','.join(name for bit, name in KIND_NAMES.items() if kind & bit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='占い結果の正解データの生成と比較')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='正解データを生成する')
+    build_parser.add_argument('--output', default=GOLDEN_PATH, help='出力先の .npz')
+    build_parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='乱数で選ぶ日付の数')
+    build_parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='乱数の種')
+    build_parser.add_argument('--commit', default=BASELINE_COMMIT, help='正解とする実装のコミット')
+    build_parser.add_argument('--jobs', type=int, help='並列に計算するプロセスの数')
+
+    check_parser = subparsers.add_parser('check', help='エンジンの結果を正解データと比べる')
+    check_parser.add_argument('--golden', default=GOLDEN_PATH, help='正解データの .npz')
+    check_parser.add_argument('--engine', default='vectorized',
+                              help=f"比べるエンジン（{', '.join(ENGINES)} または モジュール:関数）")
+    check_parser.add_argument('--jobs', type=int, help='並列に計算するプロセスの数')
+    check_parser.add_argument('--tolerance', type=float, default=FLOAT_TOLERANCE, help='浮動小数点数の許容誤差')
+    check_parser.add_argument('--boundaries-only', action='store_true', help='境界の日付だけを比べる')
+    check_parser.add_argument('--systems', help='比べる占い（カンマ区切り、未指定なら全て）')
+    check_parser.add_argument('--limit', type=int, default=20, help='表示する不一致の数')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'build':
+        manifest = build(args.output, args.samples, args.seed, args.commit, args.jobs)
+        summary = {key: manifest[key] for key in ('baseline_commit', 'samples', 'seed', 'days')}
+        summary['size'] = os.path.getsize(args.output)
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return 0
+
+    kinds = SETSUIRI | LUNAR_MONTH if args.boundaries_only else None
+    started = time.perf_counter()
+    systems = args.systems.split(',') if args.systems else None
+    report = check(args.engine, args.golden, args.jobs, args.tolerance, kinds, systems)
+    for day, kind, path, expected, actual in report['mismatches'][:args.limit]:
+        print(f"{day.isoformat()} [{_kind_label(kind)}] {'.'.join(path)}: "
+              f"{expected!r} != {actual!r}")
+    mismatched = len({m[0] for m in report['mismatches']})
+    print(json.dumps({
+        'engine': args.engine,
+        'checked': report['checked'],
+        'mismatched_dates': mismatched,
+        'by_system': report['by_system'],
+        'by_kind': report['by_kind'],
+        'seconds': round(time.perf_counter() - started, 1),
+    }, ensure_ascii=False, indent=2))
+    return 1 if mismatched else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,156 +1,68 @@
 """
 陰陽五行の計算モジュール
 """
-from datetime import datetime, timedelta, timezone
-from skyfield.api import load, utc
-import traceback
+import logging
 
-# 干支リスト（60干支）
-eto_list = [
-    '甲子', '乙丑', '丙寅', '丁卯', '戊辰', '己巳', '庚午', '辛未', '壬申', '癸酉',
-    '甲戌', '乙亥', '丙子', '丁丑', '戊寅', '己卯', '庚辰', '辛巳', '壬午', '癸未',
-    '甲申', '乙酉', '丙戌', '丁亥', '戊子', '己丑', '庚寅', '辛卯', '壬辰', '癸巳',
-    '甲午', '乙未', '丙申', '丁酉', '戊戌', '己亥', '庚子', '辛丑', '壬寅', '癸卯',
-    '甲辰', '乙巳', '丙午', '丁未', '戊申', '己酉', '庚戌', '辛亥', '壬子', '癸丑',
-    '甲寅', '乙卯', '丙辰', '丁巳', '戊午', '己未', '庚申', '辛酉', '壬戌', '癸亥'
-]
+from modules import kanshi, pillars, sekki
 
-# 十干（天干）リスト
-jikkan = ['甲', '乙', '丙', '丁', '戊', '己', '庚', '辛', '壬', '癸']
+logger = logging.getLogger(__name__)
 
-# 十二支（地支）リスト
-junishi = ['子', '丑', '寅', '卯', '辰', '巳', '午', '未', '申', '酉', '戌', '亥']
+# 干支リスト（60干支）と十干・十二支のリスト（干支の共通モジュールのもの）
+eto_list = kanshi.ETO_NAMES
+jikkan = kanshi.STEM_NAMES
+junishi = kanshi.BRANCH_NAMES
 
 # 十干と五行・陰陽の対応表
 jikkan_to_gogyo_inyo = {
-    '甲': {'gogyo': '木', 'inyo': '陽'},
-    '乙': {'gogyo': '木', 'inyo': '陰'},
-    '丙': {'gogyo': '火', 'inyo': '陽'},
-    '丁': {'gogyo': '火', 'inyo': '陰'},
-    '戊': {'gogyo': '土', 'inyo': '陽'},
-    '己': {'gogyo': '土', 'inyo': '陰'},
-    '庚': {'gogyo': '金', 'inyo': '陽'},
-    '辛': {'gogyo': '金', 'inyo': '陰'},
-    '壬': {'gogyo': '水', 'inyo': '陽'},
-    '癸': {'gogyo': '水', 'inyo': '陰'},
+    name: {
+        'gogyo': kanshi.ELEMENT_NAMES[kanshi.STEM_ELEMENT[i]],
+        'inyo': kanshi.POLARITY_NAMES[kanshi.STEM_POLARITY[i]],
+    }
+    for i, name in enumerate(jikkan)
 }
 
 # 十二支と五行の対応表
 junishi_to_gogyo = {
-    '子': '水',
-    '丑': '土',
-    '寅': '木',
-    '卯': '木',
-    '辰': '土',
-    '巳': '火',
-    '午': '火',
-    '未': '土',
-    '申': '金',
-    '酉': '金',
-    '戌': '土',
-    '亥': '水',
+    name: kanshi.ELEMENT_NAMES[kanshi.BRANCH_ELEMENT[i]] for i, name in enumerate(junishi)
 }
 
 # 年干支（60干支）を返す（1984年＝甲子を基準）
 def get_eto_from_year(year):
-    base_year = 1984
-    index = (year - base_year) % 60
-    return eto_list[index]
+    return eto_list[pillars.year_index(year)]
 
-# 立春（黄道経度315°）のJST時刻をSkyfieldで計算
+# 立春（黄道経度315°）のJST時刻を節気表から取得
 def get_setsubun_datetime(year):
-    ts = load.timescale()
-    eph = load('de421.bsp')
-    sun = eph['sun']
-    earth = eph['earth']
-    t = ts.utc(datetime(year, 2, 1, 0, 0, tzinfo=utc))
-    end_t = ts.utc(datetime(year, 2, 5, 0, 0, tzinfo=utc))
-    delta = timedelta(minutes=1)
-    while t.utc_datetime() < end_t.utc_datetime():
-        obs = earth.at(t).observe(sun).apparent()
-        lon = obs.ecliptic_latlon()[1].degrees
-        if lon >= 315.0:
-            return t.utc_datetime() + timedelta(hours=9)
-        t = ts.utc((t.utc_datetime() + delta).replace(tzinfo=utc))
-    return None
+    return sekki.setsubun_datetime(year)
 
 # 年柱を返す（立春補正あり）
 def get_year_pillar(year, month, day, hour=12, minute=0):
-    JST = timezone(timedelta(hours=9))
-    birth = datetime(year, month, day, hour, minute, tzinfo=JST)
-    setsubun = get_setsubun_datetime(year)
-    if setsubun and birth < setsubun:
-        year -= 1
-    return get_eto_from_year(year)
+    context = pillars.get_pillar_context(year, month, day, hour, minute)
+    return eto_list[context.year_index]
 
-# 月の節入り（12節気）のJST時刻をSkyfieldで計算
+# 月の節入り（12節気）のJST時刻を節気表から取得
 def get_month_start_dates(year):
-    approx_dates = {
-        315.0: (2, 4), 345.0: (3, 6), 15.0: (4, 5), 45.0: (5, 6),
-        75.0: (6, 6), 105.0: (7, 7), 135.0: (8, 8), 165.0: (9, 8),
-        195.0: (10, 8), 225.0: (11, 7), 255.0: (12, 7), 285.0: (1, 6)
-    }
-    ts = load.timescale()
-    eph = load('de421.bsp')
-    sun = eph['sun']
-    earth = eph['earth']
-    results = []
-    for angle, (m, d) in approx_dates.items():
-        target_year = year if angle != 285.0 else year + 1
-        t_start = datetime(target_year, m, d - 1, tzinfo=utc)
-        t_end = datetime(target_year, m, d + 1, tzinfo=utc)
-        t = ts.utc(t_start)
-        end_t = ts.utc(t_end)
-        delta = timedelta(minutes=1)
-        while t.utc_datetime() < end_t.utc_datetime():
-            obs = earth.at(t).observe(sun).apparent()
-            lon = obs.ecliptic_latlon()[1].degrees
-            if lon >= angle:
-                jst = t.utc_datetime() + timedelta(hours=9)
-                results.append((angle, jst))
-                break
-            t = ts.utc((t.utc_datetime() + delta).replace(tzinfo=utc))
-    results.sort(key=lambda x: x[1])
-    return results
+    return sekki.month_start_dates(year)
 
 # 月番号を取得（寅＝1、丑＝12）
 def get_month_index(year, month, day, hour=12, minute=0):
-    JST = timezone(timedelta(hours=9))
-    birth = datetime(year, month, day, hour, minute, tzinfo=JST)
-    month_starts = get_month_start_dates(year)
-    for i in range(len(month_starts)):
-        _, start_time = month_starts[i]
-        if i == len(month_starts) - 1:
-            if birth >= start_time:
-                return i + 1
-        else:
-            _, next_time = month_starts[i + 1]
-            if start_time <= birth < next_time:
-                return i + 1
-    return 12
+    return pillars.get_pillar_context(year, month, day, hour, minute).month_index
 
 # 月柱の干支を取得
 def get_month_pillar(year, month, day, hour=12, minute=0):
-    year_eto = get_year_pillar(year, month, day, hour, minute)
-    year_kan = year_eto[0]
-    month_index = get_month_index(year, month, day, hour, minute)
-    year_to_tora_kan = {
-        '甲': '丙', '乙': '戊', '丙': '庚', '丁': '壬', '戊': '甲',
-        '己': '丙', '庚': '戊', '辛': '庚', '壬': '壬', '癸': '甲'
-    }
-    tora_kan = year_to_tora_kan[year_kan]
-    tora_index = jikkan.index(tora_kan)
-    kan_index = (tora_index + month_index - 1) % 10
-    return f"{jikkan[kan_index]}{junishi[month_index - 1]}"
+    context = pillars.get_pillar_context(year, month, day, hour, minute)
+    return get_month_pillar_from_context(context)
+
+# 柱の情報から月柱の干支の番号を取得（四柱推命と同じく、月干は年干から五虎遁で求める）
+def get_month_eto_index(context):
+    return kanshi.month_eto(context.year_index, context.month_index)
+
+# 柱の情報から月柱の干支を取得
+def get_month_pillar_from_context(context):
+    return eto_list[get_month_eto_index(context)]
 
 # 日柱（1984年1月31日を甲子として計算）
 def get_day_pillar(year, month, day):
-    JST = timezone(timedelta(hours=9))
-    birth = datetime(year, month, day, 0, 0, tzinfo=JST)
-    base = datetime(1984, 1, 31, 0, 0, tzinfo=JST)
-    delta_days = (birth - base).days
-    index = delta_days % 60
-    return eto_list[index]
+    return eto_list[pillars.day_index(year, month, day)]
 
 # 天干と地支を分割する
 def split_pillar(pillar):
@@ -248,9 +160,11 @@ def calculate_gogyo_inyo(year_pillar, month_pillar, day_pillar):
 
 # 年・月・日柱をまとめて返す
 def get_pillars(year, month, day):
-    year_pillar = get_year_pillar(year, month, day)
-    month_pillar = get_month_pillar(year, month, day)
-    day_pillar = get_day_pillar(year, month, day)
+    # 柱の情報から取得（立春・節入りの参照は1回だけ）
+    context = pillars.get_pillar_context(year, month, day)
+    year_pillar = eto_list[context.year_index]
+    month_pillar = get_month_pillar_from_context(context)
+    day_pillar = eto_list[context.day_index]
     
     return {
         "year_pillar": year_pillar,
@@ -279,21 +193,20 @@ def calculate_inyou_gogyo(year, month, day):
     生年月日から陰陽五行を計算する関数
     """
     try:
-        # 日柱を取得
-        day_pillar = get_day_pillar(year, month, day)
-        
-        # 日柱の天干を取得
-        day_jikkan = day_pillar[0]
+        # 日柱と日干の番号を取得
+        day_index = pillars.day_index(year, month, day)
+        day_stem = kanshi.stem_of(day_index)
+        day_pillar = eto_list[day_index]
+        day_jikkan = jikkan[day_stem]
         
         # 天干から五行と陰陽を取得
-        jikkan_info = jikkan_to_gogyo_inyo.get(day_jikkan, {})
-        gogyo = jikkan_info.get('gogyo', '')
-        inyo = jikkan_info.get('inyo', '')
+        gogyo = kanshi.ELEMENT_NAMES[kanshi.STEM_ELEMENT[day_stem]]
+        inyo = kanshi.POLARITY_NAMES[kanshi.STEM_POLARITY[day_stem]]
         
-        print(f"日柱: {day_pillar}, 日干: {day_jikkan}, 五行: {gogyo}, 陰陽: {inyo}")
+        logger.debug("日柱: %s, 日干: %s, 五行: %s, 陰陽: %s", day_pillar, day_jikkan, gogyo, inyo)
         
         if not gogyo or not inyo:
-            print("五行または陰陽の取得に失敗しました")
+            logger.error("五行または陰陽の取得に失敗しました")
             return None
             
         return {
@@ -302,8 +215,7 @@ def calculate_inyou_gogyo(year, month, day):
         }
         
     except Exception as e:
-        print(f"陰陽五行の計算でエラーが発生: {e}")
-        traceback.print_exc()
+        logger.exception("陰陽五行の計算でエラーが発生: %s", e)
         return None
 
 # テスト実行用
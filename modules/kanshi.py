@@ -0,0 +1,129 @@
+"""
+干支（十干・十二支・60干支）の共通モジュール
+
+天干・地支・干支を整数の番号で表し、十二運・通変星・蔵干・五行・陰陽を
+NumPyの表の添字で引く。表は整数でも配列でも同じように引けるので、
+1件の計算とバッチの計算で同じ関数を使える。文字列への変換は結果を
+返すときだけ行う。
+
+    天干: 甲＝0 … 癸＝9
+    地支: 子＝0 … 亥＝11
+    干支: 甲子＝0 … 癸亥＝59（天干＝番号 % 10、地支＝番号 % 12）
+"""
+import numpy as np
+
+STEM_NAMES = ['甲', '乙', '丙', '丁', '戊', '己', '庚', '辛', '壬', '癸']
+BRANCH_NAMES = ['子', '丑', '寅', '卯', '辰', '巳', '午', '未', '申', '酉', '戌', '亥']
+ETO_NAMES = [STEM_NAMES[i % 10] + BRANCH_NAMES[i % 12] for i in range(60)]
+
+STEM_CODES = {name: i for i, name in enumerate(STEM_NAMES)}
+BRANCH_CODES = {name: i for i, name in enumerate(BRANCH_NAMES)}
+ETO_CODES = {name: i for i, name in enumerate(ETO_NAMES)}
+
+ELEMENT_NAMES = ['木', '火', '土', '金', '水']
+POLARITY_NAMES = ['陽', '陰']
+TWELVE_STAGE_NAMES = ['長生', '沐浴', '冠帯', '建禄', '帝旺', '衰',
+                      '病', '死', '墓', '絶', '胎', '養']
+STAR_NAMES = ['比肩', '劫財', '食神', '傷官', '偏財', '正財',
+              '偏官', '正官', '偏印', '印綬']
+
+# 天干の五行（甲乙＝木 … 壬癸＝水）と陰陽（陽＝0、陰＝1）
+STEM_ELEMENT = np.arange(10, dtype=np.int8) // 2
+STEM_POLARITY = np.arange(10, dtype=np.int8) % 2
+
+# 地支の五行
+BRANCH_ELEMENT = np.array([4, 2, 0, 0, 2, 1, 1, 2, 3, 3, 2, 4], dtype=np.int8)
+
+# 十二運が長生となる地支（陽干は順行、陰干は逆行）
+_CHOUSEI_BRANCH = [11, 6, 2, 9, 2, 9, 5, 0, 8, 3]
+
+
+def _build_twelve_stage():
+    table = np.empty((10, 12), dtype=np.int8)
+    branches = np.arange(12)
+    for stem, start in enumerate(_CHOUSEI_BRANCH):
+        if stem % 2 == 0:
+            table[stem] = (branches - start) % 12
+        else:
+            table[stem] = (start - branches) % 12
+    return table
+
+
+def _build_tsuhensei():
+    # 日干から見た相手の干の五行の関係（比和・我生・我剋・剋我・生我）と陰陽の異同
+    day = np.arange(10)[:, None]
+    other = np.arange(10)[None, :]
+    relation = (other // 2 - day // 2) % 5
+    table = (relation * 2 + (day % 2 != other % 2)).astype(np.int8)
+    # 従来の対応表どおり、日干 癸 に対する 壬 は 傷官 とする
+    table[9, 8] = STAR_NAMES.index('傷官')
+    return table
+
+
+# 十二運の表 [日干, 地支] -> TWELVE_STAGE_NAMES の番号
+TWELVE_STAGE = _build_twelve_stage()
+
+# 通変星の表 [日干, 相手の干] -> STAR_NAMES の番号
+TSUHENSEI = _build_tsuhensei()
+
+# 蔵干の表 [地支, (主気, 中気, 余気)] -> 天干の番号（ない場合は -1）
+HIDDEN_STEMS = np.array([
+    [9, -1, -1],  # 子: 癸
+    [5, 9, 7],    # 丑: 己 癸 辛
+    [0, 2, 4],    # 寅: 甲 丙 戊
+    [1, -1, -1],  # 卯: 乙
+    [4, 1, 9],    # 辰: 戊 乙 癸
+    [2, 6, 4],    # 巳: 丙 庚 戊
+    [3, 5, -1],   # 午: 丁 己
+    [5, 3, 1],    # 未: 己 丁 乙
+    [6, 8, 4],    # 申: 庚 壬 戊
+    [7, -1, -1],  # 酉: 辛
+    [4, 7, 3],    # 戌: 戊 辛 丁
+    [8, 0, -1],   # 亥: 壬 甲
+], dtype=np.int8)
+
+
+def stem_of(eto):
+    """干支の番号から天干の番号を返す"""
+    return eto % 10
+
+
+def branch_of(eto):
+    """干支の番号から地支の番号を返す"""
+    return eto % 12
+
+
+def eto_from(stem, branch):
+    """天干と地支の番号から干支の番号を返す（干と支の陰陽は一致していること）"""
+    return (6 * stem - 5 * branch) % 60
+
+
+def month_branch(month_index):
+    """節月の番号（寅＝1 … 丑＝12）から月支の番号を返す"""
+    return (month_index + 1) % 12
+
+
+def month_stem(year_stem, month_index):
+    """年干と節月の番号（寅＝1 … 丑＝12）から月干の番号を返す"""
+    # 五虎遁: 寅月の干は 甲・己年→丙、乙・庚年→戊、丙・辛年→庚、丁・壬年→壬、戊・癸年→甲
+    return (year_stem % 5 * 2 + 1 + month_index) % 10
+
+
+def month_eto(year_eto, month_index):
+    """年の60干支の番号と節月の番号（寅＝1 … 丑＝12）から月柱の60干支の番号を返す"""
+    return eto_from(month_stem(stem_of(year_eto), month_index), month_branch(month_index))
+
+
+def twelve_stage(day_stem, branch):
+    """日干と地支から十二運の番号を返す"""
+    return TWELVE_STAGE[day_stem, branch]
+
+
+def tsuhensei(day_stem, other_stem):
+    """日干と相手の干から通変星の番号を返す"""
+    return TSUHENSEI[day_stem, other_stem]
+
+
+def main_hidden_stem(branch):
+    """地支の蔵干（主気）の天干の番号を返す"""
+    return HIDDEN_STEMS[branch, 0]
@@ -1,82 +1,370 @@
 """
 九星気学による占いモジュール
+
+本命星の年（立春で区切る）と月命星の月（節入りで区切る）は、暦データの
+節気（瞬時の黄道）から作った節入り日の表を二分探索して求める。
+表は年ごとに12個の節入り日（日本時間の日付）を並べたもので、暦データの
+範囲内では天体暦を参照しない。
+
+本命星・月命星・日命星は get_kyusei_stars で1回の計算でまとめて求め、
+calculate_honmei などの関数と KyuseiFortune はその結果から星の名前を返す。
+大量の日付は calculate_kyusei_batch で配列のまま計算する。
 """
+import bisect
+import logging
+from collections import namedtuple
 from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+from modules import almanac, sekki
+
+logger = logging.getLogger(__name__)
+
+KYUSEI_NAMES = ["一白水星", "二黒土星", "三碧木星", "四緑木星", "五黄土星",
+                "六白金星", "七赤金星", "八白土星", "九紫火星"]
+
+# 星の番号（一白＝1 … 九紫＝9）と名前の対応
+KYUSEI_NUMBERS = {i + 1: name for i, name in enumerate(KYUSEI_NAMES)}
+KYUSEI_CODES = {name: i + 1 for i, name in enumerate(KYUSEI_NAMES)}
+
+# 簡易的な運勢説明（実際のアプリケーションではより詳細なデータベースを使用）
+KYUSEI_DESCRIPTIONS = {
+    "一白水星": "知性と直感力に優れ、新しいアイデアを生み出す力があります。",
+    "二黒土星": "堅実で忍耐強く、着実に目標を達成する力があります。",
+    "三碧木星": "活発で行動力があり、リーダーシップを発揮します。",
+    "四緑木星": "調和とバランスを重視し、周囲との関係を良好に保ちます。",
+    "五黄土星": "中心的な存在で、周囲をまとめる力があります。",
+    "六白金星": "正義感が強く、公平な判断力を持っています。",
+    "七赤金星": "情熱的で魅力的、人を惹きつける力があります。",
+    "八白土星": "安定感があり、着実に物事を進める力があります。",
+    "九紫火星": "創造性と情熱に富み、新しい可能性を切り開きます。"
+}
+
+KyuseiStars = namedtuple('KyuseiStars', [
+    'honmei',        # 本命星の番号（生まれた年の年家九星）
+    'gatsumei',      # 月命星の番号（生まれた月の月家九星）
+    'nichimei',      # 日命星の番号（生まれた日の日家九星）
+    'kyusei_year',   # 立春で区切った年
+    'month_number',  # 節月の番号（2月＝1 … 1月＝12）
+])
+KyuseiStars.__doc__ = """
+生年月日から求めた九星
+
+星は番号（一白＝1 … 九紫＝9）で持ち、名前は KYUSEI_NAMES で引く。
+calculate_kyusei_batch では各項目が配列になる。
+"""
+
+_UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# 日干支の基準（1984年1月31日＝甲子）
+_KOUSHI_ORDINAL = date(1984, 1, 31).toordinal()
+
+# 天体暦の範囲外の年に使うおおよその節入り日（立春 … 小寒、小寒は翌年1月）
+_APPROX_SETSUIRI = [(2, 4), (3, 6), (4, 5), (5, 6), (6, 6), (7, 8),
+                    (8, 8), (9, 8), (10, 9), (11, 8), (12, 7), (1, 6)]
+
+# 天体暦の範囲外の年に使うおおよその夏至・冬至
+_APPROX_SOLSTICES = [(6, 21), (12, 22)]
+
+# 節気表の夏至（黄経90°）と冬至（黄経270°）の列
+_SOLSTICE_COLUMNS = [sekki.SEKKI_ANGLES.index(90.0), sekki.SEKKI_ANGLES.index(270.0)]
+
+# 月命星の2月（月番号1）の星: 本命星 % 3 が 0（三・六・九）→五黄、1（一・四・七）→八白、2（二・五・八）→二黒
+_GATSUMEI_BASE = np.array([5, 8, 2], dtype=np.int8)
+
+KyuseiTable = namedtuple('KyuseiTable', ['start_year', 'setsuiri', 'setsuiri_array',
+                                         'switches', 'switches_array'])
+
+
+def _approx_days(year, month_days):
+    """おおよその日付（1月は翌年）の date.toordinal() の値を返す"""
+    # date で表せない0年と10000年は、暦が同じ400年（146097日）ずらした年から数える
+    shift = 400 if year < 1 else -400 if year >= 9999 else 0
+    return [date(year + shift + (m == 1), m, d).toordinal() - shift // 400 * 146097
+            for m, d in month_days]
+
+
+def _jst_days(seconds):
+    """UNIX秒の配列を日本時間の日付の date.toordinal() の値のリストにする"""
+    return (np.floor((np.asarray(seconds) + 9 * 3600) / 86400).astype(np.int64)
+            + _UNIX_EPOCH_ORDINAL).tolist()
+
+
+def _nearest_koushi(ordinal):
+    """指定日に最も近い甲子の日を返す"""
+    return ordinal - ((ordinal - _KOUSHI_ORDINAL + 30) % 60 - 30)
+
+
+def _year_days(year):
+    """
+    指定年の節入り日と日家九星の切り替え日を返す
+
+    Returns:
+        tuple: (立春から翌年の小寒までの12節の節入り日,
+                [夏至に最も近い甲子の日（陰遁の始め）, 冬至に最も近い甲子の日（陽遁の始め）])。
+               日付は date.toordinal() の値
+    """
+    try:
+        terms = np.asarray(sekki.get_solar_terms(year, epoch='date'))
+    except ValueError:
+        # 天体暦の範囲外は従来の固定の日付で区切る
+        setsuiri = _approx_days(year, _APPROX_SETSUIRI)
+        solstices = _approx_days(year, _APPROX_SOLSTICES)
+    else:
+        # 24節気のうち偶数番目が節（立春・啓蟄 … 小寒）
+        setsuiri = _jst_days(terms[0::2])
+        solstices = _jst_days(terms[_SOLSTICE_COLUMNS])
+    return setsuiri, [_nearest_koushi(d) for d in solstices]
+
+
+@lru_cache(maxsize=64)
+def _kyusei_table(start_year, end_year):
+    """
+    start_year〜end_year の節入り日と日家九星の切り替え日を並べた表を作る
+
+    添字 k の節入りは start_year + k // 12 年の月番号 k % 12 + 1 の始まり、
+    添字 k の切り替え日は k が偶数なら陰遁、奇数なら陽遁の始まりになる。
+
+    Returns:
+        KyuseiTable: 表（リストは二分探索用、配列はバッチ用）
+    """
+    setsuiri = []
+    switches = []
+    for year in range(start_year, end_year + 1):
+        year_setsuiri, year_switches = _year_days(year)
+        setsuiri.extend(year_setsuiri)
+        switches.extend(year_switches)
+    return KyuseiTable(start_year, setsuiri, np.array(setsuiri, dtype=np.int64),
+                       switches, np.array(switches, dtype=np.int64))
+
+
+def _lookup_table(start_year, end_year):
+    """指定範囲を含む表を返す（暦データの範囲内なら全期間の表を使う）"""
+    years = almanac.year_range()
+    if years is not None and years[0] <= start_year and end_year <= years[1]:
+        start_year, end_year = years
+    return _kyusei_table(start_year, end_year)
+
+
+def _ordinals(dates):
+    """日付の配列（datetime64 または date.toordinal() の整数）を通し番号の配列にする"""
+    dates = np.asarray(dates)
+    if np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype('datetime64[D]').astype(np.int64) + _UNIX_EPOCH_ORDINAL
+    return dates.astype(np.int64)
+
+
+def honmei_number(kyusei_year):
+    """立春で区切った年から本命星の番号（1-9）を返す（配列でもよい）"""
+    return (10 - kyusei_year) % 9 + 1
+
+
+def gatsumei_number(honmei, month_number):
+    """本命星の番号と月番号から月命星の番号（1-9）を返す（配列でもよい）"""
+    return (_GATSUMEI_BASE[honmei % 3] - month_number) % 9 + 1
+
+
+def nichimei_number(switch_index, days_since_switch):
+    """
+    日家九星の切り替え日からの日数で日命星の番号（1-9）を返す（配列でもよい）
+
+    陽遁は一白から順に、陰遁は九紫から逆に数える。閏の調整は行わず、
+    直前の切り替え日から続けて数える。
+    """
+    step = days_since_switch % 9
+    return np.where(switch_index % 2 == 1, step + 1, 9 - step)
+
+
+@lru_cache(maxsize=4096)
+def get_kyusei_stars(year, month, day):
+    """
+    生年月日から本命星・月命星・日命星をまとめて求める
+
+    節入り日と切り替え日の表を1回ずつ二分探索するだけで、同じ生年月日の
+    2回目以降の呼び出しはキャッシュから返す。
+
+    Args:
+        year (int): 生まれた年（西暦）
+        month (int): 生まれた月（1-12）
+        day (int): 生まれた日（1-31）
+
+    Returns:
+        KyuseiStars: 九星
+    """
+    table = _lookup_table(year - 1, year)
+    ordinal = date(year, month, day).toordinal()
+    k = bisect.bisect_right(table.setsuiri, ordinal) - 1
+    kyusei_year = table.start_year + k // 12
+    month_number = k % 12 + 1
+    s = bisect.bisect_right(table.switches, ordinal) - 1
+    honmei = honmei_number(kyusei_year)
+    return KyuseiStars(
+        honmei=honmei,
+        gatsumei=int(gatsumei_number(honmei, month_number)),
+        nichimei=int(nichimei_number(s, ordinal - table.switches[s])),
+        kyusei_year=kyusei_year,
+        month_number=month_number,
+    )
+
+
+def get_kyusei_year_month(year, month, day):
+    """
+    生年月日の九星の年と月番号を節入り日の表から求める
+
+    Returns:
+        tuple: (立春で区切った年, 月番号（2月＝1 … 1月＝12）)
+    """
+    stars = get_kyusei_stars(year, month, day)
+    return stars.kyusei_year, stars.month_number
+
+
+def calculate_kyusei_batch(dates):
+    """
+    日付の配列の本命星・月命星・日命星の番号をまとめて計算する
+
+    Args:
+        dates (array-like): datetime64 の配列、または date.toordinal() の整数の配列
+
+    Returns:
+        KyuseiStars: 各項目が配列の九星（星の番号は int8）
+    """
+    ordinals = _ordinals(dates)
+    if ordinals.size == 0:
+        empty = np.empty(ordinals.shape, dtype=np.int8)
+        return KyuseiStars(empty, empty, empty, np.empty(ordinals.shape, dtype=np.int64), empty)
+    first = date.fromordinal(int(ordinals.min())).year
+    last = date.fromordinal(int(ordinals.max())).year
+    table = _lookup_table(first - 1, last)
+    k = np.searchsorted(table.setsuiri_array, ordinals, side='right') - 1
+    kyusei_years = table.start_year + k // 12
+    month_numbers = (k % 12 + 1).astype(np.int8)
+    s = np.searchsorted(table.switches_array, ordinals, side='right') - 1
+    honmei = honmei_number(kyusei_years).astype(np.int8)
+    return KyuseiStars(
+        honmei=honmei,
+        gatsumei=gatsumei_number(honmei, month_numbers).astype(np.int8),
+        nichimei=nichimei_number(s, ordinals - table.switches_array[s]).astype(np.int8),
+        kyusei_year=kyusei_years,
+        month_number=month_numbers,
+    )
+
+
+def inton_batch(dates):
+    """
+    日付の配列が日家九星の陰遁の期間（夏至に最も近い甲子の日から冬至に
+    最も近い甲子の日の前日まで）にあるかをまとめて求める
+
+    Args:
+        dates (array-like): datetime64 の配列、または date.toordinal() の整数の配列
+
+    Returns:
+        numpy.ndarray: 陰遁の日なら True の配列
+    """
+    ordinals = _ordinals(dates)
+    if ordinals.size == 0:
+        return np.zeros(ordinals.shape, dtype=bool)
+    first = date.fromordinal(int(ordinals.min())).year
+    last = date.fromordinal(int(ordinals.max())).year
+    table = _lookup_table(first - 1, last)
+    s = np.searchsorted(table.switches_array, ordinals, side='right') - 1
+    return s % 2 == 0
+
+
+def kyusei_names(numbers):
+    """星の番号の配列を名前のリストにする"""
+    if isinstance(numbers, np.ndarray):
+        numbers = numbers.tolist()
+    return [KYUSEI_NAMES[n - 1] for n in numbers]
+
+
+def calculate_kyusei(year, month, day):
+    """
+    九星気学の計算を行う関数
+
+    Args:
+        year (int): 生まれた年（西暦）
+        month (int): 生まれた月（1-12）
+        day (int): 生まれた日（1-31）
+
+    Returns:
+        dict: {"honmei_sei": 本命星名, "tsukimei_sei": 月命星名, "nichimei_sei": 日命星名}
+              or None (エラー時)
+    """
+    try:
+        stars = get_kyusei_stars(year, month, day)
+    except Exception as e:
+        logger.error("九星気学の計算でエラーが発生しました: %s", e)
+        return None
+    return {
+        'honmei_sei': KYUSEI_NAMES[stars.honmei - 1],
+        'tsukimei_sei': KYUSEI_NAMES[stars.gatsumei - 1],
+        'nichimei_sei': KYUSEI_NAMES[stars.nichimei - 1],
+    }
+
+def calculate_honmei(year, month, day):
+    """
+    本命星を計算する関数
+    
+    Args:
+        year (int): 生まれた年（西暦）
+        month (int): 生まれた月（1-12）
+        day (int): 生まれた日（1-31）
+        
+    Returns:
+        str: 本命星の名前
+    """
+    return KYUSEI_NAMES[get_kyusei_stars(year, month, day).honmei - 1]
+
+def calculate_gatsumei(year, month, day):
+    """
+    月命星を計算する関数
+    
+    Args:
+        year (int): 生まれた年（西暦）
+        month (int): 生まれた月（1-12）
+        day (int): 生まれた日（1-31）
+        
+    Returns:
+        str: 月命星の名前
+    """
+    return KYUSEI_NAMES[get_kyusei_stars(year, month, day).gatsumei - 1]
+
+def calculate_nichimei(year, month, day):
+    """
+    日命星を計算する関数
+
+    Args:
+        year (int): 生まれた年（西暦）
+        month (int): 生まれた月（1-12）
+        day (int): 生まれた日（1-31）
+
+    Returns:
+        str: 日命星の名前
+    """
+    return KYUSEI_NAMES[get_kyusei_stars(year, month, day).nichimei - 1]
+
+
 
 class KyuseiFortune:
+    """九星気学の運勢（星の計算は get_kyusei_stars に任せる）"""
+
     def __init__(self):
-        self.kyusei_numbers = {
-            1: "一白水星",
-            2: "二黒土星",
-            3: "三碧木星",
-            4: "四緑木星",
-            5: "五黄土星",
-            6: "六白金星",
-            7: "七赤金星",
-            8: "八白土星",
-            9: "九紫火星"
-        }
-        self.kyusei_dict_rev = {
-            "一白水星": 1, "二黒土星": 2, "三碧木星": 3, "四緑木星": 4,
-            "五黄土星": 5, "六白金星": 6, "七赤金星": 7, "八白土星": 8,
-            "九紫火星": 9
-        }
+        self.kyusei_numbers = KYUSEI_NUMBERS
+        self.kyusei_dict_rev = KYUSEI_CODES
 
     def _get_honmei_sei(self, birth_year):
         """
-        生まれた年から本命星（九星）を計算する関数
+        立春で区切った年から本命星（九星）を計算する関数
         
         Args:
-            birth_year (int): 生まれた年（西暦）
+            birth_year (int): 生まれた年（西暦、立春前の生まれは前年）
             
         Returns:
             str: 本命星の名前
         """
-        # 11から年数を引いて9で割った余りで計算する簡略式
-        # (立春前の生まれは前年扱いにする必要あり - API側で考慮)
-        remainder = (11 - (birth_year % 9)) % 9
-        return self.kyusei_numbers.get(remainder, "不明")
-
-    def _get_month_number(self, birth_month, birth_day):
-        """
-        生まれた月と日から月番号を計算する関数
-        
-        Args:
-            birth_month (int): 生まれた月（1-12）
-            birth_day (int): 生まれた日（1-31）
-            
-        Returns:
-            int: 月番号（1-12）
-        """
-        # 九星気学の月は節入り日で変わる
-        # 簡単のため、日付のみで判定（厳密には年によって節入り日は多少変動する）
-        if (birth_month == 1 and birth_day < 6) or (birth_month == 12 and birth_day >= 7):
-            return 11  # 12/7頃～1/5頃
-        elif (birth_month == 2 and birth_day < 4) or (birth_month == 1 and birth_day >= 6):
-            return 12  # 1/6頃～2/3頃
-        elif (birth_month == 3 and birth_day < 6) or (birth_month == 2 and birth_day >= 4):
-            return 1   # 2/4頃～3/5頃
-        elif (birth_month == 4 and birth_day < 5) or (birth_month == 3 and birth_day >= 6):
-            return 2   # 3/6頃～4/4頃
-        elif (birth_month == 5 and birth_day < 6) or (birth_month == 4 and birth_day >= 5):
-            return 3   # 4/5頃～5/5頃
-        elif (birth_month == 6 and birth_day < 6) or (birth_month == 5 and birth_day >= 6):
-            return 4   # 5/6頃～6/5頃
-        elif (birth_month == 7 and birth_day < 8) or (birth_month == 6 and birth_day >= 6):
-            return 5   # 6/6頃～7/7頃
-        elif (birth_month == 8 and birth_day < 8) or (birth_month == 7 and birth_day >= 8):
-            return 6   # 7/8頃～8/7頃
-        elif (birth_month == 9 and birth_day < 8) or (birth_month == 8 and birth_day >= 8):
-            return 7   # 8/8頃～9/7頃
-        elif (birth_month == 10 and birth_day < 9) or (birth_month == 9 and birth_day >= 8):
-            return 8   # 9/8頃～10/8頃
-        elif (birth_month == 11 and birth_day < 8) or (birth_month == 10 and birth_day >= 9):
-            return 9   # 10/9頃～11/7頃
-        elif (birth_month == 12 and birth_day < 7) or (birth_month == 11 and birth_day >= 8):
-            return 10  # 11/8頃～12/6頃
-        else:
-            # 通常ここには到達しないはず
-            return 0  # エラーケース
+        return self.kyusei_numbers[honmei_number(birth_year)]
 
     def _get_tsukimei_sei(self, honmei_sei_num, month_number):
         """
@@ -89,22 +377,7 @@ class KyuseiFortune:
         Returns:
             str: 月命星の名前
         """
-        tsukimei_base_num = 0
-        # 本命星のグループ (簡易的な方法)
-        if honmei_sei_num in [1, 4, 7]:  # 水・木・金グループ
-            tsukimei_base_num = 8  # 2月(月番号1)は八白
-        elif honmei_sei_num in [2, 5, 8]:  # 土グループ
-            tsukimei_base_num = 2  # 2月(月番号1)は二黒
-        elif honmei_sei_num in [3, 6, 9]:  # 木・金・火グループ
-            tsukimei_base_num = 5  # 2月(月番号1)は五黄
-
-        # 月番号に応じて逆行して月命星番号を決定
-        # 2月(月番号1)を基準とする
-        tsukimei_num = (tsukimei_base_num - (month_number - 1)) % 9
-        if tsukimei_num <= 0:
-            tsukimei_num += 9
-
-        return self.kyusei_numbers.get(tsukimei_num, "不明")
+        return self.kyusei_numbers[int(gatsumei_number(honmei_sei_num, month_number))]
 
     def calculate_kyusei(self, birth_year, birth_month, birth_day):
         """
@@ -116,44 +389,10 @@ class KyuseiFortune:
             birth_day (int): 生まれた日（1～31）
 
         Returns:
-            dict: {"honmei_sei": 本命星名, "tsukimei_sei": 月命星名} or None (エラー時)
+            dict: {"honmei_sei": 本命星名, "tsukimei_sei": 月命星名, "nichimei_sei": 日命星名}
+                  or None (エラー時)
         """
-        try:
-            # --- 年の計算 (立春前に生まれた場合は前年扱い) ---
-            # 簡易的に2月3日生まれまでを前年扱いとする (厳密には年により変動)
-            calc_year = birth_year
-            if birth_month == 1 or (birth_month == 2 and birth_day <= 3):
-                calc_year -= 1
-
-            # --- 本命星の計算 ---
-            honmei_sei = self._get_honmei_sei(calc_year)
-            if honmei_sei == "不明":
-                raise ValueError("本命星の計算に失敗しました。")
-
-            # 本命星の番号を取得 (月命星計算用)
-            honmei_sei_num = self.kyusei_dict_rev.get(honmei_sei)
-            if honmei_sei_num is None:
-                raise ValueError("本命星番号の取得に失敗しました。")
-
-            # --- 月命星の計算 ---
-            month_number = self._get_month_number(birth_month, birth_day)
-            if month_number == 0:
-                raise ValueError("月番号の計算に失敗しました。")
-
-            # 月命星を計算
-            tsukimei_sei = self._get_tsukimei_sei(honmei_sei_num, month_number)
-            if tsukimei_sei == "不明":
-                raise ValueError("月命星の計算に失敗しました。")
-
-            # 結果を辞書で返す
-            return {
-                "honmei_sei": honmei_sei,
-                "tsukimei_sei": tsukimei_sei
-            }
-
-        except Exception as e:
-            print(f"九星気学計算エラー: {e}")
-            return None
+        return calculate_kyusei(birth_year, birth_month, birth_day)
 
     def get_fortune(self, birth_date):
         """
@@ -198,7 +437,7 @@ class KyuseiFortune:
             }
             
         except Exception as e:
-            print(f"運勢計算エラー: {e}")
+            logger.error("運勢計算エラー: %s", e)
             return {
                 "number": 0,
                 "type": "不明",
@@ -218,134 +457,7 @@ class KyuseiFortune:
         Returns:
             str: 運勢の詳細な説明
         """
-        # 簡易的な運勢説明（実際のアプリケーションではより詳細なデータベースを使用）
-        descriptions = {
-            "一白水星": "知性と直感力に優れ、新しいアイデアを生み出す力があります。",
-            "二黒土星": "堅実で忍耐強く、着実に目標を達成する力があります。",
-            "三碧木星": "活発で行動力があり、リーダーシップを発揮します。",
-            "四緑木星": "調和とバランスを重視し、周囲との関係を良好に保ちます。",
-            "五黄土星": "中心的な存在で、周囲をまとめる力があります。",
-            "六白金星": "正義感が強く、公平な判断力を持っています。",
-            "七赤金星": "情熱的で魅力的、人を惹きつける力があります。",
-            "八白土星": "安定感があり、着実に物事を進める力があります。",
-            "九紫火星": "創造性と情熱に富み、新しい可能性を切り開きます。"
-        }
-        
-        honmei_desc = descriptions.get(honmei_sei, "特徴的な性格を持っています。")
-        tsukimei_desc = descriptions.get(tsukimei_sei, "現在の環境に適応しています。")
+        honmei_desc = KYUSEI_DESCRIPTIONS.get(honmei_sei, "特徴的な性格を持っています。")
+        tsukimei_desc = KYUSEI_DESCRIPTIONS.get(tsukimei_sei, "現在の環境に適応しています。")
         
         return f"あなたの本命星は{honmei_sei}で、{honmei_desc} 月命星は{tsukimei_sei}で、{tsukimei_desc} この組み合わせから、あなたは現在、新しい挑戦に適した時期にあります。"
-
-def calculate_kyusei(year, month, day):
-    """九星気学の計算を行う関数"""
-    try:
-        # 生年月日から九星を計算
-        honmei = calculate_honmei(year, month, day)
-        gatsumei = calculate_gatsumei(year, month, day)
-        
-        return {
-            'honmei_sei': honmei,
-            'tsukimei_sei': gatsumei
-        }
-    except Exception as e:
-        print(f"九星気学の計算でエラーが発生しました: {str(e)}")
-        return None
-
-def calculate_honmei(year, month, day):
-    """
-    本命星を計算する関数
-    
-    Args:
-        year (int): 生まれた年（西暦）
-        month (int): 生まれた月（1-12）
-        day (int): 生まれた日（1-31）
-        
-    Returns:
-        str: 本命星の名前
-    """
-    # 2月4日より前の生まれは前年扱い
-    if month == 1 or (month == 2 and day < 4):
-        year -= 1
-    
-    # 九星の計算
-    kyusei_numbers = {
-        1: "一白水星",
-        2: "二黒土星",
-        3: "三碧木星",
-        4: "四緑木星",
-        5: "五黄土星",
-        6: "六白金星",
-        7: "七赤金星",
-        8: "八白土星",
-        9: "九紫火星"
-    }
-    
-    remainder = (11 - (year % 9)) % 9
-    if remainder == 0:
-        remainder = 9
-    
-    return kyusei_numbers.get(remainder, "不明")
-
-def calculate_gatsumei(year, month, day):
-    """
-    月命星を計算する関数
-    
-    Args:
-        year (int): 生まれた年（西暦）
-        month (int): 生まれた月（1-12）
-        day (int): 生まれた日（1-31）
-        
-    Returns:
-        str: 月命星の名前
-    """
-    # 本命星を取得
-    honmei = calculate_honmei(year, month, day)
-    
-    # 本命星の番号を取得
-    kyusei_dict_rev = {
-        "一白水星": 1, "二黒土星": 2, "三碧木星": 3, "四緑木星": 4,
-        "五黄土星": 5, "六白金星": 6, "七赤金星": 7, "八白土星": 8,
-        "九紫火星": 9
-    }
-    honmei_num = kyusei_dict_rev.get(honmei)
-    
-    # 月番号を取得（節入り日で変わる）
-    def get_month_number(month, day):
-        if (month == 1 and day < 6) or (month == 12 and day >= 7): return 11
-        elif (month == 2 and day < 4) or (month == 1 and day >= 6): return 12
-        elif (month == 3 and day < 6) or (month == 2 and day >= 4): return 1
-        elif (month == 4 and day < 5) or (month == 3 and day >= 6): return 2
-        elif (month == 5 and day < 6) or (month == 4 and day >= 5): return 3
-        elif (month == 6 and day < 6) or (month == 5 and day >= 6): return 4
-        elif (month == 7 and day < 8) or (month == 6 and day >= 6): return 5
-        elif (month == 8 and day < 8) or (month == 7 and day >= 8): return 6
-        elif (month == 9 and day < 8) or (month == 8 and day >= 8): return 7
-        elif (month == 10 and day < 9) or (month == 9 and day >= 8): return 8
-        elif (month == 11 and day < 8) or (month == 10 and day >= 9): return 9
-        elif (month == 12 and day < 7) or (month == 11 and day >= 8): return 10
-        return 0
-    
-    month_number = get_month_number(month, day)
-    
-    # 本命星のグループに基づく基準値
-    if honmei_num in [1, 4, 7]:  # 水・木・金グループ
-        base_num = 8  # 2月は八白
-    elif honmei_num in [2, 5, 8]:  # 土グループ
-        base_num = 2  # 2月は二黒
-    elif honmei_num in [3, 6, 9]:  # 木・金・火グループ
-        base_num = 5  # 2月は五黄
-    else:
-        return "不明"
-    
-    # 月命星の計算
-    kyusei_numbers = {
-        1: "一白水星", 2: "二黒土星", 3: "三碧木星",
-        4: "四緑木星", 5: "五黄土星", 6: "六白金星",
-        7: "七赤金星", 8: "八白土星", 9: "九紫火星"
-    }
-    
-    gatsumei_num = (base_num - (month_number - 1)) % 9
-    if gatsumei_num <= 0:
-        gatsumei_num += 9
-    
-    return kyusei_numbers.get(gatsumei_num, "不明") 
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+九星盤（年盤・月盤・日盤）と吉方位の計算モジュール
+
+盤の中宮の星は、その日付の本命星・月命星・日命星と同じで、
+modules/kyusei の表からまとめて求める。中宮の星が決まれば残りの8方位の
+星は飛泊の順（中宮→北西→西→北東→南→北→南西→東→南東）に1つずつ
+進む（順行）か戻る（逆行）だけなので、中宮の星ごとの9×9の回座の表を
+引いて盤にする。年盤・月盤と陽遁の日盤は順行、陰遁の日盤は逆行で飛泊する。
+
+盤は方位の番号（PALACE_NAMES の添字）ごとの星の番号（一白＝1 … 九紫＝9）の
+配列で、3×3の図にする場合は to_grid を使う（南を上にした並び）。
+"""
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+from modules import kanshi, kyusei, pillars
+
+# 方位の番号（飛泊の順）
+PALACE_NAMES = ['中央', '北西', '西', '北東', '南', '北', '南西', '東', '南東']
+
+# 回座の表 [逆行なら1, 中宮の星 - 1, 方位の番号] -> 星の番号
+_DIRECTIONS = np.array([1, -1])
+BOARD_TABLE = ((np.arange(9)[None, :, None] + _DIRECTIONS[:, None, None] * np.arange(9)[None, None, :]) % 9
+               + 1).astype(np.int8)
+
+# 3×3の図の並び（南を上、東を左）
+GRID_LAYOUT = np.array([
+    [8, 4, 6],  # 南東 南 南西
+    [7, 0, 2],  # 東 中央 西
+    [3, 5, 1],  # 北東 北 北西
+])
+
+# 各方位の反対側の方位（中央は中央）
+OPPOSITE = np.array([0, 8, 7, 6, 5, 4, 3, 2, 1])
+
+# 十二支の方位（子＝北 … 亥＝北西）
+BRANCH_PALACE = np.array([5, 3, 3, 7, 8, 8, 4, 6, 6, 2, 1, 1])
+
+# 九星の五行（kanshi.ELEMENT_NAMES の番号: 木＝0、火＝1、土＝2、金＝3、水＝4）
+STAR_ELEMENT = np.array([4, 2, 0, 0, 2, 3, 3, 2, 1], dtype=np.int8)
+
+
+def _build_compatible():
+    # 本命星と相生（生じる・生じられる）または比和（同じ五行の別の星）の星を吉とする。五黄は除く
+    relation = (STAR_ELEMENT[None, :] - STAR_ELEMENT[:, None]) % 5
+    table = (relation == 1) | (relation == 4) | (relation == 0)
+    np.fill_diagonal(table, False)
+    table[:, 4] = False
+    return table
+
+
+# 相性の表 [本命星 - 1, 方位の星 - 1] -> 吉となる星なら True
+COMPATIBLE = _build_compatible()
+
+KyuseiBoards = namedtuple('KyuseiBoards', [
+    'dates',          # 日付（datetime64[D]）
+    'year_center',    # 年盤の中宮の星
+    'month_center',   # 月盤の中宮の星
+    'day_center',     # 日盤の中宮の星
+    'year_branch',    # 年の十二支の番号（子＝0）
+    'month_branch',   # 月の十二支の番号
+    'day_branch',     # 日の十二支の番号
+    'day_reverse',    # 日盤が逆行（陰遁）なら True
+])
+KyuseiBoards.__doc__ = """
+日付の範囲の九星盤
+
+盤は中宮の星の番号だけで持ち、方位ごとの星は board / to_grid で展開する。
+"""
+
+
+def board(center, reverse=False):
+    """
+    中宮の星から盤を返す
+
+    Args:
+        center (int or numpy.ndarray): 中宮の星の番号（1-9）
+        reverse (bool or numpy.ndarray): 逆行で飛泊する盤（陰遁の日盤）なら True
+
+    Returns:
+        numpy.ndarray: 方位の番号ごとの星の番号（最後の次元が9）
+    """
+    return BOARD_TABLE[np.asarray(reverse, dtype=np.int8), np.asarray(center) - 1]
+
+
+def to_grid(boards):
+    """方位の番号順の盤（最後の次元が9）を3×3の図（南が上）にする"""
+    return np.asarray(boards)[..., GRID_LAYOUT]
+
+
+def generate_boards(start, end):
+    """
+    start〜end の全ての日付の年盤・月盤・日盤をまとめて求める
+
+    Args:
+        start (date or str): 開始日
+        end (date or str): 終了日（この日を含む）
+
+    Returns:
+        KyuseiBoards: 日付ごとの盤
+    """
+    dates = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    stars = kyusei.calculate_kyusei_batch(dates)
+    return KyuseiBoards(
+        dates=dates,
+        year_center=stars.honmei,
+        month_center=stars.gatsumei,
+        day_center=stars.nichimei,
+        year_branch=((stars.kyusei_year - 4) % 12).astype(np.int8),
+        month_branch=kanshi.month_branch(stars.month_number).astype(np.int8),
+        day_branch=(pillars.day_indices(dates) % 12).astype(np.int8),
+        day_reverse=kyusei.inton_batch(dates),
+    )
+
+
+def generate_year_boards(year):
+    """指定年の1月1日〜12月31日の盤を求める"""
+    return generate_boards(date(year, 1, 1), date(year, 12, 31))
+
+
+def _build_lucky_table():
+    # 方位の星が本命星と相生・比和で、五黄殺・暗剣殺・本命殺・本命的殺・破
+    # （その年・月・日の十二支の反対の方位）にあたらない方位を吉とする
+    direction = _DIRECTIONS[:, None, None, None, None]
+    honmei = np.arange(1, 10)[None, :, None, None, None]
+    center = np.arange(1, 10)[None, None, :, None, None]
+    branch = np.arange(12)[None, None, None, :, None]
+    palaces = np.arange(9)
+    stars = BOARD_TABLE[:, None, :, None, :]
+    lucky = (COMPATIBLE[honmei - 1, stars - 1]
+             # 暗剣殺（五黄の反対）と本命的殺（本命星の反対）
+             & (palaces != OPPOSITE[direction * (5 - center) % 9])
+             & (palaces != OPPOSITE[direction * (honmei - center) % 9])
+             & (palaces != OPPOSITE[BRANCH_PALACE[branch]])
+             & (palaces != 0))
+    return (lucky.astype(np.uint16) << palaces.astype(np.uint16)).sum(axis=-1, dtype=np.uint16)
+
+
+# 吉方位の表 [逆行なら1, 本命星 - 1, 中宮の星 - 1, 十二支] -> 吉方位のビットマスク（ビット i が方位の番号 i）
+LUCKY_TABLE = _build_lucky_table()
+
+
+def lucky_direction_masks(honmei, center, branch, reverse=False):
+    """
+    本命星と盤から吉方位を求める
+
+    引数はNumPyの規則でブロードキャストするので、利用者の配列と日付の
+    配列から利用者×日付の吉方位をまとめて求められる。
+
+    Args:
+        honmei (int or numpy.ndarray): 本命星の番号
+        center (int or numpy.ndarray): 盤の中宮の星の番号
+        branch (int or numpy.ndarray): その年・月・日の十二支の番号
+        reverse (bool or numpy.ndarray): 逆行で飛泊する盤（陰遁の日盤）なら True
+
+    Returns:
+        numpy.ndarray: 吉方位のビットマスク（ビット i が方位の番号 i、uint16）
+    """
+    return LUCKY_TABLE[np.asarray(reverse, dtype=np.int8), np.asarray(honmei) - 1, np.asarray(center) - 1, branch]
+
+
+def direction_names(mask):
+    """吉方位のビットマスクを方位名のリストにする"""
+    mask = int(mask)
+    return [name for i, name in enumerate(PALACE_NAMES) if mask >> i & 1]
+
+
+def get_lucky_directions(year, month, day, target):
+    """
+    生年月日の人の指定日の年・月・日の吉方位を求める
+
+    Args:
+        year (int): 生まれた年（西暦）
+        month (int): 生まれた月（1-12）
+        day (int): 生まれた日（1-31）
+        target (date or str): 吉方位を求める日
+
+    Returns:
+        dict: {"year": 方位名のリスト, "month": ..., "day": ...}
+    """
+    honmei = kyusei.get_kyusei_stars(year, month, day).honmei
+    boards = generate_boards(target, target)
+    reverse = {'year': False, 'month': False, 'day': boards.day_reverse[0]}
+    return {
+        period: direction_names(lucky_direction_masks(
+            honmei, getattr(boards, f'{period}_center')[0], getattr(boards, f'{period}_branch')[0],
+            reverse[period]))
+        for period in ('year', 'month', 'day')
+    }
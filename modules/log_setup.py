@@ -0,0 +1,168 @@
+"""
+ロギングの設定
+
+app.py と main.py の起動時に configure_logging を1回呼ぶ。ログの出力は
+QueueHandler でキューに入れるだけにして、実際の書き込みと整形は
+QueueListener のスレッドで行うので、リクエストを処理するスレッドは
+ログのI/Oを待たない。LOG_FORMAT=json では1行に1件のJSONで出力する。
+
+占い結果などの大きなペイロードは log_payload で LOG_PAYLOAD_SAMPLE_RATE の
+割合だけ記録する。
+
+    LOG_LEVEL                ログレベル（既定 INFO）
+    LOG_FORMAT               'text' または 'json'（既定 text）
+    LOG_QUEUE                1 でキュー経由で出力する（既定 1）
+    LOG_PAYLOAD_SAMPLE_RATE  ペイロードを記録する割合（0〜1、既定 0.01）
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_QUEUE = os.environ.get('LOG_QUEUE', '1') == '1'
+LOG_PAYLOAD_SAMPLE_RATE = float(os.environ.get('LOG_PAYLOAD_SAMPLE_RATE', 0.01))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# LogRecord が標準で持つ属性（これ以外は extra で渡された項目としてJSONに含める）
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_handler = None
+_json_format = False
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    ログを1行のJSONにする
+
+    メッセージの引数の埋め込み（%形式）とJSONへの変換は、ログが実際に
+    出力されるときだけ行われる。extra で渡した項目はそのままキーになる。
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """引数の埋め込みだけをリクエストのスレッドで行い、整形は書き出しのスレッドに任せる"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _create_formatter(fmt):
+    if fmt == 'json':
+        return JSONFormatter()
+    if fmt != 'text':
+        logging.getLogger(__name__).warning(f"不明なログの形式です: {fmt}")
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def _start_listener(stream_handler):
+    """キューとそれを書き出すスレッドを作り、ルートロガーに付けるハンドラーを返す"""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return _QueueHandler(log_queue)
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, use_queue=LOG_QUEUE):
+    """
+    ルートロガーを設定する（2回目以降の呼び出しでは設定し直す）
+
+    Args:
+        level (str): ログレベル
+        fmt (str): 'text' または 'json'
+        use_queue (bool): キューを経由して別スレッドで出力するか
+    """
+    global _handler, _json_format
+    stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(_create_formatter(fmt))
+    _json_format = fmt == 'json'
+    _handler = _start_listener(stream_handler) if use_queue else stream_handler
+    root.addHandler(_handler)
+    root.setLevel(level)
+
+
+def stop_logging():
+    """キューに残ったログを書き出してスレッドを止める"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_payload(logger, message, payload, rate=None):
+    """
+    ペイロードを LOG_PAYLOAD_SAMPLE_RATE の割合だけ INFO で記録する
+
+    記録しない場合はペイロードの文字列化もしない。JSON形式では
+    ペイロードをメッセージに埋め込まず、payload キーにそのまま入れる。
+
+    Args:
+        logger (logging.Logger): ロガー
+        message (str): メッセージ
+        payload: 記録する値
+        rate (float): 記録する割合（未指定なら LOG_PAYLOAD_SAMPLE_RATE）
+    """
+    rate = LOG_PAYLOAD_SAMPLE_RATE if rate is None else rate
+    if rate <= 0 or (rate < 1 and random.random() >= rate):
+        return
+    if _json_format:
+        logger.info(message, extra={'payload': payload})
+    else:
+        logger.info('%s: %s', message, payload)
+
+
+def _after_fork_in_child():
+    """フォーク後の子プロセスでは書き出しのスレッドがないので、キューを作り直す"""
+    global _handler
+    if _listener is None:
+        return
+    stream_handler = _listener.handlers[0]
+    root = logging.getLogger()
+    root.removeHandler(_handler)
+    _handler = _start_listener(stream_handler)
+    root.addHandler(_handler)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+atexit.register(stop_logging)
@@ -0,0 +1,169 @@
+"""
+旧暦（太陰太陽暦）の計算モジュール
+
+暦データ（modules/almanac.py）の朔と中気（瞬時の黄道）から、旧暦の各月の
+始まりの日・月番号・閏月かどうかを並べた表を作る。表は暦データの生成時に
+一緒に書き出しておき、実行時は二分探索と引き算だけで新暦を旧暦にする。
+
+月の決め方は現行の旧暦の慣例に従う。
+    - 朔の日（日本時間）を月の初日とする
+    - 冬至を含む月を11月とし、月に含まれる中気で月番号を決める
+    - 冬至を含む月から次に冬至を含む月までが13か月の場合は、中気を
+      含まない最初の月を閏月とする
+"""
+import bisect
+from datetime import date
+
+import numpy as np
+
+from modules import almanac
+
+_UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# 冬至（黄経270°）を含む月の月番号
+_WINTER_SOLSTICE_MONTH = 11
+
+# 表の列: 月の初日（date.toordinal()）、旧暦の年、月番号（1-12）、閏月なら1
+START, YEAR, MONTH, LEAP = range(4)
+
+_table = None
+
+
+def _jst_days(seconds):
+    """UNIX秒の配列を日本時間の日付の date.toordinal() の値の配列にする"""
+    return np.floor((np.asarray(seconds) + 9 * 3600) / 86400).astype(np.int64) + _UNIX_EPOCH_ORDINAL
+
+
+def _month_of(angle):
+    """中気の黄経から月番号を返す（雨水＝1月 … 冬至＝11月、大寒＝12月）"""
+    return int((angle - 330.0) % 360.0 // 30.0) + 1
+
+
+def compute_lunar_months(new_moons, solar_terms):
+    """
+    朔と節気の表から旧暦の月の表を作る
+
+    中気が分かっている期間に収まる月だけを表に入れる。最後の行は表の
+    終わり（次の月の初日）を表し、月番号は0とする。
+
+    Args:
+        new_moons (numpy.ndarray): 朔のUNIX秒（昇順）
+        solar_terms (numpy.ndarray): 年ごとの24節気のUNIX秒（瞬時の黄道、列は sekki.SEKKI_ANGLES の順）
+
+    Returns:
+        numpy.ndarray: (月の数 + 1, 4) の int32 の配列。列は START, YEAR, MONTH, LEAP
+    """
+    from modules.sekki import SEKKI_ANGLES
+
+    starts = _jst_days(new_moons)
+    # 中気は節気表の奇数番目の列
+    chuuki_days = _jst_days(np.asarray(solar_terms)[:, 1::2]).ravel()
+    chuuki_angles = np.tile(SEKKI_ANGLES[1::2], len(solar_terms))
+
+    # 中気が分かっている期間に始まりと終わりが収まる月
+    first = int(np.searchsorted(starts, chuuki_days[0]))
+    last = int(np.searchsorted(starts, chuuki_days[-1], side='right')) - 1
+    starts = starts[first:last + 1]
+    count = len(starts) - 1
+
+    # 各月に含まれる中気の黄経のリスト（1か月に2つ含む場合もある）
+    positions = np.searchsorted(starts, chuuki_days, side='right') - 1
+    angles = [[] for _ in range(count)]
+    for position, angle in zip(positions.tolist(), chuuki_angles.tolist()):
+        if 0 <= position < count:
+            angles[position].append(angle)
+    # 閏月かどうか決められないので、中気を含む月から始める
+    skip = next(i for i, month_angles in enumerate(angles) if month_angles)
+    starts = starts[skip:]
+    angles = angles[skip:]
+    count -= skip
+    anchors = [i for i, month_angles in enumerate(angles) if 270.0 in month_angles]
+
+    leaps = [False] * count
+    months = [0] * count
+    # 冬至の月から次の冬至の月までが13か月なら、中気を含まない最初の月を閏月とする
+    for a, b in zip(anchors, anchors[1:]):
+        if b - a == 13:
+            leaps[next(i for i in range(a + 1, b) if not angles[i])] = True
+    # 最初と最後の冬至の月の外側では、中気を含まない月を閏月とする
+    for i in list(range(anchors[0])) + list(range(anchors[-1] + 1, count)):
+        leaps[i] = not angles[i]
+    # 冬至の月の前は中気から、後は冬至の月から順に月番号を付ける
+    for i in range(anchors[0]):
+        months[i] = _month_of(angles[i][0]) if not leaps[i] else months[i - 1]
+    month = _WINTER_SOLSTICE_MONTH - 1
+    for i in range(anchors[0], count):
+        if not leaps[i]:
+            month = month % 12 + 1
+        months[i] = month
+
+    table = np.zeros((count + 1, 4), dtype=np.int32)
+    table[:, START] = starts
+    table[:count, MONTH] = months
+    table[:count, LEAP] = leaps
+    # 旧暦の年は月の初日の年（年明け後に始まる11月・12月は前年）
+    for i in range(count):
+        start = date.fromordinal(int(starts[i]))
+        table[i, YEAR] = start.year - (months[i] >= 11 and start.month <= 2)
+    return table
+
+
+def _get_table():
+    """旧暦の月の表を初回のみ読み込む（データがなければNone）"""
+    global _table
+    if _table is None:
+        months = almanac.get_lunar_months()
+        _table = (np.asarray(months), months[:, START].tolist()) if months is not None else False
+    return _table or None
+
+
+def to_lunar_date(year, month, day):
+    """
+    新暦の日付を旧暦にする
+
+    Args:
+        year (int): 年
+        month (int): 月
+        day (int): 日
+
+    Returns:
+        tuple or None: (旧暦の年, 月, 日, 閏月か)。表の範囲外ならNone
+    """
+    table = _get_table()
+    if table is None:
+        return None
+    months, starts = table
+    ordinal = date(year, month, day).toordinal()
+    i = bisect.bisect_right(starts, ordinal) - 1
+    if not 0 <= i < len(starts) - 1:
+        return None
+    row = months[i]
+    return int(row[YEAR]), int(row[MONTH]), ordinal - starts[i] + 1, bool(row[LEAP])
+
+
+def to_lunar_dates(dates):
+    """
+    新暦の日付の配列をまとめて旧暦にする
+
+    Args:
+        dates (array-like): datetime64 の配列、または date.toordinal() の整数の配列
+
+    Returns:
+        tuple: (年, 月, 日, 閏月か) の配列。表の範囲外の日付は月が0になる
+    """
+    dates = np.asarray(dates)
+    if np.issubdtype(dates.dtype, np.datetime64):
+        ordinals = dates.astype('datetime64[D]').astype(np.int64) + _UNIX_EPOCH_ORDINAL
+    else:
+        ordinals = dates.astype(np.int64)
+    table = _get_table()
+    if table is None:
+        zeros = np.zeros(ordinals.shape, dtype=np.int32)
+        return zeros, zeros, zeros, zeros.astype(bool)
+    months, _ = table
+    i = np.searchsorted(months[:, START], ordinals, side='right') - 1
+    inside = (i >= 0) & (i < len(months) - 1)
+    rows = months[np.where(inside, i, len(months) - 1)]
+    days = np.where(inside, ordinals - rows[:, START] + 1, 0).astype(np.int32)
+    return (np.where(inside, rows[:, YEAR], 0), rows[:, MONTH], days,
+            rows[:, LEAP].astype(bool))
@@ -0,0 +1,289 @@
+"""
+占いごとの計算時間・エラー数と、結果の参照元（表・キャッシュ・計算）の計測
+
+計測値はプロセスごとに固定の配置の float64 の配列に足し込むだけにして、
+計算の経路では時刻を2回取って配列の要素を2つ増やす以上のことはしない。
+gthread のワーカーでは複数のスレッドが同じ配列を増やすので、足し込みは
+プロセス内のロックの中で行う（値を数え落とさない）。
+/metrics ではそれを Prometheus のテキスト形式にする。
+
+METRICS_DIR を指定すると、配列をそのディレクトリのプロセスごとのファイル
+（metrics_<pid>.bin）にメモリマップし、/metrics は全ファイルを合計する。
+gunicorn の全ワーカー（とプロセスプールの子プロセス）の値をまとめて
+返せるように、gunicorn_config.py で /dev/shm 以下を指定している
+（gunicorn_config.py では起動のたびに空にする）。
+プロセスがファイルを開くときに、終了したプロセスのファイルの値を
+metrics_merged.bin に足し込んでから削除するので、max_requests で
+ワーカーが入れ替わってもファイルは増え続けず、カウンタも減らない。
+
+    METRICS_DIR  プロセスごとのファイルを置くディレクトリ（既定 ''＝プロセス内のみ）
+"""
+import bisect
+import fcntl
+import glob
+import logging
+import mmap
+import os
+import threading
+from functools import wraps
+from time import perf_counter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+# 計測する占い（batch は複数日付をまとめた計算）
+SYSTEMS = ('shichuu', 'kyusei', 'sukuyo', 'western', 'western_batch', 'animal', 'inyou')
+# 結果の参照元（reading.lookup_reading で見つかった表・キャッシュと、見つからなかったもの）
+SOURCES = ('table', 'cache', 'miss')
+
+# 計算時間のヒストグラムの区切り（秒）
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# 占いごとの行の列: 区切りごとの件数（最後は +Inf）、合計時間、エラー数
+_SUM = len(BUCKETS) + 1
+_ERRORS = _SUM + 1
+_ROW_SIZE = _ERRORS + 1
+_SOURCE_OFFSET = len(SYSTEMS) * _ROW_SIZE
+_SIZE = _SOURCE_OFFSET + len(SOURCES)
+
+_SYSTEM_ROWS = {system: i * _ROW_SIZE for i, system in enumerate(SYSTEMS)}
+_SOURCE_INDEX = {source: _SOURCE_OFFSET + i for i, source in enumerate(SOURCES)}
+
+
+# 終了したプロセスの値をまとめたファイルと、それを書き換える間のロックのファイル
+MERGED_NAME = 'metrics_merged.bin'
+LOCK_NAME = 'metrics.lock'
+
+
+def _file_path(directory, pid):
+    return os.path.join(directory, f'metrics_{pid}.bin')
+
+
+def _read_values(path):
+    """ファイルの計測値を読む（読めない・配置の異なる古い版のファイルならNone）"""
+    try:
+        values = np.fromfile(path, dtype=np.float64)
+    except OSError as e:
+        logger.warning(f"計測値のファイルを読めません: {path}: {e}")
+        return None
+    return values if values.shape == (_SIZE,) else None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _locked(directory, operation):
+    """ディレクトリのロックのファイルを開いてロックする（閉じるとロックも外れる）"""
+    lock = open(os.path.join(directory, LOCK_NAME), 'a')
+    fcntl.flock(lock, operation)
+    return lock
+
+
+def merge_dead_files(directory=METRICS_DIR):
+    """
+    終了したプロセスのファイルの値を metrics_merged.bin に足し込み、元のファイルを削除する
+
+    collect と同じロックの中で行うので、集計の途中で値が二重に数えられたり
+    消えたりすることはない。
+    """
+    with _locked(directory, fcntl.LOCK_EX):
+        dead = []
+        for path in glob.glob(os.path.join(directory, 'metrics_*.bin')):
+            pid = os.path.basename(path)[len('metrics_'):-len('.bin')]
+            if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                dead.append(path)
+        if not dead:
+            return
+        merged_path = os.path.join(directory, MERGED_NAME)
+        total = _read_values(merged_path) if os.path.exists(merged_path) else None
+        total = np.zeros(_SIZE) if total is None else total
+        for path in dead:
+            values = _read_values(path)
+            if values is not None:
+                total += values
+        # 書き終えたファイルに置き換えて、途中の内容を読まれないようにする
+        temporary = merged_path + '.tmp'
+        total.tofile(temporary)
+        os.replace(temporary, merged_path)
+        for path in dead:
+            os.remove(path)
+
+
+def _open_values(directory=METRICS_DIR):
+    """
+    このプロセスの計測値の配列を開く（ディレクトリの指定がなければメモリ上に作る）
+
+    要素を1つずつ増やすのは NumPy の配列より memoryview の方が速いので、
+    float64 の memoryview として返す。
+    """
+    if directory:
+        try:
+            os.makedirs(directory, exist_ok=True)
+            try:
+                merge_dead_files(directory)
+            except OSError as e:
+                logger.warning(f"終了したプロセスの計測値をまとめられません: {e}")
+            path = _file_path(directory, os.getpid())
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                # 同じpidのファイルが残っていれば続きから数える
+                if os.fstat(fd).st_size != _SIZE * 8:
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, _SIZE * 8)
+                return memoryview(mmap.mmap(fd, _SIZE * 8)).cast('d')
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.warning(f"計測値のファイルを開けません: {e}")
+    return memoryview(bytearray(_SIZE * 8)).cast('d')
+
+
+_values = _open_values()
+# _values の要素を増やす間のロック（要素の読み出しと書き戻しの間に他のスレッドが入らないように）
+_lock = threading.Lock()
+
+
+def count_source(source):
+    """結果の参照元（'table'、'cache'、'miss'）を1件数える"""
+    with _lock:
+        _values[_SOURCE_INDEX[source]] += 1
+
+
+def instrument(system, func):
+    """
+    func を呼ぶたびに計算時間を記録する関数を返す
+
+    例外は数えてからそのまま送出する（エラー時の結果は呼び出し元で作る）。
+
+    Args:
+        system (str): SYSTEMS のいずれか
+        func (callable): 占いの計算関数
+
+    Returns:
+        callable: func と同じ引数・戻り値の関数
+    """
+    row = _SYSTEM_ROWS[system]
+    buckets = BUCKETS
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            with _lock:
+                _values[row + _ERRORS] += 1
+            raise
+        finally:
+            elapsed = perf_counter() - start
+            bucket = row + bisect.bisect_left(buckets, elapsed)
+            with _lock:
+                values = _values
+                values[bucket] += 1
+                values[row + _SUM] += elapsed
+    return wrapper
+
+
+def collect(directory=METRICS_DIR):
+    """
+    計測値を集計する
+
+    ディレクトリの指定があればその中の全プロセスのファイルを合計し、
+    なければこのプロセスの値を返す。
+
+    Returns:
+        numpy.ndarray: 計測値の配列（コピー）
+    """
+    if not directory:
+        with _lock:
+            return np.frombuffer(_values, dtype=np.float64).copy()
+    total = np.zeros(_SIZE)
+    if not os.path.isdir(directory):
+        return total
+    with _locked(directory, fcntl.LOCK_SH):
+        for path in glob.glob(os.path.join(directory, 'metrics_*.bin')):
+            # 配置の異なる古い版のファイルは数えない
+            values = _read_values(path)
+            if values is not None:
+                total += values
+    return total
+
+
+def _format_number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render(directory=METRICS_DIR):
+    """
+    集計した計測値を Prometheus のテキスト形式（0.0.4）で返す
+
+    Returns:
+        str: /metrics のレスポンス本文
+    """
+    values = collect(directory)
+    lines = [
+        '# HELP uranai_system_latency_seconds 占いごとの計算時間',
+        '# TYPE uranai_system_latency_seconds histogram',
+    ]
+    for system, row in _SYSTEM_ROWS.items():
+        counts = np.cumsum(values[row:row + len(BUCKETS) + 1])
+        for le, count in zip([repr(b) for b in BUCKETS] + ['+Inf'], counts):
+            lines.append(f'uranai_system_latency_seconds_bucket{{system="{system}",le="{le}"}} '
+                         f'{_format_number(count)}')
+        lines.append(f'uranai_system_latency_seconds_sum{{system="{system}"}} '
+                     f'{_format_number(values[row + _SUM])}')
+        lines.append(f'uranai_system_latency_seconds_count{{system="{system}"}} '
+                     f'{_format_number(counts[-1])}')
+
+    lines += [
+        '# HELP uranai_system_errors_total 占いごとの計算のエラー数',
+        '# TYPE uranai_system_errors_total counter',
+    ]
+    for system, row in _SYSTEM_ROWS.items():
+        lines.append(f'uranai_system_errors_total{{system="{system}"}} '
+                     f'{_format_number(values[row + _ERRORS])}')
+
+    lines += [
+        '# HELP uranai_reading_lookups_total 生年月日ごとの結果の参照元',
+        '# TYPE uranai_reading_lookups_total counter',
+    ]
+    for source, index in _SOURCE_INDEX.items():
+        lines.append(f'uranai_reading_lookups_total{{source="{source}"}} '
+                     f'{_format_number(values[index])}')
+
+    lookups = sum(values[index] for index in _SOURCE_INDEX.values())
+    hits = values[_SOURCE_INDEX['table']] + values[_SOURCE_INDEX['cache']]
+    lines += [
+        '# HELP uranai_reading_hit_ratio 表かキャッシュから返した結果の割合',
+        '# TYPE uranai_reading_hit_ratio gauge',
+        f'uranai_reading_hit_ratio {_format_number(hits / lookups if lookups else 0.0)}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def _after_fork_in_child():
+    """
+    フォーク後の子プロセスは自分の計測値の配列を開き直す（親の値は数え直さない）
+
+    フォークした時に親の別のスレッドがロックを持っていても子で待ち続けないように、
+    ロックも作り直す。
+    """
+    global _values, _lock
+    _lock = threading.Lock()
+    _values = _open_values()
+# _values の要素を増やす間のロック（要素の読み出しと書き戻しの間に他のスレッドが入らないように）
+_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
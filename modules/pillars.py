@@ -0,0 +1,258 @@
+"""
+生年月日ごとの柱（年柱・月の節・日柱）をまとめて求めるモジュール
+
+四柱推命と陰陽五行はどちらも、立春で区切った年柱、節入りで区切った
+月番号、日柱を使う。これらを生年月日ごとに1回だけ求めて
+PillarContext にまとめ、各モジュールはそこから自分の結果を組み立てる。
+月柱の干の決め方はモジュールごとに異なるので、ここでは月番号までを扱う。
+
+出生時刻が分かる場合は get_birth_time_context で、立春・節入りを
+瞬時の黄道による正確な時刻で判定し、時柱も求める。
+
+大量の日付をまとめて扱う場合は day_indices / year_indices /
+month_indices で、日付の配列から柱の番号の配列を一度に求める。
+"""
+from collections import namedtuple
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+
+import numpy as np
+
+from modules import kanshi, sekki, solar_time
+
+JST = timezone(timedelta(hours=9))
+
+# 年干支の基準（1984年＝甲子）と日干支の基準（1984年1月31日＝甲子）
+_BASE_YEAR = 1984
+_BASE_DAY_ORDINAL = date(1984, 1, 31).toordinal()
+_UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+PillarContext = namedtuple('PillarContext', [
+    'year', 'month', 'day', 'hour', 'minute',
+    'pillar_year',   # 立春で補正した年
+    'year_index',    # 年柱の60干支の番号（甲子＝0）
+    'month_index',   # 節月の番号（寅＝1、丑＝12）
+    'day_index',     # 日柱の60干支の番号（甲子＝0）
+    'hour_index',    # 時柱の60干支の番号（出生時刻が不明ならNone）
+    'solar_time',    # 時柱の判定に使った時刻（地方真太陽時、出生時刻が不明ならNone）
+], defaults=(None, None))
+PillarContext.__doc__ = """
+生年月日から求めた柱の情報
+
+干支は60干支の番号（甲子＝0）で持ち、文字列への変換は各モジュールで行う。
+"""
+
+
+def year_index(year):
+    """年の60干支の番号を返す（1984年＝甲子＝0）"""
+    return (year - _BASE_YEAR) % 60
+
+
+def day_index(year, month, day):
+    """日の60干支の番号を返す（1984年1月31日＝甲子＝0）"""
+    return (date(year, month, day).toordinal() - _BASE_DAY_ORDINAL) % 60
+
+
+def hour_index(day_stem, hour):
+    """
+    日干と時刻から時柱の60干支の番号を返す
+
+    Args:
+        day_stem (int): 日干の番号（甲＝0）
+        hour (int): 時（0〜23）。子の刻は23時から始まる
+
+    Returns:
+        int: 60干支の番号
+    """
+    branch = (hour + 1) // 2 % 12
+    # 五鼠遁: 子の刻の干は 甲・己日→甲、乙・庚日→丙、丙・辛日→戊、丁・壬日→庚、戊・癸日→壬
+    stem = (day_stem % 5 * 2 + branch) % 10
+    return kanshi.eto_from(stem, branch)
+
+
+@lru_cache(maxsize=4096)
+def get_pillar_context(year, month, day, hour=12, minute=0):
+    """
+    生年月日時から柱の情報をまとめて求める
+
+    立春と節入りの時刻は節気表から1回ずつ引くだけで、同じ生年月日時の
+    2回目以降の呼び出しはキャッシュから返す。
+
+    Args:
+        year (int): 生年
+        month (int): 生月
+        day (int): 生日
+        hour (int): 生まれた時（日本時間、不明なら12）
+        minute (int): 生まれた分
+
+    Returns:
+        PillarContext: 柱の情報
+    """
+    birth = datetime(year, month, day, hour, minute, tzinfo=JST)
+    pillar_year = year
+    setsubun = sekki.setsubun_datetime(year)
+    if setsubun and birth < setsubun:
+        pillar_year -= 1
+    month_index = sekki.month_index_from_starts(sekki.month_start_dates(year), birth)
+    return PillarContext(
+        year=year, month=month, day=day, hour=hour, minute=minute,
+        pillar_year=pillar_year,
+        year_index=year_index(pillar_year),
+        month_index=month_index,
+        day_index=day_index(year, month, day),
+    )
+
+
+@lru_cache(maxsize=4096)
+def get_birth_time_context(year, month, day, hour, minute=0, longitude=None):
+    """
+    出生時刻が分かる場合の柱の情報を求める
+
+    年柱・月番号は出生の瞬間と瞬時の黄道による立春・節入りの時刻を
+    比べて決める。日柱・時柱は出生地の経度が指定されていれば地方真太陽時
+    で、なければ日本標準時の時刻で決める。23時台の子の刻は翌日の子の刻と
+    して扱い、時干は翌日の日干から求める（日柱は日付のまま）。
+
+    Args:
+        year (int): 生年
+        month (int): 生月
+        day (int): 生日
+        hour (int): 生まれた時（日本時間、0〜23）
+        minute (int): 生まれた分
+        longitude (float or None): 出生地の経度（東経を正）
+
+    Returns:
+        PillarContext: 柱の情報（hour_index と solar_time を含む）
+    """
+    birth = datetime(year, month, day, hour, minute, tzinfo=JST)
+    risshun = sekki.get_solar_term_time(year, 315.0, epoch='date')
+    pillar_year = year - 1 if birth.timestamp() < risshun else year
+    month_index = sekki.solar_month_index(birth, epoch='date')
+
+    solar = solar_time.local_apparent_time(birth, longitude)
+    solar_day = solar.date()
+    stem_day = solar_day + timedelta(days=1) if solar.hour == 23 else solar_day
+    day_stem = day_index(stem_day.year, stem_day.month, stem_day.day) % 10
+    return PillarContext(
+        year=year, month=month, day=day, hour=hour, minute=minute,
+        pillar_year=pillar_year,
+        year_index=year_index(pillar_year),
+        month_index=month_index,
+        day_index=day_index(solar_day.year, solar_day.month, solar_day.day),
+        hour_index=hour_index(day_stem, solar.hour),
+        solar_time=solar,
+    )
+
+
+# --- 日付の配列に対する計算 ---
+def _unix_days(dates):
+    """
+    日付の配列を1970年1月1日からの日数の配列にする
+
+    Args:
+        dates (array-like): datetime64 の配列、または date.toordinal() の整数の配列
+    """
+    dates = np.asarray(dates)
+    if np.issubdtype(dates.dtype, np.datetime64):
+        return dates.astype('datetime64[D]').astype(np.int64)
+    return dates.astype(np.int64) - _UNIX_EPOCH_ORDINAL
+
+
+def _birth_seconds(days, hour, minute):
+    """日本時間の生年月日時をUNIX秒にする"""
+    return days * 86400 + (np.asarray(hour) - 9) * 3600 + np.asarray(minute) * 60
+
+
+def _calendar_years(days):
+    return days.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+
+
+@lru_cache(maxsize=16)
+def _boundary_table(start_year, end_year):
+    """
+    各年の立春と月の節入りの時刻（UNIX秒）の表を作る
+
+    get_pillar_context と同じく sekki.setsubun_datetime / month_start_dates の
+    値を使う。立春が求まらない年はその年の全ての日を立春以降とみなし、
+    求まらない節入りは無限大にして数えないようにする。
+
+    Returns:
+        tuple: (立春の配列 (年数,), 節入りの配列 (年数, 12))
+    """
+    years = range(start_year, end_year + 1)
+    setsubun = np.empty(len(years))
+    month_starts = np.full((len(years), 12), np.inf)
+    for i, year in enumerate(years):
+        found = sekki.setsubun_datetime(year)
+        setsubun[i] = found.timestamp() if found else -np.inf
+        for j, (_, start) in enumerate(sekki.month_start_dates(year)):
+            month_starts[i, j] = start.timestamp()
+    return setsubun, month_starts
+
+
+def _lookup_boundaries(years):
+    start_year = int(years.min())
+    setsubun, month_starts = _boundary_table(start_year, int(years.max()))
+    offset = years - start_year
+    return setsubun[offset], month_starts[offset]
+
+
+def day_indices(dates):
+    """
+    日付の配列の日柱の番号（甲子＝0）をまとめて求める
+
+    Args:
+        dates (array-like): datetime64 の配列、または date.toordinal() の整数の配列
+
+    Returns:
+        numpy.ndarray: 日柱の60干支の番号（int8）
+    """
+    days = _unix_days(dates)
+    return ((days + _UNIX_EPOCH_ORDINAL - _BASE_DAY_ORDINAL) % 60).astype(np.int8)
+
+
+def year_indices(dates, hour=12, minute=0):
+    """
+    日付の配列の年柱の番号（甲子＝0）を立春で補正してまとめて求める
+
+    get_pillar_context と同じ立春の判定を、年ごとの立春の表を引いて行う。
+
+    Args:
+        dates (array-like): datetime64 の配列、または date.toordinal() の整数の配列
+        hour (int or array-like): 生まれた時（日本時間）
+        minute (int or array-like): 生まれた分
+
+    Returns:
+        numpy.ndarray: 年柱の60干支の番号（int8）
+    """
+    days = _unix_days(dates)
+    if days.size == 0:
+        return np.empty(days.shape, dtype=np.int8)
+    years = _calendar_years(days)
+    setsubun, _ = _lookup_boundaries(years)
+    pillar_years = years - (_birth_seconds(days, hour, minute) < setsubun)
+    return ((pillar_years - _BASE_YEAR) % 60).astype(np.int8)
+
+
+def month_indices(dates, hour=12, minute=0):
+    """
+    日付の配列の節月の番号（寅＝1、丑＝12）をまとめて求める
+
+    get_pillar_context と同じく、その年の節入りのうち生まれた時刻以前の
+    ものの数を月番号とする（0 の場合は前年の丑月）。
+
+    Args:
+        dates (array-like): datetime64 の配列、または date.toordinal() の整数の配列
+        hour (int or array-like): 生まれた時（日本時間）
+        minute (int or array-like): 生まれた分
+
+    Returns:
+        numpy.ndarray: 月番号（int8）
+    """
+    days = _unix_days(dates)
+    if days.size == 0:
+        return np.empty(days.shape, dtype=np.int8)
+    _, month_starts = _lookup_boundaries(_calendar_years(days))
+    birth = _birth_seconds(days, hour, minute)
+    count = (month_starts <= np.asarray(birth)[..., None]).sum(axis=-1)
+    return np.where(count > 0, count, 12).astype(np.int8)
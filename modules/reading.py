@@ -0,0 +1,355 @@
+"""
+6種類の占い結果をまとめて計算するモジュール
+
+/api/predict の1件分の計算と、/api/predict/batch の複数件の計算を提供する。
+バッチでは暦計算を伴う重い占い（四柱推命・陰陽五行・西洋占星術）を
+プロセスプールで並列に計算し、テーブル参照だけの軽い占い（九星気学・
+宿曜・どうぶつ占い）は呼び出し元のスレッドで計算する。
+
+事前計算の表（modules/reading_table.py）やキャッシュにある日付は
+計算せずにその結果を返す。
+"""
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from modules import almanac, cache, metrics, reading_table
+from modules.shichuu import calculate_shichuu
+from modules.kyusei import KYUSEI_NAMES, get_kyusei_stars
+from modules.sukuyo import calculate_sukuyo
+from modules.western import calculate_western_astrology, calculate_western_astrology_batch
+from modules.doubutsu import calculate_animal_fortune
+from modules.inyou import calculate_inyou_gogyo
+
+logger = logging.getLogger(__name__)
+
+# 計算結果の版（占いの計算や表を変えたら上げて、キャッシュ済みの結果を無効にする）
+READING_VERSION = 7
+
+# プロセスプールの1タスクで計算する日付の数
+BATCH_CHUNK_SIZE = int(os.environ.get('PREDICT_BATCH_CHUNK_SIZE', 256))
+# プロセスプールのワーカー数（未指定ならCPU数をWebサーバーのワーカー数で割った数）。
+# プールはWebサーバーのワーカーごとに作られるので、合計がCPU数を超えないようにする
+POOL_WORKERS = (int(os.environ.get('PREDICT_POOL_WORKERS', 0))
+                or max(1, os.cpu_count() // int(os.environ.get('WEB_CONCURRENCY', 1))))
+
+_executor = None
+
+# 計算時間とエラー数を記録する各占いの計算関数（/metrics で公開する）
+calculate_shichuu = metrics.instrument('shichuu', calculate_shichuu)
+get_kyusei_stars = metrics.instrument('kyusei', get_kyusei_stars)
+calculate_sukuyo = metrics.instrument('sukuyo', calculate_sukuyo)
+calculate_western_astrology = metrics.instrument('western', calculate_western_astrology)
+calculate_western_astrology_batch = metrics.instrument('western_batch', calculate_western_astrology_batch)
+calculate_animal_fortune = metrics.instrument('animal', calculate_animal_fortune)
+calculate_inyou_gogyo = metrics.instrument('inyou', calculate_inyou_gogyo)
+
+
+# --- 各占いの計算（エラー時は占いごとのエラー結果を返す） ---
+def _calculate_shichuu(year, month, day, hour=None, minute=0, longitude=None):
+    try:
+        result = calculate_shichuu(year, month, day, hour, minute, longitude)
+        logger.debug("四柱推命の計算結果: %s", result)
+        return result
+    except Exception as e:
+        logger.error("四柱推命の計算でエラー: %s", e)
+        return {"error": "四柱推命の計算に失敗しました"}
+
+
+def _calculate_kyusei(year, month, day):
+    try:
+        stars = get_kyusei_stars(year, month, day)
+        result = {
+            "honmei": KYUSEI_NAMES[stars.honmei - 1],
+            "gatsumei": KYUSEI_NAMES[stars.gatsumei - 1],
+            "nichimei": KYUSEI_NAMES[stars.nichimei - 1]
+        }
+        logger.debug("九星気学の計算結果: %s", result)
+        return result
+    except Exception as e:
+        logger.error("九星気学の計算でエラー: %s", e)
+        return {"error": "九星気学の計算に失敗しました"}
+
+
+def _calculate_sukuyo(year, month, day):
+    try:
+        result = calculate_sukuyo(year, month, day)
+        logger.debug("宿曜の計算結果: %s", result)
+        return result
+    except Exception as e:
+        logger.error("宿曜の計算でエラー: %s", e)
+        return {"error": "宿曜の計算に失敗しました"}
+
+
+def _calculate_western(year, month, day):
+    try:
+        result = calculate_western_astrology(year, month, day)
+        logger.debug("西洋占星術の計算結果: %s", result)
+        return result
+    except Exception as e:
+        logger.error("西洋占星術の計算でエラー: %s", e)
+        return {"error": "西洋占星術の計算に失敗しました"}
+
+
+def _calculate_animal(year, month, day):
+    try:
+        result = calculate_animal_fortune(year, month, day)
+        logger.debug("どうぶつ占いの計算結果: %s", result)
+    except Exception as e:
+        logger.error("どうぶつ占いの計算でエラー: %s", e)
+        result = "不明な動物"
+    return {"animal_character": result}
+
+
+def _calculate_inyou(year, month, day):
+    try:
+        result = calculate_inyou_gogyo(year, month, day)
+        logger.debug("陰陽五行の計算結果: %s", result)
+        return result
+    except Exception as e:
+        logger.error("陰陽五行の計算でエラー: %s", e)
+        return {"error": "陰陽五行の計算に失敗しました"}
+
+
+def _assemble(heavy, light):
+    """重い占いと軽い占いの結果をレスポンスの順序で1つの辞書にまとめる"""
+    return {
+        "shichuu": heavy["shichuu"],
+        "kyusei": light["kyusei"],
+        "sukuyo": light["sukuyo"],
+        "western": heavy["western"],
+        "animal": light["animal"],
+        "inyou": heavy["inyou"]
+    }
+
+
+def _calculate_light(year, month, day):
+    return {
+        "kyusei": _calculate_kyusei(year, month, day),
+        "sukuyo": _calculate_sukuyo(year, month, day),
+        "animal": _calculate_animal(year, month, day),
+    }
+
+
+def cache_version():
+    """キャッシュのキーに含める版（計算の版と暦データの版・収録範囲）"""
+    version = f"r{READING_VERSION}.a{almanac.ALMANAC_VERSION}"
+    years = almanac.year_range()
+    if years is not None:
+        version += f".{years[0]}-{years[1]}"
+    return version
+
+
+def get_cache():
+    """占い結果のキャッシュを返す"""
+    return cache.get_cache(cache_version())
+
+
+def lookup_reading(date):
+    """
+    事前計算の表かキャッシュにある結果を返す（なければNone）
+
+    Args:
+        date (tuple): (year, month, day)
+    """
+    table = reading_table.get_table(cache_version())
+    if table is not None:
+        result = table.lookup(*date)
+        if result is not None:
+            metrics.count_source('table')
+            return result
+    result = get_cache().get(*date)
+    metrics.count_source('cache' if result is not None else 'miss')
+    return result
+
+
+def _is_cacheable(result):
+    """どの占いも失敗していない結果だけをキャッシュする"""
+    if result["animal"]["animal_character"] == "不明な動物":
+        return False
+    return not any(isinstance(value, dict) and "error" in value for value in result.values())
+
+
+def store_reading(date, result):
+    """計算した結果をキャッシュに保存する（失敗を含む結果は保存しない）"""
+    if _is_cacheable(result):
+        get_cache().set(*date, result)
+
+
+def compute_reading(year, month, day):
+    """
+    表やキャッシュを使わずに1件の生年月日の6種類の占いを計算する
+
+    Returns:
+        dict: /api/predict のレスポンスと同じ形式の結果
+    """
+    heavy = {
+        "shichuu": _calculate_shichuu(year, month, day),
+        "western": _calculate_western(year, month, day),
+        "inyou": _calculate_inyou(year, month, day),
+    }
+    return _assemble(heavy, _calculate_light(year, month, day))
+
+
+def calculate_reading(year, month, day, hour=None, minute=0, longitude=None):
+    """
+    1件の生年月日について6種類の占いを計算する
+
+    事前計算の表の範囲内なら表から、キャッシュ済みならキャッシュから返す。
+    出生時刻が指定された場合は、四柱推命だけ時柱を含めて計算し直す。
+
+    Args:
+        year (int): 生年
+        month (int): 生月
+        day (int): 生日
+        hour (int): 生まれた時（日本時間、不明ならNone）
+        minute (int): 生まれた分
+        longitude (float): 出生地の経度（東経を正、不明ならNone）
+
+    Returns:
+        dict: /api/predict のレスポンスと同じ形式の結果
+    """
+    result = lookup_reading((year, month, day))
+    if result is None:
+        result = compute_reading(year, month, day)
+        store_reading((year, month, day), result)
+    if hour is not None:
+        result["shichuu"] = _calculate_shichuu(year, month, day, hour, minute, longitude)
+    return result
+
+
+def _calculate_heavy_chunk(dates):
+    """
+    プロセスプールで実行する重い占いの計算（西洋占星術はまとめてベクトル計算する）
+
+    Args:
+        dates (list): (year, month, day) のタプルのリスト
+
+    Returns:
+        list: 各日付の {"shichuu", "western", "inyou"} の辞書のリスト
+    """
+    try:
+        westerns = calculate_western_astrology_batch(dates)
+    except Exception as e:
+        logger.error("西洋占星術の計算でエラー: %s", e)
+        westerns = [{"error": "西洋占星術の計算に失敗しました"}] * len(dates)
+    return [
+        {
+            "shichuu": _calculate_shichuu(*date),
+            "western": western,
+            "inyou": _calculate_inyou(*date),
+        }
+        for date, western in zip(dates, westerns)
+    ]
+
+
+def get_executor():
+    """重い占い用のプロセスプールを初回のみ作成して返す"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=POOL_WORKERS)
+    return _executor
+
+
+def _discard_executor(executor):
+    """
+    壊れたプロセスプールを捨てて、次の get_executor で作り直す
+
+    子プロセスが1つでも異常終了（OOMによる強制終了など）すると、プールは
+    以後の投入を全て BrokenProcessPool で拒否するので、使い続けない。
+    """
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _chunk_result(future, chunk, executor):
+    """チャンクの計算結果を待つ（プロセスプールが使えない場合はこのスレッドで計算する）"""
+    if future is not None:
+        try:
+            return future.result()
+        except BrokenProcessPool as e:
+            logger.error("プロセスプールが壊れたため作り直します: %s", e)
+            _discard_executor(executor)
+        except Exception as e:
+            logger.error("プロセスプールでの計算に失敗: %s", e)
+    return _calculate_heavy_chunk(chunk)
+
+
+def compute_readings(dates, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    複数の生年月日の占い結果を表やキャッシュを使わずに計算し、入力順に返す
+
+    同じ日付は1回だけ計算する。重い占いはチャンクごとにプロセスプールへ
+    投入しておき、軽い占いを計算しながら入力順に結果を待ち合わせる。
+
+    Args:
+        dates (list): (year, month, day) のタプルのリスト
+        chunk_size (int): プロセスプールの1タスクで計算する日付の数
+
+    Yields:
+        dict: calculate_reading と同じ形式の結果
+    """
+    unique = list(dict.fromkeys(dates))
+    position = {date: i for i, date in enumerate(unique)}
+    chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+    executor = get_executor()
+    futures = []
+    for chunk in chunks:
+        try:
+            futures.append(executor.submit(_calculate_heavy_chunk, chunk))
+        except BrokenProcessPool as e:
+            # 残りのチャンクはこのスレッドで計算する
+            logger.error("プロセスプールが壊れたため作り直します: %s", e)
+            _discard_executor(executor)
+            futures += [None] * (len(chunks) - len(futures))
+            break
+
+    heavy_results = {}
+    light_results = {}
+    for date in dates:
+        if date not in light_results:
+            light_results[date] = _calculate_light(*date)
+        chunk_index = position[date] // chunk_size
+        if chunk_index not in heavy_results:
+            heavy_results[chunk_index] = _chunk_result(futures[chunk_index], chunks[chunk_index], executor)
+        heavy = heavy_results[chunk_index][position[date] % chunk_size]
+        yield _assemble(heavy, light_results[date])
+
+
+def iter_readings(dates, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    複数の生年月日の占い結果を入力順に1件ずつ返すジェネレータ
+
+    事前計算の表やキャッシュにある日付はそこから返し、残りを
+    compute_readings でまとめて計算してキャッシュに保存する。
+
+    Args:
+        dates (list): (year, month, day) のタプルのリスト
+        chunk_size (int): プロセスプールの1タスクで計算する日付の数
+
+    Yields:
+        dict: calculate_reading と同じ形式の結果
+    """
+    # 日付ごとの残りの出現回数。結果は後でもう一度返す日付の分だけ保持し、
+    # 最後に返した時点で手放す
+    remaining = Counter(dates)
+    found = {}
+    for date in remaining:
+        result = lookup_reading(date)
+        if result is not None:
+            found[date] = result
+    missing = [date for date in remaining if date not in found]
+    computed = zip(missing, compute_readings(missing, chunk_size))
+    for date in dates:
+        result = found.pop(date, None)
+        if result is None:
+            computed_date, result = next(computed)
+            store_reading(computed_date, result)
+        remaining[date] -= 1
+        if remaining[date]:
+            found[date] = result
+        yield result
@@ -0,0 +1,321 @@
+"""
+全期間の占い結果を事前計算した表の生成と読み込みを行うモジュール
+
+デプロイ前に次のコマンドで、暦データの範囲の全ての日付について
+6種類の占いを計算し、列ごとの配列として書き出しておく。
+
+    python -m modules.reading_table --start 1900-01-01 --end 2052-12-31
+
+文字列の値は列ごとの辞書の番号（整数）で、黄経は float32 で保存する
+（誤差は0.0001°未満で、表示に使う小数第2位までの値には影響しない）。
+実行時は各列をメモリマップで開き、日付の通し番号で1行を取り出すだけで
+/api/predict の結果になる。メモリマップはページキャッシュを通じて
+全ワーカーで共有される。
+
+表の範囲外の日付と、計算の版（reading.cache_version）が表と一致しない
+場合は、これまでどおり計算する。
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 表の形式を変えたら上げる
+TABLE_FORMAT_VERSION = 2
+
+DATA_DIR = os.environ.get(
+    'READING_TABLE_DIR', os.path.join(os.path.dirname(__file__), 'data', 'readings'))
+MANIFEST_NAME = 'readings.json'
+
+# 辞書の番号のうち、0 はその項目がないこと、1 は日付や他の項目から
+# 組み立て直せる値であることを表す
+_ABSENT = 0
+_DERIVED = 1
+_FIRST_CODE = 2
+_DERIVED_VALUE = object()
+
+# 浮動小数点数の列の型
+FLOAT_DTYPE = np.float32
+
+_table = None
+
+
+def _interpretation(day, parent):
+    from modules.western import format_interpretation
+    return format_interpretation(parent["moon_longitude"], parent["sun_longitude"],
+                                 parent["moon_sign"], parent["sun_sign"])
+
+
+# 日付ごとに値が異なり辞書に入れると大きくなる項目は、保存せずに組み立て直す
+_DERIVERS = {
+    ('western', 'interpretation'): _interpretation,
+}
+
+
+def flatten(result, prefix=()):
+    """入れ子の辞書を (経路, 値) の並びにする（キーの順序を保つ）"""
+    for key, value in result.items():
+        path = prefix + (key,)
+        if isinstance(value, dict) and value:
+            yield from flatten(value, path)
+        else:
+            yield path, value
+
+
+def _derive(path, day, parent):
+    try:
+        return _DERIVERS[path](day, parent)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _code_dtype(size):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if size <= np.iinfo(dtype).max + 1:
+            return dtype
+    raise ValueError(f"辞書が大きすぎます: {size}")
+
+
+def encode(days, results):
+    """
+    占い結果の並びを列ごとの配列に変換する
+
+    Args:
+        days (list): date のリスト
+        results (list): 各日付の calculate_reading の結果
+
+    Returns:
+        tuple: (shapes, columns)。shapes は結果の形（経路の並び）のリスト、
+               columns は {経路: (配列, 辞書またはNone)}。形の番号は経路 () の列に入る
+    """
+    shapes = {}
+    shape_codes = np.empty(len(results), dtype=np.uint32)
+    values = {}
+    for i, (day, result) in enumerate(zip(days, results)):
+        flat = list(flatten(result))
+        shape = tuple(path for path, _ in flat)
+        shape_codes[i] = shapes.setdefault(shape, len(shapes))
+        parents = {}
+        for path, value in flat:
+            # 浮動小数点数は表に保存する精度に丸めてから、組み立て直せるかを確かめる
+            if isinstance(value, (float, np.floating)):
+                value = float(FLOAT_DTYPE(value))
+            parent = parents.setdefault(path[:-1], {})
+            parent[path[-1]] = value
+            if path in _DERIVERS and _derive(path, day, parent) == value:
+                value = _DERIVED_VALUE
+            values.setdefault(path, {})[i] = value
+
+    columns = {(): (shape_codes.astype(_code_dtype(len(shapes))), None)}
+    for path, column in values.items():
+        present = column.values()
+        if all(isinstance(v, (float, np.floating)) for v in present):
+            array = np.full(len(results), np.nan, dtype=FLOAT_DTYPE)
+            for i, v in column.items():
+                array[i] = v
+            columns[path] = (array, None)
+            continue
+        dictionary = {}
+        codes = np.full(len(results), _ABSENT, dtype=np.uint32)
+        for i, v in column.items():
+            if v is _DERIVED_VALUE:
+                codes[i] = _DERIVED
+            else:
+                key = json.dumps(v, ensure_ascii=False)
+                codes[i] = dictionary.setdefault(key, len(dictionary) + _FIRST_CODE)
+        words = [json.loads(key) for key in dictionary]
+        columns[path] = (codes.astype(_code_dtype(len(words) + _FIRST_CODE)), words)
+    shape_list = [list(map(list, shape)) for shape in shapes]
+    return shape_list, columns
+
+
+class ReadingTable:
+    """
+    メモリマップした占い結果の表
+
+    Args:
+        manifest (dict): 表のマニフェスト
+        arrays (dict): {経路: 配列}
+    """
+
+    def __init__(self, manifest, arrays):
+        self.manifest = manifest
+        self.version = manifest['reading_version']
+        self.start = date.fromisoformat(manifest['start'])
+        self.days = manifest['days']
+        self._start_ordinal = self.start.toordinal()
+        self._shape_codes = arrays[()]
+        dictionaries = {
+            tuple(column['path']): column['dictionary'] for column in manifest['columns']
+        }
+        # 形ごとに、取り出す列の (経路, 配列, 辞書) を並べておく
+        self._shapes = [
+            [(tuple(path), arrays[tuple(path)], dictionaries[tuple(path)]) for path in shape]
+            for shape in manifest['shapes']
+        ]
+
+    def offset(self, year, month, day):
+        """日付の行番号を返す（表の範囲外・存在しない日付ならNone）"""
+        try:
+            index = date(year, month, day).toordinal() - self._start_ordinal
+        except (TypeError, ValueError, OverflowError):
+            return None
+        if not 0 <= index < self.days:
+            return None
+        return index
+
+    def lookup(self, year, month, day):
+        """
+        表から1件の占い結果を取り出す
+
+        Returns:
+            dict or None: calculate_reading と同じ形式の結果（表にない場合はNone）
+        """
+        index = self.offset(year, month, day)
+        if index is None:
+            return None
+        return self.row(index, date(year, month, day))
+
+    def row(self, index, day_value):
+        """
+        行番号の占い結果を取り出す
+
+        Args:
+            index (int): 行番号
+            day_value (date): その行の日付（保存せずに組み立て直す項目に使う）
+
+        Returns:
+            dict: calculate_reading と同じ形式の結果
+        """
+        result = {}
+        for path, array, dictionary in self._shapes[self._shape_codes.item(index)]:
+            parent = result
+            for key in path[:-1]:
+                parent = parent.setdefault(key, {})
+            # 浮動小数点数の列（辞書なし）はそのままの値を使う
+            value = array.item(index)
+            if dictionary is not None:
+                if value == _DERIVED:
+                    value = _derive(path, day_value, parent)
+                else:
+                    value = dictionary[value - _FIRST_CODE]
+            parent[path[-1]] = value
+        return result
+
+
+def _file_name(path):
+    return ('shape' if not path else '.'.join(path)) + '.npy'
+
+
+def build(start, end, data_dir=DATA_DIR):
+    """
+    指定範囲の全ての日付の占い結果を計算して data_dir に書き出す
+
+    Args:
+        start (date): 開始日
+        end (date): 終了日（この日を含む）
+        data_dir (str): 出力先ディレクトリ
+
+    Returns:
+        dict: 書き出したマニフェスト
+    """
+    from modules import reading
+
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    started = time.perf_counter()
+    results = list(reading.compute_readings([(d.year, d.month, d.day) for d in days]))
+    logger.info(f"{len(days)}日分の占い結果を{time.perf_counter() - started:.1f}秒で計算しました")
+    shapes, columns = encode(days, results)
+
+    os.makedirs(data_dir, exist_ok=True)
+    column_entries = []
+    for path, (array, dictionary) in columns.items():
+        np.save(os.path.join(data_dir, _file_name(path)), array)
+        if not path:
+            continue
+        column_entries.append({
+            'path': list(path),
+            'file': _file_name(path),
+            'dtype': array.dtype.name,
+            'dictionary': dictionary,
+        })
+    manifest = {
+        'format': TABLE_FORMAT_VERSION,
+        'reading_version': reading.cache_version(),
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': len(days),
+        'shape_file': _file_name(()),
+        'shapes': shapes,
+        'columns': column_entries,
+    }
+    with open(os.path.join(data_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+        f.write('\n')
+    return manifest
+
+
+def load_table(version, data_dir=DATA_DIR):
+    """
+    ビルド済みの表をメモリマップで読み込む
+
+    Args:
+        version (str): 現在の計算の版（reading.cache_version）
+
+    Returns:
+        ReadingTable or None: 表（表がない・版が違う場合はNone）
+    """
+    path = os.path.join(data_dir, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        logger.info(f"占い結果の表がありません: {path}")
+        return None
+    if manifest.get('format') != TABLE_FORMAT_VERSION or manifest.get('reading_version') != version:
+        logger.warning(f"占い結果の表の版が一致しません: {manifest.get('reading_version')} != {version}")
+        return None
+    # np.memmap の添字アクセスは遅いので、同じバッファを指す ndarray にしておく
+    arrays = {(): np.asarray(np.load(os.path.join(data_dir, manifest['shape_file']), mmap_mode='r'))}
+    for column in manifest['columns']:
+        arrays[tuple(column['path'])] = np.asarray(np.load(
+            os.path.join(data_dir, column['file']), mmap_mode='r'))
+    return ReadingTable(manifest, arrays)
+
+
+def get_table(version):
+    """表を初回のみ読み込んで返す（読み込めなかった場合はNone）"""
+    global _table
+    if _table is None or (_table and _table.version != version):
+        _table = load_table(version) or False
+    return _table or None
+
+
+def main(argv=None):
+    from modules import almanac
+
+    years = almanac.year_range() or (almanac.DEFAULT_START_YEAR, almanac.DEFAULT_END_YEAR)
+    parser = argparse.ArgumentParser(description='全期間の占い結果の表を生成する')
+    parser.add_argument('--start', type=date.fromisoformat, default=date(years[0], 1, 1),
+                        help='開始日（YYYY-MM-DD）')
+    parser.add_argument('--end', type=date.fromisoformat, default=date(years[1], 12, 31),
+                        help='終了日（YYYY-MM-DD）')
+    parser.add_argument('--output', default=DATA_DIR, help='出力先ディレクトリ')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    # 1件ごとの計算結果のログは出さない
+    logging.getLogger('modules.reading').setLevel(logging.WARNING)
+    manifest = build(args.start, args.end, args.output)
+    summary = {key: manifest[key] for key in ('reading_version', 'start', 'end', 'days')}
+    summary['columns'] = len(manifest['columns'])
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
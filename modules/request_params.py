@@ -0,0 +1,60 @@
+"""
+APIのリクエストから生年月日と出生時刻を取り出すモジュール
+
+Flask版（app.py）とASGI版（main.py）で同じ入力の検証とエラーメッセージを使う。
+"""
+from datetime import date
+
+
+def parse_birthdate(item):
+    """
+    リクエストの1件分から生年月日を取り出す
+
+    Returns:
+        tuple: (year, month, day)
+
+    Raises:
+        ValueError: 生年月日が正しく指定されていない場合
+    """
+    if not isinstance(item, dict):
+        raise ValueError("生年月日が正しく指定されていません")
+    try:
+        year = int(item.get('year', 0))
+        month = int(item.get('month', 0))
+        day = int(item.get('day', 0))
+    except (TypeError, ValueError):
+        raise ValueError("生年月日が正しく指定されていません")
+    if not all([year, month, day]):
+        raise ValueError("生年月日が正しく指定されていません")
+    # 2月30日のような存在しない日付は受け付けない
+    try:
+        date(year, month, day)
+    except ValueError:
+        raise ValueError("存在しない日付です")
+    return year, month, day
+
+
+def parse_birth_time(data):
+    """
+    リクエストから任意の出生時刻（hour, minute）と出生地の経度（longitude）を取り出す
+
+    Returns:
+        tuple: (hour, minute, longitude)。hour が指定されていなければ (None, 0, None)
+
+    Raises:
+        ValueError: 値が範囲外の場合
+    """
+    if data.get('hour') is None:
+        return None, 0, None
+    try:
+        hour = int(data['hour'])
+        minute = int(data.get('minute') or 0)
+        longitude = data.get('longitude')
+        longitude = None if longitude is None else float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("出生時刻が正しく指定されていません")
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError("出生時刻が正しく指定されていません")
+    if longitude is not None and not -180.0 <= longitude <= 180.0:
+        raise ValueError("出生地の経度が正しく指定されていません")
+    return hour, minute, longitude
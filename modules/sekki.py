@@ -0,0 +1,227 @@
+"""
+二十四節気の計算モジュール
+
+太陽の黄経が15°の倍数を通過する時刻（節気）を求根法でまとめて計算し、
+年ごとの表として保持する。四柱推命・陰陽五行の年柱／月柱はこの表を
+二分探索して求める。
+
+ビルド済みの暦データ（modules/almanac.py）の範囲内では表を読むだけで、
+範囲外の年だけSkyfieldで計算する。
+"""
+import bisect
+import calendar
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from modules import almanac, astro
+
+JST = timezone(timedelta(hours=9))
+
+# 1年分の節気の並び（立春 315° から翌年の大寒 300° まで、15°刻み）
+SEKKI_ANGLES = [(315.0 + 15.0 * i) % 360.0 for i in range(24)]
+
+SEKKI_NAMES = [
+    '立春', '雨水', '啓蟄', '春分', '清明', '穀雨', '立夏', '小満',
+    '芒種', '夏至', '小暑', '大暑', '立秋', '処暑', '白露', '秋分',
+    '寒露', '霜降', '立冬', '小雪', '大雪', '冬至', '小寒', '大寒'
+]
+
+# 月の節入りとなる節（寅月の立春 315° から丑月の小寒 285° まで）
+MONTH_START_ANGLES = [315.0, 345.0, 15.0, 45.0, 75.0, 105.0,
+                      135.0, 165.0, 195.0, 225.0, 255.0, 285.0]
+
+# 従来の分単位走査で使っていた探索窓（UTCの月, 日）
+_SCAN_WINDOWS = {
+    315.0: (2, 4), 345.0: (3, 6), 15.0: (4, 5), 45.0: (5, 6),
+    75.0: (6, 6), 105.0: (7, 7), 135.0: (8, 8), 165.0: (9, 8),
+    195.0: (10, 8), 225.0: (11, 7), 255.0: (12, 7), 285.0: (1, 6)
+}
+
+_MEAN_MOTION = 360.0 / 365.242189  # 太陽の平均運動（度/日）
+_TOLERANCE_DAYS = 1e-3 / 86400.0   # 求根の収束判定（1ミリ秒）
+
+# 計算済みの節気表（(年, 黄道の基準) -> その年の立春から始まる24節気のUNIX秒）
+_year_rows = {}
+
+
+def _sun_longitude(t, epoch=None):
+    """地心から見た太陽の視黄経（epoch=None でJ2000黄道、'date' で瞬時の黄道、度）"""
+    eph = astro.get_ephemeris()
+    earth = eph['earth']
+    sun = eph['sun']
+    return earth.at(t).observe(sun).apparent().ecliptic_latlon(epoch=epoch)[1].degrees
+
+
+def _unix_seconds(dt):
+    """UTCのdatetimeをUNIX秒に変換する"""
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
+def find_solar_longitude_times(targets, guesses, epoch=None):
+    """
+    太陽の黄経が指定角度に達する時刻をニュートン法でまとめて求める
+
+    Args:
+        targets (array-like): 目標黄経（度）
+        guesses (array-like): 初期値となるTTユリウス日
+        epoch: 黄道の基準（None でJ2000、'date' で瞬時の黄道）
+
+    Returns:
+        numpy.ndarray: 通過時刻のUNIX秒（UTC）
+    """
+    ts = astro.get_timescale()
+    targets = np.asarray(targets, dtype=float)
+    jd = np.asarray(guesses, dtype=float).copy()
+    for _ in range(20):
+        lon = _sun_longitude(ts.tt_jd(jd), epoch)
+        diff = (lon - targets + 180.0) % 360.0 - 180.0
+        step = diff / _MEAN_MOTION
+        jd -= step
+        if np.max(np.abs(step)) < _TOLERANCE_DAYS:
+            break
+    return np.array([_unix_seconds(dt) for dt in ts.tt_jd(jd).utc_datetime()])
+
+
+def compute_solar_terms(start_year, end_year, epoch=None):
+    """
+    指定範囲の各年の24節気（立春から翌年の大寒まで）の時刻を計算する
+
+    Args:
+        start_year (int): 開始年
+        end_year (int): 終了年（この年を含む）
+        epoch: 黄道の基準（None でJ2000、'date' で瞬時の黄道）
+
+    Returns:
+        numpy.ndarray: 形状 (年数, 24) のUNIX秒（UTC）。列は SEKKI_ANGLES の順
+    """
+    ts = astro.get_timescale()
+    years = np.arange(start_year, end_year + 1)
+    angles = np.array(SEKKI_ANGLES)
+    # 立春はおよそ2月4日なので、そこからの平均運動で初期値を置く
+    risshun = np.array([ts.utc(int(y), 2, 4).tt for y in years])
+    offsets = ((angles - 315.0) % 360.0) / _MEAN_MOTION
+    guesses = risshun[:, None] + offsets[None, :]
+    times = find_solar_longitude_times(np.broadcast_to(angles, guesses.shape).ravel(),
+                                       guesses.ravel(), epoch)
+    return times.reshape(len(years), 24)
+
+
+def get_solar_terms(year, epoch=None):
+    """
+    指定年の立春から始まる24節気の時刻を返す
+
+    暦データの範囲内ならその行を返し、範囲外の年はSkyfieldで計算して
+    年ごとにキャッシュする。
+
+    Args:
+        year (int): 年
+        epoch: 黄道の基準（None でJ2000、'date' で瞬時の黄道）
+
+    Returns:
+        numpy.ndarray: 24節気のUNIX秒（UTC）。列は SEKKI_ANGLES の順
+    """
+    row = almanac.get_solar_terms(year, epoch)
+    if row is not None:
+        return row
+    key = (year, epoch)
+    row = _year_rows.get(key)
+    if row is None:
+        row = compute_solar_terms(year, year, epoch)[0]
+        _year_rows[key] = row
+    return row
+
+
+def get_solar_term_time(year, angle, epoch=None):
+    """指定年の立春以降で最初に黄経 angle° となる時刻をUNIX秒で返す"""
+    return get_solar_terms(year, epoch)[SEKKI_ANGLES.index(angle)]
+
+
+def _scan_result(crossing, start, end):
+    """
+    従来の分単位走査（start から1分刻みで黄経が目標以上になる最初の時刻）と
+    同じ結果を通過時刻から求める
+
+    Returns:
+        datetime or None: 従来どおりUTC時刻に9時間を足した値（窓外ならNone）
+    """
+    start_s = calendar.timegm(start.utctimetuple())
+    end_s = calendar.timegm(end.utctimetuple())
+    found = max(start_s, math.ceil(crossing / 60.0) * 60)
+    if found >= end_s:
+        return None
+    return datetime.fromtimestamp(found, tz=timezone.utc) + timedelta(hours=9)
+
+
+def setsubun_datetime(year):
+    """
+    立春（黄経315°）の時刻を返す
+
+    従来の shichuu/inyou.get_setsubun_datetime と同じ値（2月1日〜5日UTCの
+    分単位走査の結果にJSTの9時間を加えたもの）を返す。
+    """
+    crossing = get_solar_term_time(year, 315.0)
+    start = datetime(year, 2, 1, tzinfo=timezone.utc)
+    end = datetime(year, 2, 5, tzinfo=timezone.utc)
+    return _scan_result(crossing, start, end)
+
+
+def month_start_dates(year):
+    """
+    月の節入り（12節）の時刻を返す
+
+    従来の shichuu/inyou.get_month_start_dates と同じ値を返す。
+
+    Returns:
+        list: (黄経, 節入り時刻) のタプルを時刻順に並べたリスト
+    """
+    results = []
+    for angle in MONTH_START_ANGLES:
+        m, d = _SCAN_WINDOWS[angle]
+        target_year = year if angle != 285.0 else year + 1
+        start = datetime(target_year, m, d - 1, tzinfo=timezone.utc)
+        end = datetime(target_year, m, d + 1, tzinfo=timezone.utc)
+        found = _scan_result(get_solar_term_time(year, angle), start, end)
+        if found is not None:
+            results.append((angle, found))
+    results.sort(key=lambda x: x[1])
+    return results
+
+
+def month_index_from_starts(month_starts, birth):
+    """
+    節入り時刻のリストを二分探索して月番号（寅＝1、丑＝12）を返す
+
+    Args:
+        month_starts (list): month_start_dates の戻り値
+        birth (datetime): タイムゾーン付きの時刻
+
+    Returns:
+        int: 月番号
+    """
+    times = [start for _, start in month_starts]
+    index = bisect.bisect_right(times, birth)
+    return index if index > 0 else 12
+
+
+def solar_month_index(dt, epoch=None):
+    """
+    指定時刻が属する節月の番号（寅＝1、丑＝12）を節気表から求める
+
+    Args:
+        dt (datetime): タイムゾーン付きの時刻
+        epoch: 黄道の基準（None でJ2000、'date' で瞬時の黄道）
+
+    Returns:
+        int: 月番号
+    """
+    t = _unix_seconds(dt.astimezone(timezone.utc))
+    year = dt.astimezone(timezone.utc).year
+    terms = np.concatenate([get_solar_terms(year - 1, epoch), get_solar_terms(year, epoch)])
+    k = int(np.searchsorted(terms, t, side='right')) - 1
+    angle = SEKKI_ANGLES[k % 24]
+    # 中気の場合は直前の節に戻す
+    if angle % 30.0 != 15.0:
+        angle = (angle - 15.0) % 360.0
+    return int(((angle - 315.0) % 360.0) // 30.0) + 1
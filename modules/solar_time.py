@@ -0,0 +1,71 @@
+"""
+地方真太陽時の計算モジュール
+
+出生地の経度と均時差で、日本標準時の出生時刻を出生地の真太陽時に
+補正する。均時差は暦データ（modules/almanac.py）の日ごとの表を
+線形補間して求め、表の範囲外だけSkyfieldで計算する。
+"""
+import calendar
+from datetime import datetime, timedelta, timezone
+
+from modules import almanac, astro
+
+
+def compute_equation_of_time(t):
+    """
+    均時差（真太陽時 − 平均太陽時、分）をSkyfieldで計算する
+
+    Args:
+        t: SkyfieldのTime（配列でもよい）
+
+    Returns:
+        float or numpy.ndarray: 均時差（分）
+    """
+    eph = astro.get_ephemeris()
+    ra = eph['earth'].at(t).observe(eph['sun']).apparent().radec(epoch='date')[0]
+    # グリニッジの真太陽時は太陽の時角 + 12時、平均太陽時はUT1
+    mean_hours = (t.ut1 - 0.5) % 1.0 * 24.0
+    diff = t.gast - ra.hours + 12.0 - mean_hours
+    return ((diff + 12.0) % 24.0 - 12.0) * 60.0
+
+
+def equation_of_time(unix_seconds):
+    """
+    指定時刻の均時差（分）を返す
+
+    Args:
+        unix_seconds (float): UNIX秒（UTC）
+
+    Returns:
+        float: 均時差（分）
+    """
+    table = almanac.get_equation_of_time()
+    if table is not None:
+        start = almanac.equation_of_time_start()
+        position = (unix_seconds - start) / 86400.0
+        if 0 <= position < len(table) - 1:
+            index = int(position)
+            fraction = position - index
+            return float(table[index] * (1.0 - fraction) + table[index + 1] * fraction)
+    ts = astro.get_timescale()
+    dt = datetime.fromtimestamp(unix_seconds, tz=timezone.utc)
+    return float(compute_equation_of_time(ts.from_datetime(dt)))
+
+
+def local_apparent_time(birth, longitude):
+    """
+    出生時刻を出生地の地方真太陽時に補正する
+
+    Args:
+        birth (datetime): タイムゾーン付きの出生時刻
+        longitude (float or None): 出生地の経度（東経を正、Noneなら補正しない）
+
+    Returns:
+        datetime: 地方真太陽時（タイムゾーンなし）。経度がNoneなら出生時刻の壁時計の時刻
+    """
+    if longitude is None:
+        return birth.replace(tzinfo=None)
+    utc = birth.astimezone(timezone.utc)
+    unix_seconds = calendar.timegm(utc.utctimetuple()) + utc.microsecond / 1e6
+    offset_minutes = longitude * 4.0 + equation_of_time(unix_seconds)
+    return utc.replace(tzinfo=None) + timedelta(minutes=offset_minutes)
@@ -1,12 +1,20 @@
 """
 宿曜占いの計算を行うモジュール
+
+旧暦への変換は暦データの旧暦の月の表（modules/lunisolar.py）を引き、
+表の範囲外の日付だけ koyomi で変換する。大量の日付は
+calculate_sukuyo_batch で旧暦の月・日の配列から宿の番号を一度に求める。
 """
 import re
-from datetime import datetime
+from datetime import date, datetime
 import pytz
 import koyomi
 from functools import lru_cache
 
+import numpy as np
+
+from modules import lunisolar
+
 # 宿曜（星宿）の名称リスト（27宿）
 mansion_names = [
     "昴宿", "畢宿", "觜宿", "参宿", "井宿", "鬼宿", "柳宿", "星宿",
@@ -16,10 +24,22 @@ mansion_names = [
 ]
 
 @lru_cache(maxsize=1000)
-def to_lunar_date_cached(year, month, day):
-    """旧暦変換結果をキャッシュする関数"""
+def _koyomi_lunar_date(year, month, day):
+    """koyomi による旧暦変換結果をキャッシュする関数"""
     return koyomi.to_lunar_date(year, month, day)
 
+def to_lunar_date(year, month, day):
+    """
+    新暦の日付を旧暦にする関数
+
+    Returns:
+        tuple: (旧暦の年, 月, 日, 閏月か)。旧暦の表の範囲外は koyomi の変換結果
+    """
+    lunar_date = lunisolar.to_lunar_date(year, month, day)
+    if lunar_date is not None:
+        return lunar_date
+    return _koyomi_lunar_date(year, month, day)
+
 def extract_old_day(kyureki_str):
     """旧暦表示文字列から「日」の部分を抽出する関数"""
     match = re.search(r"(\d+)日", kyureki_str)
@@ -36,13 +56,19 @@ def extract_old_month(kyureki_str):
     else:
         return None
 
+# 旧暦月ごとのキャリブレーション値（base値、各月の1日の宿の番号）。
+# 添字が旧暦の月で、添字0は月が分からない場合の値
+MONTH_BASES = np.array([18, 22, 24, 26, 1, 3, 5, 8, 11, 13, 15, 18, 20], dtype=np.int8)
+
 def get_base_for_month(old_month):
-    """旧暦月ごとのキャリブレーション値（base値）のテーブル"""
-    base_table = {
-        1: 22, 2: 24, 3: 26, 4: 1, 5: 3, 6: 5,
-        7: 8, 8: 11, 9: 13, 10: 15, 11: 18, 12: 20
-    }
-    return base_table.get(old_month, 18)
+    """旧暦月ごとのキャリブレーション値（base値）を返す"""
+    if isinstance(old_month, int) and 1 <= old_month <= 12:
+        return int(MONTH_BASES[old_month])
+    return int(MONTH_BASES[0])
+
+def mansion_indices(old_months, old_days):
+    """旧暦の月と日（配列でもよい）から宿の番号（mansion_names の添字、0-26）を求める"""
+    return (MONTH_BASES[old_months] + np.asarray(old_days) - 1) % 27
 
 def calc_mansion_from_old_date(old_month, old_day):
     """宿曜を旧暦の日および旧暦月から算出する関数"""
@@ -50,21 +76,47 @@ def calc_mansion_from_old_date(old_month, old_day):
     index = (old_day - 1 + base) % 27
     return mansion_names[index]
 
-def calculate_sukuyo(year, month, day):
-    """宿曜を計算"""
+def calculate_sukuyo_batch(dates):
+    """
+    日付の配列の宿の番号をまとめて計算する
+
+    旧暦の表の範囲内は配列の演算だけで求め、範囲外の日付は
+    calculate_sukuyo と同じ変換（koyomi とそのフォールバック）で求める。
+
+    Args:
+        dates (array-like): datetime64 の配列、または date.toordinal() の整数の配列
+
+    Returns:
+        numpy.ndarray: 宿の番号（mansion_names の添字、int8）
+    """
+    _, old_months, old_days, _ = lunisolar.to_lunar_dates(dates)
+    indices = mansion_indices(old_months, old_days).astype(np.int8)
+    outside = np.flatnonzero(old_months == 0)
+    if outside.size:
+        dates = np.asarray(dates)
+        for i in outside.tolist():
+            value = dates.flat[i]
+            if isinstance(value, np.datetime64):
+                day = value.astype('datetime64[D]').item()
+            else:
+                day = date.fromordinal(int(value))
+            indices.flat[i] = mansion_names.index(calculate_sukuyo(day.year, day.month, day.day)["mansion"])
+    return indices
+
+def calculate_sukuyo(year, month, day, debug=False):
+    """
+    宿曜を計算
+
+    Args:
+        year (int): 年
+        month (int): 月
+        day (int): 日
+        debug (bool): True なら計算の経過（debug）も返す
+
+    Returns:
+        dict: 宿・旧暦の日付・base値（エラー時は debug にエラーの内容を含む）
+    """
     try:
-        # 2000年2月24日の特別処理
-        if year == 2000 and month == 2 and day == 24:
-            return {
-                "mansion": "房宿",
-                "lunar_date": "1月20日",
-                "base": get_base_for_month(1),
-                "debug": {
-                    "input_date": f"{year}年{month}月{day}日",
-                    "calculation": "特別処理を適用"
-                }
-            }
-        
         # 入力値の検証
         if not all(isinstance(x, int) for x in [year, month, day]):
             raise ValueError("年月日は整数である必要があります")
@@ -72,29 +124,33 @@ def calculate_sukuyo(year, month, day):
         if not (1 <= month <= 12 and 1 <= day <= 31):
             raise ValueError("月は1-12、日は1-31の範囲である必要があります")
         
-        # 旧暦に変換（キャッシュを使用）
+        # 旧暦に変換（旧暦の表の範囲外は koyomi を使用）
         try:
-            lunar_date = to_lunar_date_cached(year, month, day)
+            lunar_date = to_lunar_date(year, month, day)
             
             if not lunar_date:
                 raise ValueError("旧暦変換に失敗しました")
             
             old_month = lunar_date[1]
             old_day = lunar_date[2]
+            # 閏月は同じ月番号の月として宿を数える
+            leap = "閏" if len(lunar_date) > 3 and lunar_date[3] else ""
             
             # 宿曜を計算
             mansion = calc_mansion_from_old_date(old_month, old_day)
             
-            return {
+            result = {
                 "mansion": mansion,
-                "lunar_date": f"{old_month}月{old_day}日",
-                "base": get_base_for_month(old_month),
-                "debug": {
+                "lunar_date": f"{leap}{old_month}月{old_day}日",
+                "base": get_base_for_month(old_month)
+            }
+            if debug:
+                result["debug"] = {
                     "input_date": f"{year}年{month}月{day}日",
-                    "lunar_date": f"{old_month}月{old_day}日",
+                    "lunar_date": f"{leap}{old_month}月{old_day}日",
                     "calculation": "正常に計算完了"
                 }
-            }
+            return result
             
         except Exception as e:
             # フォールバック計算
@@ -103,15 +159,17 @@ def calculate_sukuyo(year, month, day):
             mansion_index = (adjusted_day + base) % 27
             mansion = mansion_names[mansion_index]
             
-            return {
+            result = {
                 "mansion": mansion,
                 "lunar_date": f"{month}月{day}日（フォールバック）",
-                "base": base,
-                "debug": {
+                "base": base
+            }
+            if debug:
+                result["debug"] = {
                     "input_date": f"{year}年{month}月{day}日",
                     "calculation": "フォールバック計算を使用"
                 }
-            }
+            return result
             
     except Exception as e:
         return {
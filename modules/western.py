@@ -1,43 +1,18 @@
 """
 西洋占星術の計算モジュール
 """
-from skyfield.api import load, Topos
 from skyfield.framelib import ecliptic_frame
-from datetime import datetime
+from datetime import datetime, timezone
+import calendar
+import numpy as np
 import pytz
-import os
-
-# グローバル変数（効率化のため）
-_ts = None
-_eph = None
-_tokyo = None
-
-# 初期化関数
-def _initialize_skyfield(data_path='.'):
-    """Skyfieldのロード処理を初期化時に行う"""
-    global _ts, _eph, _tokyo
-    if _ts is None or _eph is None:
-        # データディレクトリの作成
-        os.makedirs(data_path, exist_ok=True)
-        print(f"Skyfieldデータディレクトリ: {data_path}")
-        
-        # Skyfieldの初期化
-        _ts = load.timescale()
-        _eph = load('de421.bsp')
-        earth = _eph['earth']
-        _tokyo = earth + Topos(latitude_degrees=35.6895, longitude_degrees=139.6917)
-        print("Skyfield initialized.")
-
-def _ensure_initialized():
-    """Skyfieldが初期化されているか確認し、されていなければ初期化"""
-    if _ts is None or _eph is None:
-        data_dir = os.environ.get("SKYFIELD_DATA_DIR", "skyfield-data")
-        _initialize_skyfield(data_dir)
+
+from modules import almanac, astro
 
 # 黄経を取得する関数
 def _get_ecliptic_longitude(body, t):
     """指定した天体の黄経を計算する"""
-    astrometric = _tokyo.at(t).observe(body)
+    astrometric = astro.get_tokyo().at(t).observe(body)
     ecliptic_position = astrometric.frame_latlon(ecliptic_frame)
     return ecliptic_position[1].degrees % 360
 
@@ -57,13 +32,137 @@ ZODIAC_SIGNS = [
     ('魚座', 330, 360),
 ]
 
+# 星座名の配列（黄経30°ごとの星座番号で引く）
+_ZODIAC_NAMES = np.array([sign for sign, _, _ in ZODIAC_SIGNS])
+
+# 星座番号を求める関数
+def _get_zodiac_index(longitude):
+    """
+    黄経から星座番号（牡羊座＝0、魚座＝11）を返す
+
+    360°ちょうどや負の値も0〜360°に折り返してから判定する。
+    スカラーでも配列でも同じ式で計算できる。
+    """
+    return np.floor_divide(np.mod(longitude, 360), 30).astype(int) % 12
+
 # 星座判定関数
 def _get_zodiac_name(longitude):
     """黄経から星座名を返す"""
-    for sign, start, end in ZODIAC_SIGNS:
-        if start <= longitude < end:
-            return sign
-    return "不明"
+    return ZODIAC_SIGNS[int(_get_zodiac_index(longitude))][0]
+
+def _get_zodiac_names(longitudes):
+    """黄経の配列から星座名の配列を返す（_get_zodiac_name のベクトル版）"""
+    return _ZODIAC_NAMES[_get_zodiac_index(longitudes)]
+
+def _noon_jst_in_utc(year, month, day):
+    """日本時間12:00をUTCに変換する（出生時間が不明なので正午に固定）"""
+    local_dt = datetime(year, month, day, 12, 0)
+    jst = pytz.timezone('Asia/Tokyo')
+    local_dt = jst.localize(local_dt)
+    return local_dt.astimezone(pytz.utc)
+
+def format_interpretation(moon_long, sun_long, moon_sign, sun_sign):
+    """結果の解説文を作成する"""
+    return f"あなたの月星座は「{moon_sign}」（黄経: {moon_long:.2f}°）です。\nあなたの太陽星座は「{sun_sign}」（黄経: {sun_long:.2f}°）です。"
+
+def _build_result(moon_long, sun_long, moon_sign, sun_sign):
+    """計算結果を辞書形式にまとめる"""
+    return {
+        "moon_sign": moon_sign,  # 月星座
+        "sun_sign": sun_sign,  # 太陽星座
+        "moon_longitude": moon_long,  # 月の黄経
+        "sun_longitude": sun_long,  # 太陽の黄経
+        "interpretation": format_interpretation(moon_long, sun_long, moon_sign, sun_sign)
+    }
+
+# 星座境界の探索の刻み（日）。この間に2つの境界をまたがない幅にする
+_INGRESS_SEARCH_STEP = {'sun': 1.0, 'moon': 0.5}
+
+def _to_utc_datetime(dt):
+    """タイムゾーンのないdatetimeはUTCとみなす"""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+def find_sign_ingress_times(body_name, start, end):
+    """
+    天体が星座の境界（黄経30°の倍数）を通過する時刻を求める
+
+    西洋占星術の計算と同じ基準（東京からの視位置、瞬時の黄道）で、
+    一定間隔で星座番号を調べて変わった区間を二分法で絞り込む。
+
+    Args:
+        body_name (str): 'sun' または 'moon'
+        start (datetime): 探索の開始時刻
+        end (datetime): 探索の終了時刻
+
+    Returns:
+        tuple: (通過時刻のUNIX秒の配列, 通過後の星座番号の配列)
+    """
+    ts = astro.get_timescale()
+    body = astro.get_ephemeris()[body_name]
+    t0 = ts.from_datetime(_to_utc_datetime(start)).tt
+    t1 = ts.from_datetime(_to_utc_datetime(end)).tt
+    grid = np.arange(t0, t1 + _INGRESS_SEARCH_STEP[body_name], _INGRESS_SEARCH_STEP[body_name])
+    grid[-1] = min(grid[-1], t1)
+    index = _get_zodiac_index(_get_ecliptic_longitude(body, ts.tt_jd(grid)))
+    changed = np.nonzero(index[1:] != index[:-1])[0]
+    lo = grid[changed]
+    hi = grid[changed + 1]
+    lo_index = index[changed]
+    # 1ミリ秒未満になるまで区間を半分に狭める
+    while len(lo) and np.max(hi - lo) > 1e-3 / 86400.0:
+        mid = (lo + hi) / 2
+        same = _get_zodiac_index(_get_ecliptic_longitude(body, ts.tt_jd(mid))) == lo_index
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+    if not len(hi):
+        return np.array([]), np.array([], dtype=int)
+    times = np.array([calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+                      for dt in ts.tt_jd(hi).utc_datetime()])
+    return times, index[changed + 1]
+
+def find_sign_ingresses(body_name, start, end):
+    """
+    天体が星座の境界を通過する時刻と入る星座の一覧を返す
+
+    Args:
+        body_name (str): 'sun' または 'moon'
+        start (datetime): 探索の開始時刻
+        end (datetime): 探索の終了時刻
+
+    Returns:
+        list: (通過時刻のUTC datetime, 入る星座名) のタプルのリスト
+    """
+    times, signs = find_sign_ingress_times(body_name, start, end)
+    return [(datetime.fromtimestamp(t, tz=timezone.utc), ZODIAC_SIGNS[i][0])
+            for t, i in zip(times, signs)]
+
+def get_sun_sign(year, month, day):
+    """
+    太陽星座を返す
+
+    暦データの太陽の星座境界の通過時刻表を二分探索するので暦表を使わない。
+    表の範囲外の日付は calculate_western_astrology と同じく暦表で計算する。
+
+    Args:
+        year (int): 生年
+        month (int): 生月
+        day (int): 生日
+
+    Returns:
+        str: 太陽星座名
+    """
+    utc_dt = _noon_jst_in_utc(year, month, day).replace(second=0, microsecond=0)
+    t = calendar.timegm(utc_dt.utctimetuple())
+    ingresses = almanac.get_sun_ingresses()
+    if ingresses is not None and ingresses[0] <= t < ingresses[-1]:
+        k = int(np.searchsorted(ingresses, t, side='right')) - 1
+        return ZODIAC_SIGNS[k % 12][0]
+    ts = astro.get_timescale()
+    sun = astro.get_ephemeris()['sun']
+    t = ts.utc(utc_dt.year, utc_dt.month, utc_dt.day, utc_dt.hour, utc_dt.minute)
+    return _get_zodiac_name(_get_ecliptic_longitude(sun, t))
 
 def calculate_western_astrology(year, month, day):
     """
@@ -78,21 +177,19 @@ def calculate_western_astrology(year, month, day):
         dict: 西洋占星術の結果
     """
     try:
-        # Skyfieldの初期化
-        _ensure_initialized()
+        # 共有のSkyfieldコンテキストを取得
+        ts = astro.get_timescale()
+        eph = astro.get_ephemeris()
         
         # 出生時間が不明なので正午に固定（日本時間12:00）
-        local_dt = datetime(year, month, day, 12, 0)
-        jst = pytz.timezone('Asia/Tokyo')
-        local_dt = jst.localize(local_dt)
-        utc_dt = local_dt.astimezone(pytz.utc)
+        utc_dt = _noon_jst_in_utc(year, month, day)
         
         # Skyfield用の時刻オブジェクトを作成
-        t = _ts.utc(utc_dt.year, utc_dt.month, utc_dt.day, utc_dt.hour, utc_dt.minute)
+        t = ts.utc(utc_dt.year, utc_dt.month, utc_dt.day, utc_dt.hour, utc_dt.minute)
         
         # 天体データの取得
-        moon = _eph['moon']
-        sun = _eph['sun']
+        moon = eph['moon']
+        sun = eph['sun']
         
         # 黄経を取得
         moon_long = _get_ecliptic_longitude(moon, t)
@@ -103,17 +200,60 @@ def calculate_western_astrology(year, month, day):
         sun_sign = _get_zodiac_name(sun_long)
         
         # 結果を辞書形式で返す
-        result = {
-            "moon_sign": moon_sign,  # 月星座
-            "sun_sign": sun_sign,  # 太陽星座
-            "moon_longitude": moon_long,  # 月の黄経
-            "sun_longitude": sun_long,  # 太陽の黄経
-            "interpretation": f"あなたの月星座は「{moon_sign}」（黄経: {moon_long:.2f}°）です。\nあなたの太陽星座は「{sun_sign}」（黄経: {sun_long:.2f}°）です。"
-        }
-        
-        return result
+        return _build_result(moon_long, sun_long, moon_sign, sun_sign)
         
     except Exception as e:
         return {
             "error": f"西洋占星術の計算中にエラーが発生しました: {str(e)}"
-        } 
\ No newline at end of file
+        } 
+
+def calculate_western_astrology_batch(dates):
+    """
+    複数の生年月日の西洋占星術の結果をまとめて計算する
+
+    全ての日付を1つの配列の Time にまとめ、太陽と月の黄経をそれぞれ
+    1回のベクトル計算で求める。
+
+    Args:
+        dates (iterable): (year, month, day) のタプルの並び
+
+    Returns:
+        list: calculate_western_astrology と同じ形式の辞書のリスト（入力順）
+    """
+    dates = list(dates)
+    results = []
+    valid = []
+    components = []
+    for year, month, day in dates:
+        try:
+            utc_dt = _noon_jst_in_utc(year, month, day)
+        except Exception as e:
+            results.append({
+                "error": f"西洋占星術の計算中にエラーが発生しました: {str(e)}"
+            })
+            continue
+        results.append(None)
+        valid.append(len(results) - 1)
+        components.append((utc_dt.year, utc_dt.month, utc_dt.day, utc_dt.hour, utc_dt.minute))
+
+    if not valid:
+        return results
+
+    try:
+        ts = astro.get_timescale()
+        eph = astro.get_ephemeris()
+        t = ts.utc(*np.array(components).T)
+        moon_longs = _get_ecliptic_longitude(eph['moon'], t)
+        sun_longs = _get_ecliptic_longitude(eph['sun'], t)
+    except Exception:
+        # 暦表の範囲外の日付などが含まれる場合は1件ずつ計算してエラーを個別に返す
+        for i in valid:
+            results[i] = calculate_western_astrology(*dates[i])
+        return results
+
+    moon_signs = _get_zodiac_names(moon_longs)
+    sun_signs = _get_zodiac_names(sun_longs)
+    for k, i in enumerate(valid):
+        results[i] = _build_result(float(moon_longs[k]), float(sun_longs[k]),
+                                   str(moon_signs[k]), str(sun_signs[k]))
+    return results
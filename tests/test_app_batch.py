@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+import app as app_module
+from modules.request_params import parse_birthdate
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize('item', [
+    {'year': 2023, 'month': 2, 'day': 30},
+    {'year': 2023, 'month': 2, 'day': 29},
+    {'year': 2023, 'month': 13, 'day': 1},
+    {'year': 2023, 'month': 4, 'day': 31},
+])
+def test_parse_birthdate_rejects_nonexistent_dates(item):
+    with pytest.raises(ValueError, match="存在しない日付です"):
+        parse_birthdate(item)
+
+
+@pytest.mark.parametrize('item', [
+    {'year': 2023, 'month': 2},
+    {'year': 'abc', 'month': 2, 'day': 1},
+    [2023, 2, 1],
+    None,
+])
+def test_parse_birthdate_rejects_missing_values(item):
+    with pytest.raises(ValueError, match="生年月日が正しく指定されていません"):
+        parse_birthdate(item)
+
+
+def test_parse_birthdate_accepts_leap_day():
+    assert parse_birthdate({'year': '2024', 'month': '2', 'day': '29'}) == (2024, 2, 29)
+
+
+def test_batch_reports_invalid_items_by_index(client):
+    response = client.post('/api/predict/batch', json=[
+        {'year': 1990, 'month': 5, 'day': 15},
+        {'year': 2023, 'month': 2, 'day': 30},
+        {'year': 1990},
+        'x',
+        {'year': 1990, 'month': 5, 'day': 15},
+    ])
+    assert response.status_code == 200
+    lines = response.get_json()
+    assert [line['index'] for line in lines] == [0, 1, 2, 3, 4]
+    assert lines[1] == {'index': 1, 'error': "存在しない日付です"}
+    assert lines[2] == {'index': 2, 'error': "生年月日が正しく指定されていません"}
+    assert lines[3] == {'index': 3, 'error': "生年月日が正しく指定されていません"}
+    assert (lines[0]['year'], lines[0]['month'], lines[0]['day']) == (1990, 5, 15)
+    assert set(lines[0]['result']) == {'shichuu', 'kyusei', 'sukuyo', 'western', 'animal', 'inyou'}
+    assert lines[4]['result'] == lines[0]['result']
+
+
+def test_batch_accepts_dates_object(client):
+    response = client.post('/api/predict/batch', json={'dates': [{'year': 2023, 'month': 2, 'day': 30}]})
+    assert response.get_json() == [{'index': 0, 'error': "存在しない日付です"}]
+
+
+@pytest.mark.parametrize('body', [{'year': 1990}, 'abc', 1])
+def test_batch_rejects_body_without_list(client, body):
+    response = client.post('/api/predict/batch', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': "生年月日の配列が指定されていません"}
+
+
+def test_batch_rejects_too_many_items(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'BATCH_MAX_ITEMS', 2)
+    response = client.post('/api/predict/batch', json=[{'year': 2000, 'month': 1, 'day': 1}] * 3)
+    assert response.status_code == 413
+
+
+def test_batch_ndjson_reports_unreadable_lines(client):
+    body = '{"year": 2023, "month": 2, "day": 30}\n\n{not json\n'
+    response = client.post('/api/predict/batch', data=body, content_type='application/x-ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines == [{'index': 0, 'error': "存在しない日付です"},
+                     {'index': 1, 'error': "JSONとして読み込めません"}]
+
+
+@pytest.mark.parametrize('body, error', [
+    ({'year': 2023, 'month': 2, 'day': 30}, "存在しない日付です"),
+    ({'year': 2023, 'month': 2}, "生年月日が正しく指定されていません"),
+])
+def test_predict_rejects_invalid_dates(client, body, error):
+    response = client.post('/api/predict', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+def test_predict_accepts_valid_date(client):
+    response = client.post('/api/predict', json={'year': 2024, 'month': 2, 'day': 29})
+    assert response.status_code == 200
+    assert set(response.get_json()) == {'shichuu', 'kyusei', 'sukuyo', 'western', 'animal', 'inyou'}
+
+
+def test_batch_after_pool_worker_died(client):
+    # プロセスプールの子プロセスが異常終了した後のバッチも計算できる
+    from concurrent.futures.process import BrokenProcessPool
+    from modules import reading
+    future = reading.get_executor().submit(os._exit, 1)
+    with pytest.raises(BrokenProcessPool):
+        future.result()
+    response = client.post('/api/predict/batch', json=[{'year': 1975, 'month': 6, 'day': 6}])
+    assert response.status_code == 200
+    assert response.get_json()[0]['result'] == reading.compute_reading(1975, 6, 6)
@@ -0,0 +1,56 @@
+from datetime import date
+
+import numpy as np
+
+from modules import golden, kanshi, pillars
+
+
+def test_diff_compares_only_golden_paths():
+    expected = {"kyusei": {"honmei": "一白水星", "gatsumei": "五黄土星"},
+                "western": {"moon_longitude": 291.87165603380504}}
+    actual = {"kyusei": {"honmei": "一白水星", "gatsumei": "五黄土星", "nichimei": "三碧木星"},
+              "western": {"moon_longitude": 291.87167}}
+    assert golden.diff_result(expected, actual) == []
+
+
+def test_diff_reports_changed_and_missing_values():
+    expected = {"kyusei": {"honmei": "一白水星", "gatsumei": "五黄土星"}, "western": {"sun_longitude": 54.0}}
+    actual = {"kyusei": {"honmei": "二黒土星"}, "western": {"sun_longitude": 54.001}}
+    assert golden.diff_result(expected, actual) == [
+        (("kyusei", "honmei"), "一白水星", "二黒土星"),
+        (("kyusei", "gatsumei"), "五黄土星", None),
+        (("western", "sun_longitude"), 54.0, 54.001),
+    ]
+    assert golden.diff_result(expected, None) == [((), expected, None)]
+
+
+def test_baseline_debug_values_are_dropped():
+    result = {"sukuyo": {"mansion": "箕宿", "debug": {"lunar": "5/15"}}, "animal": {"error": "x"}}
+    assert golden._drop_paths(result) == {"sukuyo": {"mansion": "箕宿"}, "animal": {"error": "x"}}
+    assert golden._drop_paths({"sukuyo": {"error": "x"}}) == {"sukuyo": {"error": "x"}}
+
+
+def test_dates_are_grouped_by_year():
+    days = [date(1999, 12, 31), date(2000, 1, 1), date(2000, 6, 1), date(2002, 1, 1)]
+    ordinals = np.array([d.toordinal() for d in days], dtype=np.int32)
+    assert golden._year_chunks(ordinals) == [[days[0].toordinal()],
+                                             [days[1].toordinal(), days[2].toordinal()],
+                                             [days[3].toordinal()]]
+
+
+def test_golden_data_is_from_the_baseline_commit():
+    data = golden.GoldenData()
+    assert data.manifest['baseline_commit'] == golden.BASELINE_COMMIT
+    assert data.manifest['dropped_paths'] == [['sukuyo', 'debug']]
+    assert len(data) == data.manifest['days']
+
+
+def test_vectorized_engine_matches_baseline():
+    # 陰陽五行・西洋占星術は元の実装と全ての日付で一致する。四柱推命は月干を五虎遁で
+    # 求めるようにしたので、元の実装（年干の2つ先の干を寅月の干とする）と寅月の干が
+    # 同じになる甲年以外の日付で、月干の宿命星だけが変わる
+    report = golden.check('vectorized', jobs=1, systems=['shichuu', 'inyou', 'western'])
+    assert report['checked'] > 20000
+    assert {mismatch[2] for mismatch in report['mismatches']} == {('shichuu', 'month_gan_destiny_star')}
+    days = np.array(sorted({mismatch[0] for mismatch in report['mismatches']}), dtype='datetime64[D]')
+    assert not (kanshi.stem_of(pillars.year_indices(days)) == 0).any()
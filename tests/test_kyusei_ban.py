@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from modules import kyusei, kyusei_ban
+
+NAMES = kyusei_ban.PALACE_NAMES
+
+
+def _palaces(board):
+    return dict(zip(NAMES, board.tolist()))
+
+
+def test_opposite_palaces():
+    pairs = {'北西': '南東', '西': '東', '北東': '南西', '南': '北', '中央': '中央'}
+    for a, b in pairs.items():
+        assert NAMES[kyusei_ban.OPPOSITE[NAMES.index(a)]] == b
+        assert NAMES[kyusei_ban.OPPOSITE[NAMES.index(b)]] == a
+
+
+def test_five_center_board_is_the_magic_square():
+    # 五黄中宮の盤（後天定位盤）。南を上、東を左にした並び
+    assert kyusei_ban.to_grid(kyusei_ban.board(5)).tolist() == [[4, 9, 2], [3, 5, 7], [8, 1, 6]]
+
+
+def test_forward_and_reverse_boards():
+    assert _palaces(kyusei_ban.board(6)) == {
+        '中央': 6, '北西': 7, '西': 8, '北東': 9, '南': 1, '北': 2, '南西': 3, '東': 4, '南東': 5}
+    assert _palaces(kyusei_ban.board(6, reverse=True)) == {
+        '中央': 6, '北西': 5, '西': 4, '北東': 3, '南': 2, '北': 1, '南西': 9, '東': 8, '南東': 7}
+
+
+def test_lucky_directions_on_six_center_board():
+    # 六白中宮の順行の盤では五黄が南東にあるので、暗剣殺は北西。
+    # 一白の吉となる星（三碧・四緑・六白・七赤）のうち、北西（七赤）を除く
+    assert kyusei_ban.direction_names(kyusei_ban.lucky_direction_masks(1, 6, 0)) == ['南西', '東']
+    # 逆行の盤では五黄が北西にあるので、暗剣殺は南東（七赤）
+    assert kyusei_ban.direction_names(kyusei_ban.lucky_direction_masks(1, 6, 0, reverse=True)) == ['西', '北東']
+
+
+@pytest.mark.parametrize('reverse', [False, True])
+def test_lucky_directions_avoid_bad_palaces(reverse):
+    for honmei in range(1, 10):
+        for center in range(1, 10):
+            board = kyusei_ban.board(center, reverse).tolist()
+            five = board.index(5)
+            for branch in range(12):
+                lucky = kyusei_ban.direction_names(
+                    kyusei_ban.lucky_direction_masks(honmei, center, branch, reverse))
+                bad = {NAMES[0], NAMES[kyusei_ban.OPPOSITE[kyusei_ban.BRANCH_PALACE[branch]]]}
+                if five:
+                    bad |= {NAMES[five], NAMES[kyusei_ban.OPPOSITE[five]]}
+                if honmei in board[1:]:
+                    palace = board.index(honmei)
+                    bad |= {NAMES[palace], NAMES[kyusei_ban.OPPOSITE[palace]]}
+                assert not bad & set(lucky), (honmei, center, branch)
+
+
+def test_boards_follow_kyusei_stars():
+    start, end = date(2023, 12, 1), date(2025, 1, 31)
+    boards = kyusei_ban.generate_boards(start, end)
+    for i in range(0, len(boards.dates), 7):
+        day = start + timedelta(days=i)
+        stars = kyusei.get_kyusei_stars(day.year, day.month, day.day)
+        assert (boards.year_center[i], boards.month_center[i], boards.day_center[i]) == \
+            (stars.honmei, stars.gatsumei, stars.nichimei)
+
+
+def test_day_board_reverses_during_inton():
+    boards = kyusei_ban.generate_boards(date(2024, 1, 1), date(2024, 12, 31))
+    reverse = boards.day_reverse
+    # 陰遁は夏至に最も近い甲子の日から冬至に最も近い甲子の日の前日まで
+    switches = boards.dates[np.flatnonzero(np.diff(reverse.astype(np.int8))) + 1]
+    assert switches.tolist() == [date(2024, 6, 29), date(2024, 12, 26)]
+    step = np.diff(boards.day_center.astype(np.int64)) % 9
+    assert set(step[reverse[1:] & reverse[:-1]].tolist()) == {8}
+    assert set(step[~reverse[1:] & ~reverse[:-1]].tolist()) == {1}
+
+
+def test_get_lucky_directions_uses_reverse_day_board():
+    target = date(2024, 8, 1)
+    boards = kyusei_ban.generate_boards(target, target)
+    assert boards.day_reverse[0]
+    expected = kyusei_ban.direction_names(kyusei_ban.lucky_direction_masks(
+        1, boards.day_center[0], boards.day_branch[0], reverse=True))
+    assert kyusei_ban.get_lucky_directions(1990, 5, 15, target)['day'] == expected
@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+
+from modules import metrics
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _write(directory, name, value):
+    values = np.zeros(metrics._SIZE)
+    values[metrics._SOURCE_INDEX['table']] = value
+    values.tofile(os.path.join(directory, name))
+
+
+def _table_count(directory):
+    return metrics.collect(str(directory))[metrics._SOURCE_INDEX['table']]
+
+
+def test_dead_process_files_are_merged(tmp_path):
+    dead = _dead_pid()
+    _write(tmp_path, f'metrics_{dead}.bin', 3)
+    _write(tmp_path, f'metrics_{os.getpid()}.bin', 5)
+    _write(tmp_path, metrics.MERGED_NAME, 7)
+    assert _table_count(tmp_path) == 15
+
+    metrics.merge_dead_files(str(tmp_path))
+    assert not (tmp_path / f'metrics_{dead}.bin').exists()
+    assert (tmp_path / f'metrics_{os.getpid()}.bin').exists()
+    assert _table_count(tmp_path) == 15
+
+    # 2回目はまとめるファイルがないので何も変わらない
+    metrics.merge_dead_files(str(tmp_path))
+    assert _table_count(tmp_path) == 15
+
+
+def test_files_do_not_pile_up_across_processes(tmp_path):
+    # 計測値を1件数えて終了する子プロセスを続けて起動しても、ファイルは増え続けない
+    code = 'from modules import metrics; metrics.count_source("cache")'
+    env = dict(os.environ, METRICS_DIR=str(tmp_path))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for _ in range(4):
+        subprocess.run([sys.executable, '-c', code], cwd=root, env=env, check=True)
+    files = sorted(p.name for p in tmp_path.glob('metrics_*.bin'))
+    assert len(files) == 2 and metrics.MERGED_NAME in files
+    assert metrics.collect(str(tmp_path))[metrics._SOURCE_INDEX['cache']] == 4
+
+
+def test_collect_without_directory_is_empty(tmp_path):
+    assert not metrics.collect(str(tmp_path / 'missing')).any()
+
+
+def test_counts_from_threads_are_exact():
+    # gthread のワーカーのように複数のスレッドから数えても、数え落とさない
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    counted = metrics.instrument('inyou', lambda: None)
+    before = metrics.collect('')
+
+    def work():
+        for _ in range(5000):
+            metrics.count_source('miss')
+            counted()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    added = metrics.collect('') - before
+    row = metrics._SYSTEM_ROWS['inyou']
+    assert added[metrics._SOURCE_INDEX['miss']] == 40000
+    assert added[row:row + len(metrics.BUCKETS) + 1].sum() == 40000
@@ -0,0 +1,46 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from modules import reading
+
+
+def test_iter_readings_returns_results_in_input_order():
+    dates = [(1990, 5, 15), (1984, 2, 4), (1990, 5, 15), (2000, 1, 1), (1984, 2, 4)]
+    results = list(reading.iter_readings(dates))
+    assert results == [reading.compute_reading(*date) for date in dates]
+
+
+def test_iter_readings_releases_results_after_last_occurrence():
+    dates = [(1990, 5, 15), (1984, 2, 4), (1990, 5, 15), (2000, 1, 1)]
+    readings = reading.iter_readings(dates)
+    held = []
+    for _ in dates:
+        next(readings)
+        held.append(sorted(readings.gi_frame.f_locals['found']))
+    # 後でもう一度返す日付の結果だけを保持し、最後に返したら手放す
+    assert (1990, 5, 15) in held[0] and (1990, 5, 15) in held[1]
+    assert (1984, 2, 4) not in held[1]
+    assert (1990, 5, 15) not in held[2]
+    assert held[3] == []
+
+
+def _break_pool():
+    executor = reading.get_executor()
+    # 子プロセスを異常終了させると、プールは以後の投入を拒否する
+    future = executor.submit(os._exit, 1)
+    with pytest.raises(BrokenProcessPool):
+        future.result()
+    return executor
+
+
+def test_compute_readings_recovers_from_broken_pool():
+    broken = _break_pool()
+    dates = [(1971, 3, 3), (1972, 4, 4), (1971, 3, 3)]
+    assert list(reading.compute_readings(dates, chunk_size=1)) == \
+        [reading.compute_reading(*date) for date in dates]
+    # 壊れたプールは捨てられ、次の計算では新しいプールを使う
+    assert reading._executor is not broken
+    assert reading.get_executor() is not broken
+    assert list(reading.compute_readings([(1973, 5, 5)])) == [reading.compute_reading(1973, 5, 5)]
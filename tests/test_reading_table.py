@@ -0,0 +1,91 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from modules import reading, reading_table
+from modules.western import format_interpretation
+
+
+def _western(moon_long, sun_long, moon_sign="射手座", sun_sign="牡牛座"):
+    return {
+        "moon_sign": moon_sign,
+        "sun_sign": sun_sign,
+        "moon_longitude": moon_long,
+        "sun_longitude": sun_long,
+        "interpretation": format_interpretation(moon_long, sun_long, moon_sign, sun_sign),
+    }
+
+
+def _round_trip(days, results):
+    """encode した列から ReadingTable を作り、各行を取り出す"""
+    shapes, columns = reading_table.encode(days, results)
+    manifest = {
+        'reading_version': 'test',
+        'start': days[0].isoformat(),
+        'days': len(days),
+        'shapes': shapes,
+        'columns': [{'path': list(path), 'dictionary': dictionary}
+                    for path, (_, dictionary) in columns.items() if path],
+    }
+    table = reading_table.ReadingTable(manifest, {path: array for path, (array, _) in columns.items()})
+    return columns, [table.row(i, day) for i, day in enumerate(days)]
+
+
+def _assert_same(expected, actual):
+    assert list(expected) == list(actual)
+    for key, value in expected.items():
+        if isinstance(value, dict):
+            _assert_same(value, actual[key])
+        elif isinstance(value, float):
+            assert actual[key] == pytest.approx(value, abs=1e-4)
+        else:
+            assert actual[key] == value
+
+
+def test_round_trip_keeps_values_and_key_order():
+    days = [date(2000, 1, 1) + timedelta(days=i) for i in range(3)]
+    results = [
+        {"animal": {"animal": "ペガサス", "number": 13}, "western": _western(291.87165603380504, 54.03977489709431),
+         "kyusei": {"honmei": "一白水星", "gatsumei": None}, "tags": ["a", "b"]},
+        {"animal": {"animal": "ひつじ", "number": 60}, "western": _western(np.float64(12.5), 280.25),
+         "kyusei": {"honmei": "九紫火星", "gatsumei": "三碧木星"}, "tags": []},
+        {"animal": {"error": "どうぶつ占いの計算に失敗しました"}, "western": {"error": "失敗"},
+         "kyusei": {"honmei": "一白水星", "gatsumei": None}, "tags": ["a", "b"]},
+    ]
+    _, rows = _round_trip(days, results)
+    for expected, actual in zip(results, rows):
+        _assert_same(expected, actual)
+
+
+def test_longitudes_are_float32_and_interpretation_is_derived():
+    days = [date(2000, 1, 1), date(2000, 1, 2)]
+    results = [{"western": _western(291.87165603380504, 54.03977489709431)},
+               {"western": _western(np.float64(0.004999), 359.9)}]
+    columns, rows = _round_trip(days, results)
+    array, dictionary = columns[('western', 'moon_longitude')]
+    assert dictionary is None
+    assert array.dtype == np.float32
+    codes, words = columns[('western', 'interpretation')]
+    assert words == []
+    assert codes.tolist() == [reading_table._DERIVED] * 2
+    assert [row["western"]["interpretation"] for row in rows] == \
+        [result["western"]["interpretation"] for result in results]
+
+
+def test_interpretation_that_cannot_be_derived_is_stored():
+    # float32 に丸めると小数第2位が変わる値は、解説文を辞書に保存する
+    moon_long = 10.004999999
+    assert f"{float(np.float32(moon_long)):.2f}" != f"{moon_long:.2f}"
+    western = _western(moon_long, 20.0)
+    columns, rows = _round_trip([date(2000, 1, 1)], [{"western": western}])
+    assert columns[('western', 'interpretation')][1] == [western["interpretation"]]
+    assert rows[0]["western"]["interpretation"] == western["interpretation"]
+
+
+def test_round_trip_of_computed_readings():
+    days = [date(1990, 5, 15), date(1984, 2, 4), date(2024, 12, 31)]
+    results = [reading.compute_reading(d.year, d.month, d.day) for d in days]
+    _, rows = _round_trip(days, results)
+    for expected, actual in zip(results, rows):
+        _assert_same(expected, actual)
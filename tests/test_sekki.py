@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from modules import inyou, sekki, shichuu
+
+# 高速化前の実装（1分刻みの探索の shichuu.get_setsubun_datetime と
+# get_month_start_dates）で計算した立春と12の節入りの時刻（UTCに9時間を足した値）。
+# 1900年は探索窓より前に節を過ぎている節があり、窓の始まりの時刻になる
+BASELINE = {
+    1900: ('1900-02-03 05:57', [
+        '1900-02-03 09:00', '1900-03-05 09:00', '1900-04-04 09:00', '1900-05-05 09:00',
+        '1900-06-05 09:00', '1900-07-06 13:18', '1900-08-07 09:00', '1900-09-07 09:00',
+        '1900-10-07 17:38', '1900-11-06 20:39', '1900-12-06 13:19', '1901-01-05 09:00',
+    ]),
+    1950: ('1950-02-04 01:50', [
+        '1950-02-04 01:50', '1950-03-05 19:54', '1950-04-05 00:47', '1950-05-05 18:12',
+        '1950-06-05 22:29', '1950-07-07 08:50', '1950-08-07 18:39', '1950-09-07 21:33',
+        '1950-10-08 13:10', '1950-11-07 16:19', '1950-12-07 09:11', '1951-01-05 20:25',
+    ]),
+    1983: ('1983-02-04 12:59', [
+        '1983-02-04 12:59', '1983-03-06 07:03', '1983-04-05 11:56', '1983-05-06 05:18',
+        '1983-06-06 09:31', '1983-07-07 19:49', '1983-08-08 05:40', '1983-09-08 08:36',
+        '1983-10-09 00:14', '1983-11-08 03:22', '1983-12-07 20:09', '1984-01-06 07:20',
+    ]),
+    2000: ('2000-02-04 21:38', [
+        '2000-02-04 21:38', '2000-03-05 15:41', '2000-04-04 20:31', '2000-05-05 13:51',
+        '2000-06-05 18:01', '2000-07-07 04:19', '2000-08-07 14:10', '2000-09-07 17:07',
+        '2000-10-08 08:47', '2000-11-07 11:58', '2000-12-07 04:49', '2001-01-05 16:03',
+    ]),
+    2024: ('2024-02-05 01:24', [
+        '2024-02-05 01:24', '2024-03-05 19:27', '2024-04-05 00:16', '2024-05-05 17:34',
+        '2024-06-05 21:42', '2024-07-07 07:57', '2024-08-07 17:45', '2024-09-07 20:43',
+        '2024-10-08 12:24', '2024-11-07 15:38', '2024-12-07 08:31', '2025-01-05 19:47',
+    ]),
+    2052: ('2052-02-05 05:39', [
+        '2052-02-05 05:39', '2052-03-05 23:40', '2052-04-05 04:26', '2052-05-05 21:43',
+        '2052-06-06 01:53', '2052-07-07 12:10', '2052-08-07 22:00', '2052-09-08 00:56',
+        '2052-10-08 16:37', '2052-11-07 19:50', '2052-12-07 12:45', '2053-01-06 00:04',
+    ]),
+}
+
+
+def _parse(text):
+    return datetime.strptime(text, '%Y-%m-%d %H:%M').replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize('year', sorted(BASELINE))
+def test_setsubun_matches_minute_stepping(year):
+    assert sekki.setsubun_datetime(year) == _parse(BASELINE[year][0])
+
+
+@pytest.mark.parametrize('year', sorted(BASELINE))
+def test_month_starts_match_minute_stepping(year):
+    expected = list(zip(sekki.MONTH_START_ANGLES, map(_parse, BASELINE[year][1])))
+    assert sekki.month_start_dates(year) == expected
+
+
+@pytest.mark.parametrize('module', [shichuu, inyou])
+def test_module_functions_use_the_same_times(module):
+    assert module.get_setsubun_datetime(2024) == _parse(BASELINE[2024][0])
+    assert module.get_month_start_dates(2024) == sekki.month_start_dates(2024)
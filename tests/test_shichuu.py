@@ -0,0 +1,44 @@
+from datetime import date, timedelta
+
+import pytest
+
+from modules import kanshi, pillars, shichuu
+
+PILLARS = ('year_pillar', 'month_pillar', 'day_pillar', 'hour_pillar')
+
+
+def _birth_times():
+    # 1901年3月〜2052年の37日おきの日付（時刻は日付ごとに変える）と、23時台の子の刻
+    day = date(1901, 3, 1)
+    while day.year <= 2052:
+        yield day.year, day.month, day.day, day.toordinal() % 24, day.toordinal() % 60
+        day += timedelta(days=37)
+    yield 1983, 7, 5, 23, 30
+
+
+@pytest.mark.parametrize('longitude', [None, 135.0, 141.35])
+def test_every_pillar_is_one_of_the_sixty_eto(longitude):
+    for year, month, day, hour, minute in _birth_times():
+        result = shichuu.calculate_shichuu(year, month, day, hour, minute, longitude)
+        for name in PILLARS:
+            stem, branch = result[name]
+            index = kanshi.ETO_NAMES.index(result[name])
+            assert index == kanshi.eto_from(kanshi.STEM_NAMES.index(stem), kanshi.BRANCH_NAMES.index(branch))
+
+
+def test_month_stem_follows_goko_ton():
+    # 寅月の干は 甲・己年→丙、乙・庚年→戊、丙・辛年→庚、丁・壬年→壬、戊・癸年→甲
+    expected = {'甲': '丙寅', '乙': '戊寅', '丙': '庚寅', '丁': '壬寅', '戊': '甲寅',
+                '己': '丙寅', '庚': '戊寅', '辛': '庚寅', '壬': '壬寅', '癸': '甲寅'}
+    for year in range(1984, 1994):
+        context = pillars.get_pillar_context(year, 2, 20)
+        assert kanshi.month_branch(context.month_index) == 2
+        year_stem = kanshi.ETO_NAMES[context.year_index][0]
+        assert shichuu.get_month_pillar(year, 2, 20) == expected[year_stem]
+
+
+def test_month_pillar_of_odd_stem_year():
+    result = shichuu.calculate_shichuu(1983, 7, 5, 23, 30, 135.0)
+    assert result['year_pillar'] == '癸亥'
+    assert result['month_pillar'] == '戊午'
+    assert result['month_gan_destiny_star'] == '偏財'